@@ -27,6 +27,12 @@
 from __future__ import division
 from __future__ import absolute_import
 from copy import copy, deepcopy
+from heapq import heappush, heapreplace
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class Hyperrectangle(object):
@@ -183,6 +189,144 @@ class Tree(object):
     def __str__(self):
         return str(self.root)
 
+class KDTree(object):
+    """
+    a balanced kd-tree, built once from a sequence of positions.
+
+    the tree is stored in flat lists: the node covering the slots lo:hi
+    splits them at mid = (lo + hi) // 2, so no child pointers are needed.
+    positions can be removed afterwards but not inserted, rebuild the tree
+    for that.
+    """
+
+    def __init__(self, positions, indices=None):
+        '''positions may be any sequence of vectors or a numpy array, indices selects the positions
+        to put in the tree (by default all of them) and is what queries return.'''
+        if hasattr(positions, 'tolist'):
+            positions = positions.tolist()
+        if indices is None:
+            indices = xrange(len(positions))
+        items = [(tuple(positions[i]), i) for i in indices]
+        n = len(items)
+        self.dim = len(items[0][0]) if n else 0
+        self.axis = [0] * n
+        self.count = [0] * n  # number of positions left in the subtree of a node
+        self.removed = [False] * n
+
+        stack = [(0, n)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi <= lo:
+                continue
+            # split along the axis with the largest spread
+            axis = 0
+            spread = -1.0
+            for a in xrange(self.dim):
+                values = [item[0][a] for item in items[lo:hi]]
+                extent = max(values) - min(values)
+                if extent > spread:
+                    axis, spread = a, extent
+            items[lo:hi] = sorted(items[lo:hi], key=lambda item: item[0][axis])
+            mid = (lo + hi) >> 1
+            self.axis[mid] = axis
+            self.count[mid] = hi - lo
+            stack.append((lo, mid))
+            stack.append((mid + 1, hi))
+
+        self.pos = [item[0] for item in items]
+        self.indices = [item[1] for item in items]
+        self.slot = dict((index, slot) for slot, index in enumerate(self.indices))
+
+    def __len__(self):
+        return len(self.slot)
+
+    def __contains__(self, index):
+        return index in self.slot
+
+    def remove(self, index):
+        '''remove the position with the given index from the tree'''
+        slot = self.slot.pop(index)
+        self.removed[slot] = True
+        lo, hi = 0, len(self.pos)
+        while True:
+            mid = (lo + hi) >> 1
+            self.count[mid] -= 1
+            if slot == mid:
+                return
+            elif slot < mid:
+                hi = mid
+            else:
+                lo = mid + 1
+
+    def _distance_squared(self, slot, pos):
+        return sum((a - b) ** 2 for a, b in zip(self.pos[slot], pos))
+
+    def _nearest(self, lo, hi, pos, k, heap):
+        mid = (lo + hi) >> 1
+        if hi <= lo or self.count[mid] == 0:
+            return
+        if not self.removed[mid]:
+            distsq = self._distance_squared(mid, pos)
+            if len(heap) < k:
+                heappush(heap, (-distsq, self.indices[mid]))
+            elif distsq < -heap[0][0]:
+                heapreplace(heap, (-distsq, self.indices[mid]))
+        axis = self.axis[mid]
+        d = pos[axis] - self.pos[mid][axis]
+        if d <= 0:
+            self._nearest(lo, mid, pos, k, heap)
+            if len(heap) < k or d * d < -heap[0][0]:
+                self._nearest(mid + 1, hi, pos, k, heap)
+        else:
+            self._nearest(mid + 1, hi, pos, k, heap)
+            if len(heap) < k or d * d < -heap[0][0]:
+                self._nearest(lo, mid, pos, k, heap)
+
+    def nearest(self, pos, k=1):
+        '''return a list of up to k (index, distance squared) tuples, closest first'''
+        heap = []
+        self._nearest(0, len(self.pos), pos, k, heap)
+        return [(index, -negdistsq) for negdistsq, index in sorted(heap, reverse=True)]
+
+    def within(self, pos, radius):
+        '''return a list of (index, distance squared) tuples of all positions closer than radius to pos, in no particular order'''
+        result = []
+        rsq = radius * radius
+        stack = [(0, len(self.pos))]
+        while stack:
+            lo, hi = stack.pop()
+            mid = (lo + hi) >> 1
+            if hi <= lo or self.count[mid] == 0:
+                continue
+            if not self.removed[mid]:
+                distsq = self._distance_squared(mid, pos)
+                if distsq < rsq:
+                    result.append((self.indices[mid], distsq))
+            axis = self.axis[mid]
+            d = pos[axis] - self.pos[mid][axis]
+            if d < radius:
+                stack.append((lo, mid))
+            if d > -radius:
+                stack.append((mid + 1, hi))
+        return result
+
+    def nearest_array(self, positions, k=1):
+        '''nearest() for each row of a (n, dim) numpy array, returns (n, k) arrays of indices and distances squared,
+        padded with -1 and inf when the tree holds fewer than k positions'''
+        indices = numpy.full((len(positions), k), -1, dtype=numpy.int64)
+        distances = numpy.full((len(positions), k), numpy.inf)
+        for row, pos in enumerate(numpy.asarray(positions, dtype=numpy.float64).tolist()):
+            for column, (index, distsq) in enumerate(self.nearest(pos, k)):
+                indices[row, column] = index
+                distances[row, column] = distsq
+        return indices, distances
+
+    def within_array(self, positions, radius):
+        '''within() for each row of a (n, dim) numpy array, returns a list of index arrays'''
+        return [numpy.array([index for index, distsq in self.within(pos, radius)], dtype=numpy.int64)
+                for pos in numpy.asarray(positions, dtype=numpy.float64).tolist()]
+
+
 if __name__ == "__main__":
 
     class vector(list):
@@ -454,4 +598,76 @@ if __name__ == "__main__":
             e3 = time() - s
             print "{0:7d}|{2:9d}|{1.level:11d}|{5:7d}|{3:10.2f}|{4:10.1f}".format(qsize, tree, tsize * 10, float(tree.count) / qsize, e3, tsize * 10 // emptyq)
 
+    class TestKDTree(unittest.TestCase):
+
+        def setUp(self):
+            seed(42)
+            self.points = [vector(random(), random(), random()) for p in xrange(500)]
+            self.queries = [vector(random(), random(), random()) for p in xrange(50)]
+
+        def brute(self, pos, removed=()):
+            return sorted(((pos - p).dot(pos - p), i) for i, p in enumerate(self.points) if i not in removed)
+
+        def test_nearest(self):
+            tree = KDTree(self.points)
+            self.assertEqual(len(tree), len(self.points))
+            for q in self.queries:
+                result = tree.nearest(q, k=5)
+                expected = self.brute(q)[:5]
+                self.assertListEqual([index for index, distsq in result], [index for distsq, index in expected])
+                for (index, distsq), (edistsq, eindex) in zip(result, expected):
+                    self.assertAlmostEqual(distsq, edistsq)
+
+        def test_within(self):
+            tree = KDTree(self.points)
+            for q in self.queries:
+                result = sorted(index for index, distsq in tree.within(q, 0.2))
+                expected = sorted(index for distsq, index in self.brute(q) if distsq < 0.04)
+                self.assertListEqual(result, expected)
+
+        def test_remove(self):
+            tree = KDTree(self.points)
+            removed = set(xrange(0, len(self.points), 3))
+            for i in removed:
+                tree.remove(i)
+            self.assertEqual(len(tree), len(self.points) - len(removed))
+            self.assertNotIn(0, tree)
+            for q in self.queries:
+                result = tree.nearest(q, k=3)
+                expected = self.brute(q, removed)[:3]
+                self.assertListEqual([index for index, distsq in result], [index for distsq, index in expected])
+                result = sorted(index for index, distsq in tree.within(q, 0.2))
+                expected = sorted(index for distsq, index in self.brute(q, removed) if distsq < 0.04)
+                self.assertListEqual(result, expected)
+            for i in xrange(len(self.points)):
+                if i not in removed:
+                    tree.remove(i)
+            self.assertEqual(len(tree), 0)
+            self.assertListEqual(tree.nearest(self.queries[0]), [])
+
+        def test_indices(self):
+            tree = KDTree(self.points, indices=xrange(100, 200))
+            for q in self.queries:
+                result = tree.nearest(q, k=2)
+                expected = sorted(((q - self.points[i]).dot(q - self.points[i]), i) for i in xrange(100, 200))[:2]
+                self.assertListEqual([index for index, distsq in result], [index for distsq, index in expected])
+
+        @unittest.skipIf(numpy is None, "numpy not available")
+        def test_arrays(self):
+            points = numpy.array(self.points)
+            queries = numpy.array(self.queries)
+            tree = KDTree(points)
+            indices, distances = tree.nearest_array(queries, k=2)
+            self.assertEqual(indices.shape, (len(self.queries), 2))
+            for q, row in zip(self.queries, indices.tolist()):
+                self.assertListEqual(row, [index for distsq, index in self.brute(q)[:2]])
+            small = KDTree(points[:1])
+            indices, distances = small.nearest_array(queries, k=2)
+            self.assertTrue((indices[:, 1] == -1).all())
+            self.assertTrue(numpy.isinf(distances[:, 1]).all())
+            within = tree.within_array(queries, 0.2)
+            for q, result in zip(self.queries, within):
+                expected = sorted(index for distsq, index in self.brute(q) if distsq < 0.04)
+                self.assertListEqual(sorted(result.tolist()), expected)
+
     unittest.main()
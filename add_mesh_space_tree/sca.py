@@ -25,12 +25,15 @@ from __future__ import division
 from __future__ import absolute_import
 from collections import defaultdict as dd
 from random import random, seed, expovariate
-from math import sqrt, pow, sin, cos
+from math import sqrt, pow, sin, cos, floor, ceil
 from functools import partial
 
 from mathutils import Vector
 
-from .kdtree import Tree
+from .kdtree import Tree, KDTree
+
+
+TOOCLOSE = sqrt(1e-3)  # a new branchpoint closer than this to an existing one is not added
 
 
 class Branchpoint(object):
@@ -43,6 +46,35 @@ class Branchpoint(object):
         self.index = None
 
 
+class Grid(object):
+    """a uniform grid of indices, hashed on integer cell coordinates"""
+
+    def __init__(self, size):
+        self.size = size
+        self.cells = dd(list)
+
+    def key(self, pos):
+        s = self.size
+        return (int(floor(pos[0] / s)), int(floor(pos[1] / s)), int(floor(pos[2] / s)))
+
+    def insert(self, pos, index):
+        self.cells[self.key(pos)].append(index)
+
+    def near(self, pos, radius):
+        """yield the indices in all cells that may hold a position within radius of pos"""
+        x, y, z = self.key(pos)
+        n = int(ceil(radius / self.size))
+        r = xrange(-n, n + 1)
+        cells = self.cells
+        for dx in r:
+            for dy in r:
+                for dz in r:
+                    cell = cells.get((x + dx, y + dy, z + dz))
+                    if cell is not None:
+                        for index in cell:
+                            yield index
+
+
 def sphere(r, p):
     r2 = r * r
     while True:
@@ -71,6 +103,34 @@ class SCA(object):
 
         self.branchpoints = [Branchpoint((0, 0, 0), None)] if len(startingpoints) == 0 else startingpoints
 
+    def closest(self, e):
+        """return [index of the closest branchpoint that may grow towards e, its distance squared, whether e is within kill distance]"""
+        distance = None
+        closestbp = None
+        killed = False
+        for bi, b in enumerate(self.branchpoints):
+            ddd = b.v - e
+            ddd = ddd.dot(ddd)
+            if ddd < self.KILLDIST:
+                killed = True
+            elif (ddd < self.INFLUENCE and b.shoot is None) and ((distance is None) or (ddd < distance)):
+                closestbp = bi
+                distance = ddd
+        return [closestbp, distance, killed]
+
+    def influence(self, bi, endpoints, closest, candidates):
+        """update the closest branchpoints of the candidate endpoints with the new branchpoint bi"""
+        v = self.branchpoints[bi].v
+        for ei in candidates:
+            c = closest[ei]
+            ddd = v - endpoints[ei]
+            ddd = ddd.dot(ddd)
+            if ddd < self.KILLDIST:
+                c[2] = True
+            elif ddd < self.INFLUENCE and ((c[1] is None) or (ddd < c[1])):  # a new branchpoint has the highest index so it loses ties
+                c[0] = bi
+                c[1] = ddd
+
     def iterate(self, newendpointsper1000=0, maxtime=0.0):  # maxtime still ignored for now
 
         endpointsadded = 0.0
@@ -78,23 +138,31 @@ class SCA(object):
         newendpointsper1000 /= 1000.0
         t = expovariate(newendpointsper1000) if newendpointsper1000 > 0.0 else 1  # time to the first new 'endpoint add event'
 
-        while self.NBP > 0 and (len(self.endpoints) > 0):
+        # instead of comparing every endpoint with every branchpoint in each iteration we keep track of the closest branchpoint
+        # of every endpoint and only update that when branchpoints are added or fork, so an iteration is linear in the number of endpoints
+        endpoints = list(self.endpoints)  # every endpoint keeps its index here, killed or not
+        alive = range(len(endpoints))
+        closest = [self.closest(e) for e in endpoints]
+        # a new branchpoint only affects the endpoints within reach, which we look up in a kdtree
+        # (endpoints added after the tree was built are checked one by one until we rebuild it)
+        reach = sqrt(max(self.INFLUENCE, self.KILLDIST)) * (1 + 1e-6)
+        etree = KDTree(endpoints)
+        pending = []
+        # the check for branchpoints that are too close only needs to look at the direct neighborhood
+        grid = Grid(max(self.d, TOOCLOSE))
+        for bi, b in enumerate(self.branchpoints):
+            grid.insert(b.v, bi)
+
+        while self.NBP > 0 and (len(alive) > 0):
             self.NBP -= 1
             closestsendpoints = dd(list)
 
             kill = set()
 
-            for ei, e in enumerate(self.endpoints):
-                distance = None
-                closestbp = None
-                for bi, b in enumerate(self.branchpoints):
-                    ddd = b.v - e
-                    ddd = ddd.dot(ddd)
-                    if ddd < self.KILLDIST:
-                        kill.add(ei)
-                    elif (ddd < self.INFLUENCE and b.shoot is None) and ((distance is None) or (ddd < distance)):
-                        closestbp = bi
-                        distance = ddd
+            for ei in alive:
+                closestbp, distance, killed = closest[ei]
+                if killed:
+                    kill.add(ei)
                 if not (closestbp is None):
                     closestsendpoints[closestbp].append(ei)
 
@@ -105,7 +173,7 @@ class SCA(object):
                 sd = Vector((0, 0, 0))
                 n = 0
                 for ei in closestsendpoints[bi]:
-                    dv = self.branchpoints[bi].v - self.endpoints[ei]
+                    dv = self.branchpoints[bi].v - endpoints[ei]
                     ll = sqrt(dv.dot(dv))
                     sd -= dv / ll
                     n += 1
@@ -124,13 +192,14 @@ class SCA(object):
                 sd /= ll
 
                 newp = self.branchpoints[bi].v + sd * self.d
-                # the assumption we made earlier is not suffucient to prevent adding the same branch so we need an expensive check:
+                # the assumption we made earlier is not suffucient to prevent adding the same branch so we need an extra check:
                 tooclose = False
-                for dbi in self.branchpoints:
-                    dddd = newp - dbi.v
+                for dbi in grid.near(newp, TOOCLOSE):
+                    dddd = newp - self.branchpoints[dbi].v
                     if dddd.dot(dddd) < 1e-3:
                         #print('BP to close to another')
                         tooclose = True
+                        break
                 if tooclose:
                     continue
 
@@ -138,26 +207,44 @@ class SCA(object):
                     bp = Branchpoint(newp, bi)
                     self.branchpoints.append(bp)
                     nbpi = len(self.branchpoints) - 1
+                    grid.insert(newp, nbpi)
+                    self.influence(nbpi, endpoints, closest, [ei for ei, _ in etree.within(newp, reach)] + pending)
                     bp = self.branchpoints[bi]
                     bp.connections += 1
                     if bp.apex is None:
                         bp.apex = nbpi
                     else:
                         bp.shoot = nbpi
+                        # a fork stops growing, endpoints that were closest to it look for another branchpoint
+                        for ei in alive:
+                            if closest[ei][0] == bi:
+                                closest[ei] = self.closest(endpoints[ei])
                     while not (bp.parent is None):
                         bp = self.branchpoints[bp.parent]
                         bp.connections += 1
 
-            self.endpoints = [ep for ei, ep in enumerate(self.endpoints) if not(ei in kill)]
+            for ei in kill:
+                if ei in etree:
+                    etree.remove(ei)
+            alive = [ei for ei in alive if not(ei in kill)]
+            pending = [ei for ei in pending if not(ei in kill)]
 
             if newendpointsper1000 > 0.0:
                 # generate new endpoints with a poisson process
                 # when we first arrive here, t already hold the time to the first event
                 niterations += 1
                 while t < niterations:  # we keep on adding endpoints as long as the next event still happens within this iteration
-                    self.endpoints.append(self.volumepoint.next())
+                    endpoints.append(self.volumepoint.next())
+                    closest.append(self.closest(endpoints[-1]))
+                    alive.append(len(endpoints) - 1)
+                    pending.append(len(endpoints) - 1)
                     endpointsadded += 1
                     t += expovariate(newendpointsper1000)  # time to new 'endpoint add event'
+                if len(pending) > max(len(etree), 64):
+                    etree = KDTree(endpoints, alive)
+                    pending = []
+
+        self.endpoints = [endpoints[ei] for ei in alive]
 
         #if newendpointsper1000 > 0.0:
             #print("newendpoints/iteration %.3f, actual %.3f in %5.f iterations"%(newendpointsper1000,endpointsadded/niterations,niterations))
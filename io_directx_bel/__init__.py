@@ -4,7 +4,7 @@ bl_info = {
     "name": "DirectX Importer",
     "description": "Import directX Model Format (.x)",
     "author": "Littleneo (Jerome Mahieux)",
-    "version": (0, 18),
+    "version": (0, 19),
     "blender": (2, 63, 0),
     "location": "File > Import > DirectX (.x)",
     "warning": "",
@@ -91,7 +91,7 @@ class ImportX(bpy.types.Operator, ImportHelper):
                    ('1024', "1KB", ""),
                    ),
             default='2048',
-            description="number of bytes red in a row",
+            description="all : read the whole file at once, other values : memory-map it",
             )
     naming_method = EnumProperty(
             name="Naming method",
@@ -17,12 +17,18 @@
 # this also allows support for wrong files format (mixed \r and \r\n)
 # for now it only works for text format, but the used methods will be independant of the container type.
 
+# step 1 is now a single pass over the whole file (memory-mapped) : a compiled scanner (text) or a
+# token reader (binary, mszip compressed text/binary) feeds the same tree builder, and the numeric
+# datas of each token are stored as flat value lists at the same time, so step 2 never re-reads the file.
+
 # TEST FILES
 # http://assimp.svn.sourceforge.net/viewvc/assimp/trunk/test/models/X/
 
 
 import os
 import re
+import mmap
+import zlib
 import struct, binascii
 import time
 
@@ -59,6 +65,113 @@ imp.reload(bel.uv)
 
 ###################################################
 
+## TEXT TOKENS
+# numbers are grabbed as runs (with their ; , separators) then split in one findall() call
+r_number = br'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+r_values = re.compile(r_number)
+r_xtoken = re.compile(
+    br'(?P<skip>\s+|//[^\n]*|#[^\n]*)'
+    br'|(?P<numbers>' + r_number + br'(?:[\s;,]*' + r_number + br')*[\s;,]*)'
+    br'|(?P<name>[A-Za-z_][\w-]*|\.\.\.)'
+    br'|(?P<string>"[^"]*")'
+    br'|(?P<guid><[^>]*>)'
+    br'|(?P<punct>[{}\[\];,.])'
+    )
+
+## BINARY TOKENS
+# in little-endian WORDs, see the list in load()
+xBinaryPunct = {
+    10 : '{', 11 : '}', 12 : '(', 13 : ')', 14 : '[', 15 : ']',
+    16 : '<', 17 : '>', 18 : '.', 19 : ',', 20 : ';'
+}
+xBinaryKeywords = {
+    31 : 'template',
+    40 : 'WORD', 41 : 'DWORD', 42 : 'FLOAT', 43 : 'DOUBLE', 44 : 'CHAR',
+    45 : 'UCHAR', 46 : 'SWORD', 47 : 'SDWORD', 48 : 'void', 49 : 'string',
+    50 : 'unicode', 51 : 'cstring', 52 : 'array'
+}
+
+## yields ( kind, value, pointer ) from a text .x buffer
+# kind is 'name', 'string', 'guid', 'punct' or 'numbers' (a list of number strings)
+def dXtextTokens(buf, ptr=16) :
+    for m in r_xtoken.finditer(buf, ptr) :
+        kind = m.lastgroup
+        if kind == 'skip' : continue
+        value = m.group()
+        if kind == 'numbers' : value = r_values.findall(value)
+        elif kind == 'string' : value = value[1:-1].decode('utf-8', 'ignore')
+        elif kind == 'punct' : value = value.decode()
+        else : value = value.decode('utf-8', 'ignore')
+        yield kind, value, m.start()
+
+## yields the same ( kind, value, pointer ) from a binary .x buffer
+# integer and float lists are unpacked in one call
+def dXbinaryTokens(buf, accuracy=32, ptr=16) :
+    unpack = struct.unpack_from
+    floatcode, floatsize = ('d', 8) if accuracy == 64 else ('f', 4)
+    end = len(buf)
+    while ptr + 2 <= end :
+        pos = ptr
+        tok = unpack('<H', buf, ptr)[0]
+        ptr += 2
+        if tok == 1 :
+            n = unpack('<I', buf, ptr)[0]
+            yield 'name', buf[ptr+4:ptr+4+n].decode('utf-8', 'ignore'), pos
+            ptr += 4 + n
+        elif tok == 2 :
+            # the string is followed by its ; or , terminator token
+            n = unpack('<I', buf, ptr)[0]
+            yield 'string', buf[ptr+4:ptr+4+n].decode('utf-8', 'ignore'), pos
+            ptr += 4 + n + 2
+        elif tok == 3 :
+            yield 'numbers', unpack('<I', buf, ptr), pos
+            ptr += 4
+        elif tok == 5 :
+            d1, d2, d3 = unpack('<IHH', buf, ptr)
+            d4 = binascii.hexlify(buf[ptr+8:ptr+16]).decode()
+            yield 'guid', '<%08x-%04x-%04x-%s-%s>'%(d1, d2, d3, d4[:4], d4[4:]), pos
+            ptr += 16
+        elif tok == 6 :
+            n = unpack('<I', buf, ptr)[0]
+            yield 'numbers', unpack('<%dI'%n, buf, ptr+4), pos
+            ptr += 4 + 4*n
+        elif tok == 7 :
+            n = unpack('<I', buf, ptr)[0]
+            yield 'numbers', unpack('<%d%s'%(n, floatcode), buf, ptr+4), pos
+            ptr += 4 + floatsize*n
+        elif tok in xBinaryPunct :
+            yield 'punct', xBinaryPunct[tok], pos
+        elif tok in xBinaryKeywords :
+            yield 'name', xBinaryKeywords[tok], pos
+        else :
+            print 'unknown binary token %s at %s, stop'%(tok, pos)
+            break
+
+## MSZip compressed .x (tzip, bzip) : returns the uncompressed datas, without the header
+# after the header : decompressed size (DWORD), then blocks of
+# uncompressed size (WORD), compressed size (WORD), 'CK' + deflate datas.
+# each block uses the previous one as dictionary, so it's given back to zlib
+# as a stored deflate block right before the compressed datas.
+def dXinflate(buf) :
+    blocks = []
+    history = b''
+    ptr = 20
+    while ptr + 4 <= len(buf) :
+        usize, csize = struct.unpack_from('<2H', buf, ptr)
+        ptr += 4
+        if buf[ptr:ptr+2] != b'CK' :
+            print 'bad MSZip block at %s, stop'%ptr
+            break
+        stored = struct.pack('<BHH', 0, len(history), len(history) ^ 0xFFFF) + history
+        block = zlib.decompressobj(-15).decompress(stored + buf[ptr+2:ptr+csize])
+        block = block[len(history):]
+        blocks.append(block)
+        history = block[-32768:]
+        ptr += csize
+    return b''.join(blocks)
+
+###################################################
+
 from __future__ import division
 from __future__ import absolute_import
 def load(operator, context, filepath,
@@ -92,11 +205,19 @@ def load(operator, context, filepath,
     namelookup = {}
     imgnamelookup = {}
     chunksize = int(chunksize)
-    reserved_type = (
-        'dword',
-        'float',
-        'string'
-    )
+    # scalar types and their conversion from a token value
+    reserved_type = {
+        'word'   : int,
+        'dword'  : int,
+        'sword'  : int,
+        'sdword' : int,
+        'char'   : int,
+        'uchar'  : int,
+        'byte'   : int,
+        'float'  : float,
+        'double' : float,
+        'string' : str
+    }
 
     '''
         'array',
@@ -153,26 +274,6 @@ BINARY FORMAT
     
     '''
     
-    # COMMON REGEX
-    space = '[\ \t]{1,}' # at least one space / tab
-    space0 = '[\ \t]{0,}' # zero or more space / tab
-    
-    # DIRECTX REGEX TOKENS
-    r_template = r'template' + space + '[\w]*' + space0 + '\{'
-    if quickmode :
-        r_sectionname = r'Mesh' + space + '[\W-]*'
-    else :
-        r_sectionname = r'[\w]*' + space + '[\w-]*' + space0 + '\{'
-    r_refsectionname = r'\{' + space0 + '[\w-]*' + space0 + '\}'
-    r_endsection = r'\{|\}'
-    
-    # dX comments
-    r_ignore = r'#|//'
-    
-    #r_frame = r'Frame' + space + '[\w]*'
-    #r_matrix = r'FrameTransformMatrix' + space + '\{[\s\d.,-]*'
-    #r_mesh = r'Mesh' + space + '[\W]*'
-
     ###################
     ## STEP 1 FUNCTIONS
     ###################
@@ -207,136 +308,157 @@ BINARY FORMAT
         return ( minor, major, format, accuracy )
         
     
-    ##
-    def dXtree(data,quickmode = False) :
+    ## builds the internal tree from a token stream (see dXtextTokens and dXbinaryTokens)
+    # token datas are collected in their 'values' list on the fly
+    def dXtree(stream,quickmode = False,lineof = None) :
         tokens = {}
         templates = {}
         tokentypes = {}
-        c = 0
-        lvl = 0
-        tree = ['']
-        ptr = 0
-        eol = 0
-        trunkated = False
-        previouslvl = False
-        while True :
-        #for l in data.readlines() :
-            lines, trunkated = nextFileChunk(data,trunkated)
-            if lines == None : break
-            for l in lines :
-                
-                # compute pointer position
-                ptr += eol
-                c += 1
-                eol = len(l) + 1
-                #print(c,data.tell(),ptr+eol)
-                #if l != '' : print('***',l)
-                #if l == ''  : break
-                l = l.strip()
-                
-                # remove blank and comment lines
-                if l == '' or re.match(r_ignore,l) :
-                    continue
-                
-                # one line token cases level switch
-                if previouslvl :
-                    lvl -= 1
-                    previouslvl = False
+        # open tokens as ( name, recorded ), the root is ''
+        tree = [('',False)]
+        # names and guid met since the last data, a '{' turns them into a token or a reference
+        head = []
+        stream = iter(stream)
+        for kind, value, ptr in stream :
+            
+            if kind == 'numbers' :
+                head = []
+                tokenname, recorded = tree[-1]
+                if recorded : tokens[tokenname]['values'].extend(value)
+            
+            elif kind == 'string' :
+                head = []
+                tokenname, recorded = tree[-1]
+                if recorded : tokens[tokenname]['values'].append(value)
+            
+            elif kind == 'name' or kind == 'guid' :
+                head.append( (kind, value, ptr) )
+            
+            elif value == '{' :
+                line = lineof(head[0][2]) if (head and lineof) else (head[0][2] if head else ptr)
                 
-                #print('%s lines in %.2f\''%(c,time.clock()-t),end='\r')
-                #print(c,len(l)+1,ptr,data.tell())
-                if '{' in l :
-                    lvl += 1
-                    if '}' in l : previouslvl = True #; print('got one line token : \n%s'%l)
-                elif '}' in l :
-                    lvl -= 1
-                #print(c,lvl,tree)
+                ## templates
+                if head and head[0][1] == 'template' :
+                    tname = head[1][1]
+                    tpl = dXtemplate(stream)
+                    if quickmode == False :
+                        tpl['pointer'] = head[0][2]
+                        tpl['line'] = line
+                        templates[tname] = tpl
                 
-                if quickmode == False :
-                    ## look for templates
-                    if re.match(r_template,l) :
-                        tname = l.split(' ')[1]
-                        templates[tname] = {'pointer' : ptr, 'line' : c}
-                        continue
-    
-                    ## look for {references}
-                    if re.match(r_refsectionname,l) :
-                        refname = namelookup[ l[1:-1].strip() ]
-                        #print('FOUND reference to %s in %s at line %s (level %s)'%(refname,tree[lvl-1],c,lvl))
-                        #tree = tree[0:lvl]
-                        parent = tree[lvl-1]
+                ## {references}
+                elif head == [] :
+                    ref = dXreference(stream)
+                    parent = tree[-1][0]
+                    if quickmode == False and ref and parent :
+                        refname = namelookup.get(ref,ref)
+                        #print('FOUND reference to %s in %s at line %s'%(refname,parent,line))
                         # tag it as a reference, since it's not exactly a child.
                         # put it in childs since order can matter in sub tokens declaration
                         tokens[parent]['childs'].append('*'+refname)
                         if refname not in tokens :
-                            print 'reference to %s done before its declaration (line %s)\ncreated dummy'%(refname,c)
+                            print 'reference to %s done before its declaration (line %s)\ncreated dummy'%(refname,line)
+                            namelookup[ref] = refname
                             tokens[refname] = {}
-                        if 'user' not in tokens[refname] : tokens[refname]['users'] = [parent]
+                        if 'users' not in tokens[refname] : tokens[refname]['users'] = [parent]
                         else : tokens[refname]['users'].append(parent)
+                
+                ## any token or only Mesh token in quickmode
+                else :
+                    parent = tree[-1][0]
+                    xtyp = head[0][1]
+                    typ = xtyp.lower()
+                    if quickmode and typ != 'mesh' :
+                        tree.append( (parent,False) )
+                        head = []
                         continue
-    
-                ## look for any token or only Mesh token in quickmode
-                if re.match(r_sectionname,l) :
-                    tokenname = getName(l,tokens)
-                    #print('FOUND %s %s %s %s'%(tokenname,c,lvl,tree))
-                    #print('pointer %s %s'%(data.tell(),ptr))
-                    if lvl == 1 : rootTokens.append(tokenname)
-                    typ = l.split(' ')[0].strip().lower()
-                    tree = tree[0:lvl]
+                    xnam = head[1][1] if len(head) > 1 and head[1][0] == 'name' else ''
+                    tokenname = getName(xtyp,xnam,tokens)
+                    #print('FOUND %s %s %s'%(tokenname,line,parent))
+                    if len(tree) == 1 : rootTokens.append(tokenname)
                     if typ not in tokentypes : tokentypes[typ] = [tokenname]
                     else : tokentypes[typ].append(tokenname)
-                    parent = tree[-1]
                     if tokenname in tokens :
-                        tokens[tokenname]['pointer'] = ptr
-                        tokens[tokenname]['line'] = c
+                        tokens[tokenname]['pointer'] = head[0][2]
+                        tokens[tokenname]['line'] = line
                         tokens[tokenname]['parent'] = parent
                         tokens[tokenname]['childs'] = []
                         tokens[tokenname]['type'] = typ
+                        tokens[tokenname]['values'] = []
                         
-                    else : tokens[tokenname] = {'pointer': ptr,
-                                                'line'   : c,
+                    else : tokens[tokenname] = {'pointer': head[0][2],
+                                                'line'   : line,
                                                 'parent' : parent,
                                                 'childs' : [],
                                                 'users'  : [],
-                                                'type'   : typ
+                                                'type'   : typ,
+                                                'values' : []
                                                 }
-                    tree.append(tokenname)
-                    if lvl > 1 and quickmode == False :
+                    if len(tree) > 1 and quickmode == False :
                         tokens[parent]['childs'].append(tokenname)
+                    tree.append( (tokenname,True) )
+                head = []
+            
+            elif value == '}' :
+                if len(tree) > 1 : tree.pop()
+                head = []
+            
+            else :
+                head = []
                     
         return tokens, templates, tokentypes
-        
-    ## returns file binary chunks
-    def nextFileChunk(data,trunkated=False,chunksize=1024) :
-        if chunksize == 0 : chunk = data.read()
-        else : chunk = data.read(chunksize)
-        if format == 'txt' :
-            lines = chunk.decode('utf-8', errors='ignore')
-            #if stream : return lines.replace('\r','').replace('\n','')
-            lines = lines.replace('\r','\n').split('\n')
-            if trunkated : lines[0] = trunkated + lines[0]
-            if len(lines) == 1 : 
-                if lines[0] == '' : return None, None
-                return lines, False
-            return lines, lines.pop()
-        # wip, todo for binaries
-        else :
-            print chunk
-            for word in xrange(0,len(chunk)) :
-                w = chunk[word:word+4]
-                print word,w,struct.unpack("<l", w),binascii.unhexlify(w)
-
+    
+    ## reads a template body from the stream, after its '{'
+    # members are rebuilt as text ('array Vector vertices[nVertices]') then splitted like .x templates
+    def dXtemplate(stream) :
+        tpl = {'uuid' : '', 'members' : [], 'restriction' : 'closed'}
+        member = ''
+        for kind, value, ptr in stream :
+            if kind == 'punct' and value in '};' :
+                if member.startswith('[') : tpl['restriction'] = member
+                elif member : tpl['members'].append( member.split(' ') )
+                member = ''
+                if value == '}' : break
+            elif kind == 'guid' and member == '' and tpl['uuid'] == '' :
+                tpl['uuid'] = value.lower()
+            elif kind == 'numbers' :
+                member += ''.join( str(v) if type(v) == int else v.decode() for v in value )
+            elif kind == 'punct' :
+                member += value
+            elif member and member[-1] not in '[.' :
+                member += ' ' + value
+            else :
+                member += value
+        return tpl
+    
+    ## reads a {reference} from the stream, after its '{'
+    # returns the referenced name, or its guid
+    def dXreference(stream) :
+        ref = ''
+        for kind, value, ptr in stream :
+            if kind == 'punct' and value == '}' : break
+            if kind == 'name' or ( kind == 'guid' and ref == '' ) : ref = value
+        return ref
+    
+    ## pointer to line number, for text files
+    # pointers are asked in increasing order so the file is only counted once
+    def dXlines(buf) :
+        counted = [0, 1]
+        def lineof(ptr) :
+            counted[1] += buf[counted[0]:ptr].count(b'\n')
+            counted[0] = ptr
+            return counted[1]
+        return lineof
     
     # name unnamed tokens, watchout for x duplicate
     # for blender, referenced token in x should be named and unique..
-    def getName(l,tokens) :
-        xnam = l.split(' ')[1].strip()
-        
-        #if xnam[0] == '{' : xnam = ''
-        if xnam and xnam[-1] == '{' : xnam = xnam[:-1]
+    def getName(xtyp,xnam,tokens) :
+        # a reference met before the declaration created a dummy : use it
+        if xnam in namelookup and 'type' not in tokens.get(namelookup[xnam],{'type':''}) :
+            return namelookup[xnam]
         
         name = xnam
-        if len(name) == 0 : name = l.split(' ')[0].strip()
+        if len(name) == 0 : name = xtyp
         
         namelookup[xnam] = bel.bpyname(name,tokens,4)
 
@@ -375,19 +497,6 @@ BINARY FORMAT
                 if fi == len(field) - 1 and len(tokens[tokenname]['childs']) == 0 :
                     print '%s.%s'%(line,tab)
     
-    ## remove eol, comments, spaces from a raw block of datas
-    def cleanBlock(block) :
-        while '//' in block :
-            s = block.index('//')
-            e = block.index('\n',s+1)
-            block = block[0:s] + block[e:]
-        while '#' in block :
-            s = block.index('#')
-            e = block.index('\n',s+1)
-            block = block[0:s] + block[e:]
-        block = block.replace('\n','').replace(' ','').replace('\t ','')
-        return block
-        
     def readToken(tokenname) :
         token = tokens[tokenname]
         datatype = token['type'].lower()
@@ -397,16 +506,12 @@ BINARY FORMAT
             print "can't find any template to read %s (type : %s)"%(tokenname,datatype)
             return False
         #print('> use template %s'%datatype)
-        block = readBlock(data,token)
-        ptr = 0
-        #return dXtemplateData(tpl,block)
-        fields, ptr = dXtemplateData(tpl,block)
+        fields, ptr = dXtemplateData(tpl,token['values'])
         if datatype in templatesConvert :
             fields = eval( templatesConvert[datatype] )
         return fields
     
-    def dXtemplateData(tpl,block,ptr=0) :
-        #print('dxTPL',block[ptr])
+    def dXtemplateData(tpl,values,ptr=0) :
         pack = []
         for member in tpl['members'] :
             #print(member)
@@ -420,36 +525,22 @@ BINARY FORMAT
                 length = eval(dataname[s:e])
                 #print("array %s type %s length defined by '%s' : %s"%(dataname[:s-1],datatype,dataname[s:e],length))
                 dataname = dataname[:s-1]
-                datavalue, ptr = dXarray(block, datatype, length, ptr)
+                datavalue, ptr = dXarray(values, datatype, length, ptr)
                 #print('back to %s'%(dataname))
             else :
-                length = 1
-                datavalue, ptr = dXdata(block, datatype, length, ptr)
+                datavalue, ptr = dXdata(values, datatype, ptr)
     
             #if len(str(datavalue)) > 50 : dispvalue = str(datavalue[0:25]) + ' [...] ' + str(datavalue[-25:])
             #else : dispvalue = str(datavalue)
             #print('%s :  %s %s'%(dataname,dispvalue,type(datavalue)))
             exec('%s = datavalue'%(dataname))
             pack.append( datavalue )
-        return pack, ptr + 1
+        return pack, ptr
     
-    def dXdata(block,datatype,length,s=0,eof=';') :
-        #print('dxDTA',block[s])
+    def dXdata(values,datatype,ptr=0) :
         # at last, the data we need
-        # should be a ';' but one meet ',' often, like in meshface
-        if datatype == 'dword' :
-            e = block.index(';',s+1)
-            try : field = int(block[s:e])
-            except :
-                e = block.index(',',s+1)
-                field = int(block[s:e])
-            return field, e+1
-        elif datatype == 'float' :
-            e = block.index(eof,s+1)
-            return float(block[s:e]), e+1
-        elif datatype == 'string' :
-            e = block.index(eof,s+1)
-            return str(block[s+1:e-1]) , e+1
+        if datatype in reserved_type :
+            return reserved_type[datatype](values[ptr]), ptr+1
         else :
             if datatype in templates : tpl = templates[datatype]
             elif datatype in defaultTemplates : tpl = defaultTemplates[datatype]
@@ -457,124 +548,45 @@ BINARY FORMAT
                 print "can't find any template for type : %s"%(datatype)
                 return False
             #print('> use template %s'%datatype)
-            fields, ptr = dXtemplateData(tpl,block,s)
+            fields, ptr = dXtemplateData(tpl,values,ptr)
             if datatype in templatesConvert :
                 fields = eval( templatesConvert[datatype] )
             return fields, ptr
     
-    def dXarray(block, datatype, length, s=0) :
-        #print('dxARR',block[s])
-        lst = []
+    def dXarray(values, datatype, length, ptr=0) :
         if datatype in reserved_type :
-            eoi=','
-            for i in xrange(length) :
-                if i+1 == length : eoi = ';'
-                datavalue, s = dXdata(block,datatype,1,s,eoi)
-                lst.append( datavalue )
-            
-        else :
-            eoi = ';,'
-            for i in xrange(length) :
-                if i+1 == length : eoi = ';;'
-                #print(eoi)
-                e = block.index(eoi,s)
-                #except : print(block,s) ; popo()
-                datavalue, na = dXdata(block[s:e+1],datatype,1)
-                lst.append( datavalue )
-                s = e + 2
-        return lst, s
+            convert = reserved_type[datatype]
+            lst = [ convert(v) for v in values[ptr:ptr+length] ]
+            return lst, ptr+length
+        lst = []
+        for i in xrange(length) :
+            datavalue, ptr = dXdata(values,datatype,ptr)
+            lst.append( datavalue )
+        return lst, ptr
     
     ###################################################
 
-    ## populate a template with its datas
-    # this make them available in the internal dict. should be used in step 2 for unknown data type at least
-    def readTemplate(data,tpl_name,display=False) :
-        ptr = templates[tpl_name]['pointer']
-        line = templates[tpl_name]['line']
-        #print('> %s at line %s (chr %s)'%(tpl_name,line,ptr))
-        data.seek(ptr)
-        block = ''
-        trunkated = False
-        go = True
-        while go :
-            lines, trunkated = nextFileChunk(data,trunkated,chunksize) # stream ?
-            if lines == None : 
-                break
-            for l in lines :
-                #l = data.readline().decode().strip()
-                block += l.strip()
-                if '}' in l :
-                    go = False
-                    break
-        
-        uuid = re.search(r'<.+>',block).group()
-        templates[tpl_name]['uuid'] = uuid.lower()
-        templates[tpl_name]['members'] = []
-        templates[tpl_name]['restriction'] = 'closed'
-        
-        members = re.search(r'>.+',block).group()[1:-1].split(';')
-        for member in members :
-            if member == '' : continue
-            if member[0] == '[' :
-                templates[tpl_name]['restriction'] = member
-                continue  
-            templates[tpl_name]['members'].append( member.split(' ') )
-    
-        if display : 
-            print '\ntemplate %s :'%tpl_name
-            for k,v in templates[tpl_name].items() :
-                if k != 'members' :
-                    print '  %s : %s'%(k,v)
-                else :
-                    for member in v :
-                        print '  %s'%str(member)[1:-1].replace(',',' ').replace("'",'')
-                
-            if tpl_name in defaultTemplates :
-                defaultTemplates[tpl_name]['line'] = templates[tpl_name]['line']
-                defaultTemplates[tpl_name]['pointer'] = templates[tpl_name]['pointer']
-                if defaultTemplates[tpl_name] != templates[tpl_name] :
-                    print '! DIFFERS FROM BUILTIN TEMPLATE :'
-                    print 'raw template %s :'%tpl_name
-                    print templates[tpl_name]
-                    print 'raw default template %s :'%tpl_name
-                    print defaultTemplates[tpl_name]
-                    #for k,v in defaultTemplates[tpl_name].items() :
-                    #    if k != 'members' :
-                    #        print('  %s : %s'%(k,v))
-                    #    else :
-                    #        for member in v :
-                    #            print('  %s'%str(member)[1:-1].replace(',',' ').replace("'",''))
-                else :
-                    print 'MATCHES BUILTIN TEMPLATE'
-    
+    ## display a template as read in the file
+    def showTemplate(tpl_name) :
+        print '\ntemplate %s :'%tpl_name
+        for k,v in templates[tpl_name].items() :
+            if k != 'members' :
+                print '  %s : %s'%(k,v)
+            else :
+                for member in v :
+                    print '  %s'%str(member)[1:-1].replace(',',' ').replace("'",'')
             
-    ##  read any kind of token data block
-    # by default the block is cleaned from inline comment space etc to allow data parsing
-    # useclean = False (retrieve all bytes) if you need to compute a file byte pointer
-    # to mimic the file.tell() function and use it with file.seek()
-    def readBlock(data,token, clean=True) :
-        ptr = token['pointer']
-        data.seek(ptr)
-        block = ''
-        #lvl = 0
-        trunkated = False
-        go = True
-        while go :
-            lines, trunkated = nextFileChunk(data,trunkated,chunksize)
-            if lines == None : break
-            for l in lines :
-                #eol = len(l) + 1
-                l = l.strip()
-                #c += 1
-                block += l+'\n'
-                if re.match(r_endsection,l) :
-                    go = False
-                    break
-        s = block.index('{') + 1
-        e = block.index('}')
-        block = block[s:e]
-        if clean : block = cleanBlock(block)
-        return block
+        if tpl_name in defaultTemplates :
+            defaultTemplates[tpl_name]['line'] = templates[tpl_name]['line']
+            defaultTemplates[tpl_name]['pointer'] = templates[tpl_name]['pointer']
+            if defaultTemplates[tpl_name] != templates[tpl_name] :
+                print '! DIFFERS FROM BUILTIN TEMPLATE :'
+                print 'raw template %s :'%tpl_name
+                print templates[tpl_name]
+                print 'raw default template %s :'%tpl_name
+                print defaultTemplates[tpl_name]
+            else :
+                print 'MATCHES BUILTIN TEMPLATE'
     
     def getChilds(tokenname) :
         childs = []
@@ -920,18 +932,32 @@ BINARY FORMAT
             print '  format : %s'%(format)
             print '  floats are %s bits'%(accuracy)
 
-        if format in [ 'txt' ] : #, 'bin' ] :
+        if format in [ 'txt', 'bin', 'tzip', 'bzip' ] :
 
             ## FILE READ : STEP 1 : STRUCTURE
             if show_geninfo : print '\nBuilding internal .x tree'
             t = time.clock()
-            tokens, templates, tokentypes = dXtree(data,quickmode)
+            # compressed files are inflated in memory, others are memory-mapped
+            # (or read at once with chunksize 'all')
+            if format in [ 'tzip', 'bzip' ] :
+                buf = dXinflate(data.read())
+                ptr = 0
+            elif chunksize == 0 :
+                buf = data.read()
+                ptr = 16
+            else :
+                buf = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+                ptr = 16
+            if format in [ 'txt', 'tzip' ] :
+                tokens, templates, tokentypes = dXtree(dXtextTokens(buf,ptr),quickmode,dXlines(buf))
+            else :
+                tokens, templates, tokentypes = dXtree(dXbinaryTokens(buf,accuracy,ptr),quickmode)
             readstruct_time = time.clock()-t
             if show_geninfo : print 'builded tree in %.2f\''%(readstruct_time) # ,end='\r')
 
-            ## populate templates with datas
-            for tplname in templates :
-                readTemplate(data,tplname,show_templates)
+            if show_templates :
+                for tplname in templates :
+                    showTemplate(tplname)
 
             ## DATA TREE CHECK
             if show_tree :
@@ -966,7 +992,7 @@ BINARY FORMAT
             print 'done in %.2f\''%(time.clock()-start) # ,end='\r')
             
         else :
-            print 'only .x files in text format are currently supported'
+            print 'unknown .x format %s'%format
             print 'please share your file to make the importer evolve'
 
 
@@ -36,8 +36,12 @@ bl_info = {
     "category": "Import-Export"}
 
 import os
+import sys
 import shutil
+import struct
+from array import array
 from math import radians
+from multiprocessing.pool import ThreadPool
 
 import bpy
 from mathutils import Matrix
@@ -49,6 +53,11 @@ import datetime
 
 import subprocess
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 #Container for the exporter settings
 class MarmaladeExporterSettings(object):
@@ -70,6 +79,10 @@ class MarmaladeExporterSettings(object):
                  ExportAnimationActions=0,
                  ExportMode=1,
                  MergeModes=0,
+                 WeldTolerance=0.0,
+                 OutputFormat=0,
+                 ParallelAnimation=True,
+                 AnimKeyTolerance=0.0,
                  Verbose=False):
         self.context = context
         self.FilePath = FilePath
@@ -87,6 +100,10 @@ class MarmaladeExporterSettings(object):
         self.ExportAnimationActions = int(ExportAnimationActions)
         self.ExportMode = int(ExportMode)
         self.MergeModes = int(MergeModes)
+        self.WeldTolerance = WeldTolerance
+        self.OutputFormat = int(OutputFormat)
+        self.ParallelAnimation = ParallelAnimation
+        self.AnimKeyTolerance = AnimKeyTolerance
         self.Verbose = Verbose
         self.WarningList = []
 
@@ -195,7 +212,7 @@ def WriteObjects(Config, ObjectList, geoFile=None, mtlFile=None, GeoModel=None,
         if geoFile == None:
             #we merge objects, so use name of group file for the name of Geo
             geoFile, mtlFile = CreateGeoMtlFiles(Config, bpy.path.display_name_from_filepath(Config.FilePath))
-            GeoModel = CGeoModel(bpy.path.display_name_from_filepath(Config.FilePath))
+            GeoModel = CGeoModel(bpy.path.display_name_from_filepath(Config.FilePath), Config.WeldTolerance)
 
     for Object in ObjectList:
         if Config.Verbose:
@@ -280,7 +297,7 @@ def WriteObjects(Config, ObjectList, geoFile=None, mtlFile=None, GeoModel=None,
             if Config.MergeModes == 0:
                 #one geo per Object, so use name of Object for the Geo file
                 geoFile, mtlFile = CreateGeoMtlFiles(Config, StripName(Object.name))
-                GeoModel = CGeoModel(StripName(Object.name))
+                GeoModel = CGeoModel(StripName(Object.name), Config.WeldTolerance)
 
             # Write the Mesh in the Geo file
             WriteMesh(Config, Object, Mesh, geoFile, mtlFile, GeoModel)
@@ -314,7 +331,7 @@ def WriteObjects(Config, ObjectList, geoFile=None, mtlFile=None, GeoModel=None,
         if GeoModel:
             if Config.MergeModes == 1:
                 # we have Merges all objects in one Mesh, so time to write this big mesh in the file
-                GeoModel.PrintGeoMesh(geoFile)
+                WriteGeoMesh(Config, geoFile, GeoModel)
                 # time to write skinfile if any
                 if len(GeoModel.useBonesDict) > 0:
                     # some mesh was not modified by the armature. so we must skinned the merged mesh.
@@ -327,11 +344,11 @@ def WriteObjects(Config, ObjectList, geoFile=None, mtlFile=None, GeoModel=None,
                             if useBonesKey not in GeoModel.useBonesDict:
                                 GeoModel.mapVertexGroupNames[GeoModel.armatureRootBoneIndex] = StripBoneName(GeoModel.armatureRootBone.name)
                                 VertexList = []
-                                VertexList.append("\t\tvertWeights { %d, 1.0}" % i)
+                                VertexList.append((i, RootBoneWeights, ""))
                                 GeoModel.useBonesDict[useBonesKey] = (vertexGroupIndices, VertexList)
                             else:
                                 pair_ListGroupIndices_ListAssignedVertices = GeoModel.useBonesDict[useBonesKey]
-                                pair_ListGroupIndices_ListAssignedVertices[1].append("\t\tvertWeights { %d, 1.0}" % i)
+                                pair_ListGroupIndices_ListAssignedVertices[1].append((i, RootBoneWeights, ""))
                                 GeoModel.useBonesDict[useBonesKey] = pair_ListGroupIndices_ListAssignedVertices
                     # now generates the skin file
                     PrintSkinWeights(Config, GeoModel.armatureObjectName, GeoModel.useBonesDict, GeoModel.mapVertexGroupNames, GeoModel.name)
@@ -345,17 +362,28 @@ def WriteObjects(Config, ObjectList, geoFile=None, mtlFile=None, GeoModel=None,
 
 def CreateGeoMtlFiles(Config, Name):
     #Create the geo file
-    geofullname = os.path.dirname(Config.FilePath) + os.sep + "models" + os.sep + "%s.geo" % Name
-    ensure_dir(geofullname)
-    if Config.Verbose:
-        print "      Creating geo file %s" % (geofullname)
-    geoFile = open(geofullname, "w")
-    geoFile.write('// geo file exported from : %r\n' % os.path.basename(bpy.data.filepath))
-    geoFile.write("CIwModel\n")
-    geoFile.write("{\n")
-    geoFile.write("\tname \"%s\"\n" % Name)
-    # add it to the group
-    Config.File.write("\t\".\models\%s.geo\"\n" % Name)
+    if Config.OutputFormat == 1:
+        geofullname = os.path.dirname(Config.FilePath) + os.sep + "models" + os.sep + "%s.geob" % Name
+        ensure_dir(geofullname)
+        if Config.Verbose:
+            print "      Creating binary geo file %s" % (geofullname)
+        geoFile = open(geofullname, "wb")
+        WriteBinaryHeader(geoFile, BINARY_GEO_MAGIC)
+        WriteBinaryString(geoFile, Name)
+        # add it to the group
+        Config.File.write("\t\".\models\%s.geob\"\n" % Name)
+    else:
+        geofullname = os.path.dirname(Config.FilePath) + os.sep + "models" + os.sep + "%s.geo" % Name
+        ensure_dir(geofullname)
+        if Config.Verbose:
+            print "      Creating geo file %s" % (geofullname)
+        geoFile = open(geofullname, "w")
+        geoFile.write('// geo file exported from : %r\n' % os.path.basename(bpy.data.filepath))
+        geoFile.write("CIwModel\n")
+        geoFile.write("{\n")
+        geoFile.write("\tname \"%s\"\n" % Name)
+        # add it to the group
+        Config.File.write("\t\".\models\%s.geo\"\n" % Name)
 
     # Create the mtl file
     mtlfullname = os.path.dirname(Config.FilePath) + os.sep + "models" + os.sep + "%s.mtl" % Name
@@ -370,7 +398,8 @@ def CreateGeoMtlFiles(Config, Name):
 def FinalizeGeoMtlFiles(Config, geoFile, mtlFile):
     if Config.Verbose:
         print "      Closing geo file"
-    geoFile.write("}\n")
+    if Config.OutputFormat != 1:
+        geoFile.write("}\n")
     geoFile.close()
     if Config.Verbose:
         print "      Closing mtl file"
@@ -389,7 +418,7 @@ def WriteMesh(Config, Object, Mesh,  geoFile=None, mtlFile=None, GeoModel=None):
     BuildOptimizedGeo(Config, Object, Mesh, GeoModel)
     if Config.MergeModes == 0 or Config.MergeModes == 2:
         #if we don't merge, or if we write several meshes into one file ... write the mesh everytime we do an object
-        GeoModel.PrintGeoMesh(geoFile)
+        WriteGeoMesh(Config, geoFile, GeoModel)
 
     if Config.Verbose:
         print "      Done\n      Writing Mesh Materials..."
@@ -413,10 +442,10 @@ def WriteMesh(Config, Object, Mesh,  geoFile=None, mtlFile=None, GeoModel=None):
 
 # CGeoModel
 #  -> List Vertices
-#  -> List Normales
-#  -> List uv 0
-#  -> List uv 1
-#  -> List Vertex Colors
+#  -> List Normales    (merged, indexed by a dict)
+#  -> List uv 0        (merged, indexed by a dict)
+#  -> List uv 1        (merged, indexed by a dict)
+#  -> List Vertex Colors (merged, indexed by a dict)
 #  -> List Materials
 #       -> Material name
 #       -> Blender Material Object
@@ -521,10 +550,11 @@ class CGeoMaterialPolys(object):
 #############
 class CGeoModel(object):
     __slots__ = ("name", "MaterialsDict", "vList", "vnList", "vcList", "uv0List", "uv1List",
-                "currentMaterialPolys", "vbaseIndex","vnbaseIndex", "uv0baseIndex", "uv1baseIndex",
+                "vnDict", "vcDict", "uv0Dict", "uv1Dict", "Tolerance",
+                "currentMaterialPolys", "vbaseIndex",
                 "armatureObjectName", "useBonesDict", "mapVertexGroupNames", "armatureRootBone", "armatureRootBoneIndex", "skinnedVertices")
 
-    def __init__(self, name):
+    def __init__(self, name, Tolerance=0.0):
         self.name = name
         self.MaterialsDict = {}
         self.vList = []
@@ -532,12 +562,16 @@ class CGeoModel(object):
         self.vcList = []
         self.uv0List = []
         self.uv1List = []
+        # xxDict[key] = index in xxList, so that duplicated normals, uvs and colors are stored only once
+        # Tolerance: values are quantised to this step to build the key (0 => only exact duplicates are merged)
+        self.vnDict = {}
+        self.vcDict = {}
+        self.uv0Dict = {}
+        self.uv1Dict = {}
+        self.Tolerance = Tolerance
         self.currentMaterialPolys = None
-        #used xx baseIndex are used when merging several blender objects into one Mesh in the geo file (internal offset)
+        #vbaseIndex is used when merging several blender objects into one Mesh in the geo file (internal offset)
         self.vbaseIndex = 0
-        self.vnbaseIndex = 0
-        self.uv0baseIndex = 0
-        self.uv1baseIndex = 0
 
         # Store some information for skin management , when we merge several object in one big mesh (MergeModes 1)
         # can only work if in the object list only one is rigged with an armature... and if it is located in 0,0,0
@@ -552,30 +586,37 @@ class CGeoModel(object):
 
 
 
+    # add value to the stream List if it (or a value within Tolerance) is not already in it, and return its Index in the stream
+    # (index is global to all objects, when we merge several object into a one Mesh)
+    def AddToStream(self, List, Dict, value):
+        if self.Tolerance > 0:
+            key = tuple([int(round(x / self.Tolerance)) for x in value])
+        else:
+            key = tuple(value)
+        index = Dict.get(key)
+        if index is None:
+            index = len(List)
+            List.append(value)
+            Dict[key] = index
+        return index
+
     def AddVertex(self, vertex):
         self.vList.append(vertex.copy())
 
+    # add a vertex normal if it doesn't already exist and return the Index in the stream
     def AddVertexNormal(self, vertexN):
-        self.vnList.append(vertexN.copy())
+        return self.AddToStream(self.vnList, self.vnDict, vertexN.copy())
 
-    # add a uv coordiantes and return the current Index in the stream (index is local to the object, when we merge several object into a one Mesh)
+    # add a uv coordiantes if it doesn't already exist and return the Index in the stream
     def AddVertexUV0(self, u, v):
-        self.uv0List.append((u, v))
-        return len(self.uv0List) - 1 - self.uv0baseIndex
+        return self.AddToStream(self.uv0List, self.uv0Dict, (u, v))
 
     def AddVertexUV1(self, u, v):
-        self.uv1List.append((u, v))
-        return len(self.uv1List) - 1 - self.uv1baseIndex
+        return self.AddToStream(self.uv1List, self.uv1Dict, (u, v))
 
-    # add a vertexcolor if it doesn't already exist and return the current Index in the stream (index is global to all objects, when we merge several object into a one Mesh)
+    # add a vertexcolor if it doesn't already exist and return the Index in the stream
     def AddVertexColor(self, r, g, b, a):
-        for i in xrange(0, len(self.vcList)):
-            col = self.vcList[i]
-            if col[0] == r and col[1] == g and col[2] == b and col[3] == a:
-                return i
-
-        self.vcList.append((r, g, b, a))
-        return len(self.vcList)-1
+        return self.AddToStream(self.vcList, self.vcDict, (r, g, b, a))
 
     def BeginPoly(self, MaterialName, material=None):
         if MaterialName not in self.MaterialsDict:
@@ -584,15 +625,10 @@ class CGeoModel(object):
             self.currentMaterialPolys = self.MaterialsDict[MaterialName]
         self.currentMaterialPolys.BeginPoly()
 
+    # v is local to the object, vn, uv0, uv1 and vc are the global indices returned by the AddVertexXX methods
     def AddPoint(self, v, vn, uv0, uv1, vc):
         if v != -1:
             v += self.vbaseIndex
-        if vn != -1:
-            vn += self.vnbaseIndex
-        if uv0 != -1:
-            uv0 += self.uv0baseIndex
-        if uv1 != -1:
-            uv1 += self.uv1baseIndex
 
         self.currentMaterialPolys.AddPoint(v, vn, uv0, uv1, vc)
 
@@ -603,10 +639,8 @@ class CGeoModel(object):
 
     def NewObject(self):
         #used in Merge mode 1: allows to merge several blender objects into one Mesh.
+        #normals, uvs and colors streams are shared (and merged) across objects
         self.vbaseIndex = len(self.vList)
-        self.vnbaseIndex = len(self.vnList)
-        self.uv0baseIndex = len(self.uv0List)
-        self.uv1baseIndex = len(self.uv1List)
 
     def ClearAllExceptMaterials(self):
         #used in Merge mode 2: one geo with several mesh
@@ -615,11 +649,12 @@ class CGeoModel(object):
         self.vcList = []
         self.uv0List = []
         self.uv1List = []
+        self.vnDict = {}
+        self.vcDict = {}
+        self.uv0Dict = {}
+        self.uv1Dict = {}
         self.currentMaterialPolys = None
         self.vbaseIndex = 0
-        self.vnbaseIndex = 0
-        self.uv0baseIndex = 0
-        self.uv1baseIndex = 0
         for GeoMaterialPolys in self.MaterialsDict.values():
             GeoMaterialPolys.ClearPolys()
         self.useBonesDict = {}
@@ -689,6 +724,66 @@ class CGeoModel(object):
         else:
             return None
 
+    def PrintGeoMeshBinary(self, geoFile):
+        WriteBinaryString(geoFile, StripName(self.name))
+        WriteBinaryArray(geoFile, "f", [x for vertex in self.vList for x in vertex[0:3]])
+        WriteBinaryArray(geoFile, "f", [x for vertexn in self.vnList for x in vertexn[0:3]])
+        WriteBinaryArray(geoFile, "f", [x for color in self.vcList for x in color])
+        WriteBinaryArray(geoFile, "f", [x for uv in self.uv0List for x in uv])
+        WriteBinaryArray(geoFile, "f", [x for uv in self.uv1List for x in uv])
+        geoFile.write(struct.pack("<I", len(self.MaterialsDict)))
+        for GeoMaterialPolys in self.MaterialsDict.values():
+            WriteBinaryString(geoFile, GeoMaterialPolys.name)
+            for polyList in (GeoMaterialPolys.triList, GeoMaterialPolys.quadList):
+                WriteBinaryArray(geoFile, "i", [x for poly in polyList for point in poly.pointsList
+                                                for x in (point.v, point.vn, point.uv0, point.uv1, point.vc)])
+
+
+#############
+# Packed binary output (OutputFormat 1), everything little endian:
+#  header  : 4 bytes magic ("MGEO", "MSKN" or "MANM"), uint32 version
+#  string  : uint16 byte count, utf-8 bytes
+#  array   : uint32 value count, values (float32 "f" or int32 "i")
+# .geob  : header, model name, then for each mesh until the end of file:
+#          name, verts(3 per vertex), normals(3), colors(4), uv0(2), uv1(2),
+#          uint32 surfaces count, per surface: material name,
+#          tris and quads as v,vn,uv0,uv1,vc index arrays (5 per point)
+# .skinb : header, skeleton name, model name, uint32 sets count, per set:
+#          uint32 bones count, bone names, vertex indices, weights (one per bone and vertex)
+# .animb : header, skeleton name, uint32 bones count, bone names,
+#          times (seconds), then per frame and bone pos(3) rot(4, w first)
+#############
+BINARY_VERSION = 1
+BINARY_GEO_MAGIC = b"MGEO"
+BINARY_SKIN_MAGIC = b"MSKN"
+BINARY_ANIM_MAGIC = b"MANM"
+
+
+def WriteBinaryHeader(File, Magic):
+    File.write(Magic)
+    File.write(struct.pack("<I", BINARY_VERSION))
+
+
+def WriteBinaryString(File, String):
+    Data = String.encode("utf-8")
+    File.write(struct.pack("<H", len(Data)))
+    File.write(Data)
+
+
+def WriteBinaryArray(File, TypeCode, Values):
+    Array = array(TypeCode, Values)
+    if sys.byteorder != "little":
+        Array.byteswap()
+    File.write(struct.pack("<I", len(Array)))
+    File.write(Array.tostring())
+
+
+def WriteGeoMesh(Config, geoFile, GeoModel):
+    if Config.OutputFormat == 1:
+        GeoModel.PrintGeoMeshBinary(geoFile)
+    else:
+        GeoModel.PrintGeoMesh(geoFile)
+
 
 
 #############
@@ -700,13 +795,14 @@ def BuildOptimizedGeo(Config, Object, Mesh, GeoModel):
     #Ensure tessfaces data are here
     Mesh.update (calc_tessface=True)
 
-    #Store Vertex stream, and Normal stream (use directly the order from blender collection
+    #Store Vertex stream (use directly the order from blender collection), and Normal stream (merged, normalIndex[vertex index] = index in the stream)
+    normalIndex = []
     for Vertex in Mesh.vertices:
         GeoModel.AddVertex(Vertex.co)
         Normal = Vertex.normal
         if Config.FlipNormals:
             Normal = -Normal
-        GeoModel.AddVertexNormal(Normal)
+        normalIndex.append(GeoModel.AddVertexNormal(Normal))
     #Check if some colors have been defined
     vertexColors = None
     if Config.ExportVertexColors and (len(Mesh.vertex_colors) > 0):
@@ -773,7 +869,7 @@ def BuildOptimizedGeo(Config, Object, Mesh, GeoModel):
         GeoModel.BeginPoly(matName, mat)
 
         for i in xrange(0, len(Vertices)):
-            GeoModel.AddPoint(Vertices[i], Vertices[i], uv0Index[i], uv1Index[i], colorIndex[i])
+            GeoModel.AddPoint(Vertices[i], normalIndex[Vertices[i]], uv0Index[i], uv1Index[i], colorIndex[i])
 
         GeoModel.EndPoly()
 
@@ -892,7 +988,14 @@ def WriteMeshSkinWeightsForGeoModel(Config, Object, Mesh, GeoModel):
             PrintSkinWeights(Config, GeoModel.armatureObjectName, GeoModel.useBonesDict, GeoModel.mapVertexGroupNames, StripName(Object.name))
 
 
+#Weights of the unskinned vertices given to the root bone, the text skin writes them as "1.0"
+RootBoneWeights = (1.0,)
+
+
 def PrintSkinWeights(Config, ArmatureObjectName, useBonesDict, mapVertexGroupNames, GeoName):
+        if Config.OutputFormat == 1:
+            PrintSkinWeightsBinary(Config, ArmatureObjectName, useBonesDict, mapVertexGroupNames, GeoName)
+            return
         #Create the skin file
         skinfullname = os.path.dirname(Config.FilePath) + os.sep + "models" + os.sep + "%s.skin" % GeoName
         ensure_dir(skinfullname)
@@ -916,14 +1019,42 @@ def PrintSkinWeights(Config, ArmatureObjectName, useBonesDict, mapVertexGroupNam
                 skinFile.write(" %s" % mapVertexGroupNames[vertexGroupIndex])
             skinFile.write(" }\n")
             skinFile.write("\t\tnumVerts %d\n" % len(pair_ListGroupIndices_ListAssignedVertices[1]))
-            for VertexWeightString in pair_ListGroupIndices_ListAssignedVertices[1]:
-                skinFile.write(VertexWeightString)
+            for VertexIndex, Weights, Comment in pair_ListGroupIndices_ListAssignedVertices[1]:
+                skinFile.write("\t\tvertWeights { %d" % VertexIndex)
+                if Weights is RootBoneWeights:
+                    skinFile.write(", 1.0")
+                else:
+                    for Weight in Weights:
+                        skinFile.write(", %.7f" % Weight)
+                skinFile.write("}%s\n" % Comment)
             skinFile.write("\t}\n")
 
         skinFile.write("}\n")
         skinFile.close()
 
 
+def PrintSkinWeightsBinary(Config, ArmatureObjectName, useBonesDict, mapVertexGroupNames, GeoName):
+        #Create the binary skin file
+        skinfullname = os.path.dirname(Config.FilePath) + os.sep + "models" + os.sep + "%s.skinb" % GeoName
+        ensure_dir(skinfullname)
+        if Config.Verbose:
+            print "      Creating binary skin file %s" % (skinfullname)
+        skinFile = open(skinfullname, "wb")
+        WriteBinaryHeader(skinFile, BINARY_SKIN_MAGIC)
+        WriteBinaryString(skinFile, ArmatureObjectName)
+        WriteBinaryString(skinFile, GeoName)
+
+        Config.File.write("\t\".\models\%s.skinb\"\n" % GeoName)
+        skinFile.write(struct.pack("<I", len(useBonesDict)))
+        for vertexGroupIndices, VertexList in useBonesDict.values():
+            skinFile.write(struct.pack("<I", len(vertexGroupIndices)))
+            for vertexGroupIndex in vertexGroupIndices:
+                WriteBinaryString(skinFile, mapVertexGroupNames[vertexGroupIndex])
+            WriteBinaryArray(skinFile, "i", [VertexIndex for VertexIndex, Weights, Comment in VertexList])
+            WriteBinaryArray(skinFile, "f", [Weight for VertexIndex, Weights, Comment in VertexList for Weight in Weights])
+        skinFile.close()
+
+
 def AddVertexToDicionarySkinWeights(Config, Object, Mesh, Vertex, useBonesDict, mapVertexGroupNames, VertexIndex, RootBone, RootVertexGroup, BoneNames):
     #build useBones
     useBonesKey = 0
@@ -957,8 +1088,8 @@ def AddVertexToDicionarySkinWeights(Config, Object, Mesh, Vertex, useBonesDict,
     if len(vertexGroupIndices) > 0:
         vertexGroupIndices.sort();
 
-        #build the vertex weight string: vertex indices, followed by influence weight for each bone
-        VertexWeightString = "\t\tvertWeights { %d" % (VertexIndex)
+        #build the vertex weights: vertex indices, followed by influence weight for each bone (and a comment for the text file)
+        Weights = []
         for vertexGroupIndex in vertexGroupIndices:
             #get the weight of this specific VertexGroup (aka bone)
             boneWeight = 1
@@ -967,24 +1098,23 @@ def AddVertexToDicionarySkinWeights(Config, Object, Mesh, Vertex, useBonesDict,
                     boneWeight = VertexGroup.weight
             #calculate the influence of this bone compared to the total of weighting applied to this Vertex
             if not bWeightTotZero:
-                VertexWeightString += ", %.7f" % (boneWeight / weightTotal)
+                Weights.append(boneWeight / weightTotal)
             else:
-                VertexWeightString += ", %.7f" % (1.0 / len(vertexGroupIndices))
-        VertexWeightString += "}"
+                Weights.append(1.0 / len(vertexGroupIndices))
+        Comment = ""
         if bWeightTotZero:
-            VertexWeightString += " // total weight was zero in blender , export assign it to the RootBone with weight 1."
+            Comment += " // total weight was zero in blender , export assign it to the RootBone with weight 1."
         if (len(Vertex.groups)) > 4:
-            VertexWeightString += " // vertex is associated to more than 4 bones in blender !! skip some bone association (was associated to %d bones)." % (len(Vertex.groups))
-        VertexWeightString += "\n"
+            Comment += " // vertex is associated to more than 4 bones in blender !! skip some bone association (was associated to %d bones)." % (len(Vertex.groups))
 
         #store in dictionnary information
         if useBonesKey not in useBonesDict:
             VertexList = []
-            VertexList.append(VertexWeightString)
+            VertexList.append((VertexIndex, Weights, Comment))
             useBonesDict[useBonesKey] = (vertexGroupIndices, VertexList)
         else:
             pair_ListGroupIndices_ListAssignedVertices = useBonesDict[useBonesKey]
-            pair_ListGroupIndices_ListAssignedVertices[1].append(VertexWeightString)
+            pair_ListGroupIndices_ListAssignedVertices[1].append((VertexIndex, Weights, Comment))
             useBonesDict[useBonesKey] = pair_ListGroupIndices_ListAssignedVertices
     else:
         print "ERROR Vertex %d is not skinned (it doesn't belong to any vertex group\n" % (VertexIndex)
@@ -1026,6 +1156,27 @@ def WriteArmatureChildBones(Config, Object, BonesList, skelFile):
 
 
 def WriteBonePosition(Config, Object, Bone, PoseBones, PoseBone, File, isRestPoseNotAnimPose):
+    if isRestPoseNotAnimPose:
+        #skel file, bone header
+        File.write("\tCIwAnimBone\n")
+        File.write("\t{\n")
+        File.write("\t\tname \"%s\"\n" % StripBoneName(Bone.name))
+        if Bone.parent:
+            File.write("\t\tparent \"%s\"\n" % StripBoneName(Bone.parent.name))
+    else:
+        #anim file, bone header
+        File.write("\t\t\n")
+        File.write("\t\tbone \"%s\" \n" % StripBoneName(Bone.name))
+
+    loc, quat = GetBonePosition(Config, Object, Bone, PoseBones, PoseBone, isRestPoseNotAnimPose)
+    File.write("\t\tpos { %.9f, %.9f, %.9f }\n" % (loc[0], loc[1], loc[2]))
+    File.write("\t\trot { %.9f, %.9f, %.9f, %.9f }\n" % (quat.w, quat.x, quat.y, quat.z))
+
+    if isRestPoseNotAnimPose:
+        File.write("\t}\n")
+
+
+def GetBonePosition(Config, Object, Bone, PoseBones, PoseBone, isRestPoseNotAnimPose):
     # Compute armature scale :
     # Many others exporter require sthe user to do Apply Scale in Object Mode to have 1,1,1 scale and so that anim data are correctly scaled
     # Here we retreive the Scale of the Armture Object.matrix_world.to_scale() and we use it to scale the bones :-)
@@ -1034,20 +1185,12 @@ def WriteBonePosition(Config, Object, Bone, PoseBones, PoseBone, File, isRestPos
     armScale = Object.matrix_world.to_scale()
     armRot = Object.matrix_world.to_quaternion()
     if isRestPoseNotAnimPose:
-        #skel file, bone header
-        File.write("\tCIwAnimBone\n")
-        File.write("\t{\n")
-        File.write("\t\tname \"%s\"\n" % StripBoneName(Bone.name))
         #get bone local matrix for rest pose
         if Bone.parent:
-            File.write("\t\tparent \"%s\"\n" % StripBoneName(Bone.parent.name))
             localmat = Bone.parent.matrix_local.inverted() * Bone.matrix_local
         else:
             localmat = Bone.matrix_local
     else:
-        #anim file, bone header
-        File.write("\t\t\n")
-        File.write("\t\tbone \"%s\" \n" % StripBoneName(Bone.name))
         localmat = PoseBone.matrix
         #get bone local matrix for current anim pose
         if Bone.parent:
@@ -1075,11 +1218,7 @@ def WriteBonePosition(Config, Object, Bone, PoseBones, PoseBone, File, isRestPos
     loc.y *= (armScale.y * Config.Scale)
     loc.z *= (armScale.z * Config.Scale)
 
-    File.write("\t\tpos { %.9f, %.9f, %.9f }\n" % (loc[0], loc[1], loc[2]))
-    File.write("\t\trot { %.9f, %.9f, %.9f, %.9f }\n" % (quat.w, quat.x, quat.y, quat.z))
-
-    if isRestPoseNotAnimPose:
-        File.write("\t}\n")
+    return loc, quat
 
 
 def WriteKeyedAnimationSet(Config, Scene):
@@ -1220,7 +1359,11 @@ def WriteKeyedAnimationSet(Config, Scene):
                               % (Scene.frame_end, Scene.frame_preview_end)
                         print " => You might need to change the Scene End Frame, to match the current UI preview frame end...\n=> if you don't want to miss end of animation.\n"
 
-                if len(keyframeTimes):
+                if len(keyframeTimes) and Config.OutputFormat == 1:
+                    WriteBoneAnimationBinary(Config, Scene, Object, animFileName, keyframeTimes)
+                elif len(keyframeTimes) and Config.ParallelAnimation:
+                    WriteBoneAnimationParallel(Config, Scene, Object, animFileName, keyframeTimes)
+                elif len(keyframeTimes):
                     #Create the anim file
                     animfullname = os.path.dirname(Config.FilePath) + os.sep + "anims" + os.sep + "%s.anim" % animFileName
                     ensure_dir(animfullname)
@@ -1267,6 +1410,135 @@ def WriteKeyedAnimationSet(Config, Scene):
 
 
 
+# Evaluates all the frames in one pass: pos(3) rot(4) of every pose bone, frame after frame, in one preallocated array
+# returns the array, and the Stride (values per frame)
+def SampleBoneAnimation(Config, Scene, Object, keyframeTimes):
+    PoseBones = Object.pose.bones
+    Bones = Object.data.bones
+    Stride = 7 * len(PoseBones)
+    Values = array("d", [0.0]) * (Stride * len(keyframeTimes))
+    Offset = 0
+    for KeyframeTime in keyframeTimes:
+        Scene.frame_set(KeyframeTime)
+        for PoseBone in PoseBones:
+            loc, quat = GetBonePosition(Config, Object, Bones[PoseBone.name], PoseBones, PoseBone, False)
+            Values[Offset:Offset + 7] = array("d", (loc[0], loc[1], loc[2], quat.w, quat.x, quat.y, quat.z))
+            Offset += 7
+    return Values, Stride
+
+
+# Key reduction: returns the indices of the frames to keep, a frame is dropped when all the values of the frames
+# between the previous kept frame and the next one are within Tolerance of the linear interpolation
+def ReduceLinearKeys(keyframeTimes, Values, Stride, Tolerance):
+    #Indices of the keys to keep. Values holds Stride channels per key; a key is dropped while the line
+    #from the last kept key to the next one stays within Tolerance of every key in between, on all channels.
+    #Single pass: for each channel keep the range of slopes from the last kept key that pass all the
+    #skipped keys, and check the slope to each new key against it
+    Count = len(keyframeTimes)
+    if Tolerance <= 0 or Count < 3:
+        return list(xrange(Count))
+
+    if numpy:
+        Keys = numpy.asarray(Values, dtype=numpy.float64).reshape(Count, Stride)
+        Unbounded = numpy.full(Stride, numpy.inf)
+    else:
+        Keys = [Values[Frame * Stride:(Frame + 1) * Stride] for Frame in xrange(Count)]
+        Unbounded = [float("inf")] * Stride
+    NoBound = [-Bound for Bound in Unbounded] if not numpy else -Unbounded
+
+    Kept = [0]
+    Anchor = Keys[0]
+    Low, High = NoBound, Unbounded
+    for Frame in xrange(2, Count):
+        Start = keyframeTimes[Kept[-1]]
+        Skipped, Span = Keys[Frame - 1], keyframeTimes[Frame - 1] - Start
+        Slope, End = Keys[Frame], keyframeTimes[Frame] - Start
+        if numpy:
+            Low = numpy.maximum(Low, (Skipped - Tolerance - Anchor) / Span)
+            High = numpy.minimum(High, (Skipped + Tolerance - Anchor) / Span)
+            Slope = (Slope - Anchor) / End
+            Linear = not ((Slope < Low).any() or (Slope > High).any())
+        else:
+            Low = [max(L, (S - Tolerance - A) / Span) for L, S, A in zip(Low, Skipped, Anchor)]
+            High = [min(H, (S + Tolerance - A) / Span) for H, S, A in zip(High, Skipped, Anchor)]
+            Linear = all(L <= (V - A) / End <= H for L, H, V, A in zip(Low, High, Slope, Anchor))
+        if not Linear:
+            Kept.append(Frame - 1)
+            Anchor = Keys[Frame - 1]
+            Low, High = NoBound, Unbounded
+    Kept.append(Count - 1)
+    return Kept
+
+
+def WriteBoneAnimationParallel(Config, Scene, Object, animFileName, keyframeTimes):
+    #Create the anim file, frames are sampled first, then the text blocks are formatted on a thread pool
+    animfullname = os.path.dirname(Config.FilePath) + os.sep + "anims" + os.sep + "%s.anim" % animFileName
+    ensure_dir(animfullname)
+    BoneNames = [StripBoneName(PoseBone.name) for PoseBone in Object.pose.bones]
+    Values, Stride = SampleBoneAnimation(Config, Scene, Object, keyframeTimes)
+    Kept = ReduceLinearKeys(keyframeTimes, Values, Stride, Config.AnimKeyTolerance)
+    if Config.Verbose:
+        print "      Creating anim file (bones animation) %s\n" % (animfullname)
+        print "      Frame count %d (%d after key reduction)\n" % (len(keyframeTimes), len(Kept))
+
+    def FormatFrame(Frame):
+        KeyframeTime = keyframeTimes[Frame]
+        Block = ["\tCIwAnimKeyFrame\n\t{\n\t\ttime %.2f // frame num %d \n" % (KeyframeTime / Config.AnimFPS, KeyframeTime)]
+        Offset = Frame * Stride
+        for BoneName in BoneNames:
+            Block.append("\t\t\n\t\t\n\t\tbone \"%s\" \n" % BoneName)
+            Block.append("\t\tpos { %.9f, %.9f, %.9f }\n" % tuple(Values[Offset:Offset + 3]))
+            Block.append("\t\trot { %.9f, %.9f, %.9f, %.9f }\n" % tuple(Values[Offset + 3:Offset + 7]))
+            Offset += 7
+        Block.append("\t}\n")
+        return "".join(Block)
+
+    Pool = ThreadPool()
+    try:
+        Blocks = Pool.map(FormatFrame, Kept)
+    finally:
+        Pool.close()
+        Pool.join()
+
+    animFile = open(animfullname, "w")
+    animFile.write('// anim file exported from : %r\n' % os.path.basename(bpy.data.filepath))
+    animFile.write("CIwAnim\n")
+    animFile.write("{\n")
+    animFile.write("\tskeleton \"%s\"\n" % (StripName(Object.name)))
+    animFile.write("\t\t\n")
+
+    Config.File.write("\t\".\\anims\\%s.anim\"\n" % animFileName)
+
+    animFile.write("".join(Blocks))
+    animFile.write("}\n")
+    animFile.close()
+
+
+def WriteBoneAnimationBinary(Config, Scene, Object, animFileName, keyframeTimes):
+    #Create the binary anim file
+    animfullname = os.path.dirname(Config.FilePath) + os.sep + "anims" + os.sep + "%s.animb" % animFileName
+    ensure_dir(animfullname)
+    Values, Stride = SampleBoneAnimation(Config, Scene, Object, keyframeTimes)
+    Kept = ReduceLinearKeys(keyframeTimes, Values, Stride, Config.AnimKeyTolerance)
+    if Config.Verbose:
+        print "      Creating binary anim file (bones animation) %s\n" % (animfullname)
+        print "      Frame count %d (%d after key reduction)\n" % (len(keyframeTimes), len(Kept))
+    animFile = open(animfullname, "wb")
+    WriteBinaryHeader(animFile, BINARY_ANIM_MAGIC)
+    WriteBinaryString(animFile, StripName(Object.name))
+    animFile.write(struct.pack("<I", len(Object.pose.bones)))
+    for PoseBone in Object.pose.bones:
+        WriteBinaryString(animFile, StripBoneName(PoseBone.name))
+
+    Config.File.write("\t\".\\anims\\%s.animb\"\n" % animFileName)
+
+    WriteBinaryArray(animFile, "f", [keyframeTimes[Frame] / Config.AnimFPS for Frame in Kept])
+    if len(Kept) < len(keyframeTimes):
+        Values = [Value for Frame in Kept for Value in Values[Frame * Stride:(Frame + 1) * Stride]]
+    WriteBinaryArray(animFile, "f", Values)
+    animFile.close()
+
+
 ################## Utilities
 
 def StripBoneName(name):
@@ -1322,6 +1594,11 @@ ExportModes = (
     ("2", "Selected Objects", ""),
     )
 
+OutputFormats = (
+    ("0", "Text", ""),
+    ("1", "Packed Binary", ""),
+    )
+
 MergeModes = (
     ("0", "None", ""),
     ("1", "Merge in one big Mesh", ""),
@@ -1329,7 +1606,7 @@ MergeModes = (
     )
 
 
-from bpy.props import StringProperty, EnumProperty, BoolProperty, IntProperty
+from bpy.props import StringProperty, EnumProperty, BoolProperty, IntProperty, FloatProperty
 
 
 class MarmaladeExporter(bpy.types.Operator):
@@ -1414,6 +1691,29 @@ class MarmaladeExporter(bpy.types.Operator):
         items=CoordinateSystems,
         default="1")
 
+    OutputFormat = EnumProperty(
+        name="Output Format",
+        description="Text writes the Marmalade geo/skin/anim formats. Packed Binary writes the same data as " \
+                    "little endian arrays (.geob/.skinb/.animb), faster to write and load for custom loaders",
+        items=OutputFormats,
+        default="0")
+
+    ParallelAnimation = BoolProperty(
+        name="Parallel Animation Write",
+        description="Evaluate all the animation frames in one pass, then format the anim file on several threads",
+        default=True)
+
+    AnimKeyTolerance = FloatProperty(
+        name="Key Reduction Tolerance",
+        description="Drop animation frames that are within this tolerance of the interpolation of their neighbours " \
+                    "(0 keeps all frames, used by Parallel Animation Write and the Packed Binary format)",
+        default=0.0, min=0.0, max=1.0, precision=5)
+
+    WeldTolerance = FloatProperty(
+        name="Weld Tolerance",
+        description="Normals, UVs and vertex colors closer than this are merged into one entry of the geo file (0 merges exact duplicates only)",
+        default=0.0, min=0.0, max=0.1, precision=5)
+
     Verbose = BoolProperty(
         name="Verbose",
         description="Run the exporter in debug mode. Check the console for output",
@@ -1439,6 +1739,10 @@ class MarmaladeExporter(bpy.types.Operator):
                                          ExportAnimationActions=self.ExportAnimationActions,
                                          ExportMode=self.ExportMode,
                                          MergeModes=self.MergeModes,
+                                         WeldTolerance=self.WeldTolerance,
+                                         OutputFormat=self.OutputFormat,
+                                         ParallelAnimation=self.ParallelAnimation,
+                                         AnimKeyTolerance=self.AnimKeyTolerance,
                                          Verbose=self.Verbose)
 
         # Exit edit mode before exporting, so current object states are exported properly.
@@ -34,6 +34,11 @@ bl_info = {
 
 import bpy,struct,math,os
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 MAX_QPATH = 64
 
 MD3_IDENT = "IDP3"
@@ -103,6 +108,55 @@ class md3Vert(object):
         data = struct.pack(self.binaryFormat, tmpData[0], tmpData[1], tmpData[2], tmpData[3])
         file.write(data)
 
+class md3VertBlock(object):
+    # all the verts of a surface for one frame, encoded and saved in one go
+    data = None
+
+    if numpy:
+        binaryFormat = numpy.dtype([('xyz', '<i2', 3), ('normal', '<u2')])
+
+    def __init__(self):
+        self.data = None
+
+    def GetSize(self):
+        return len(self.data) * self.binaryFormat.itemsize
+
+    # same encoding as md3Vert.Encode, for a (n, 3) array of normals
+    def Encode(self, normals):
+        normals = numpy.asarray(normals, dtype=numpy.float64)
+        l = numpy.sqrt((normals * normals).sum(axis=1))
+        zero = (l == 0)
+        l[zero] = 1.0
+        x = normals[:, 0] / l
+        y = normals[:, 1] / l
+        z = numpy.clip(normals[:, 2] / l, -1.0, 1.0)
+
+        lng = numpy.arccos(z) * 255 / (2 * math.pi)
+        lat = numpy.arctan2(y, x) * 255 / (2 * math.pi)
+        retval = ((lat.astype(numpy.int64) & 0xFF) << 8) | (lng.astype(numpy.int64) & 0xFF)
+
+        pole = (x == 0.0) & (y == 0.0)
+        retval[pole] = numpy.where(z[pole] > 0.0, 0, 128 << 8)
+        retval[zero] = 0
+        return retval
+
+    def Set(self, xyz, normals):
+        self.data = numpy.zeros(len(xyz), dtype=self.binaryFormat)
+        self.data['xyz'] = (numpy.asarray(xyz) * MD3_XYZ_SCALE).astype(numpy.int64)
+        self.data['normal'] = self.Encode(normals)
+
+    def ToVerts(self):
+        verts = []
+        for xyz, normal in self.data:
+            nvert = md3Vert()
+            nvert.xyz = [c / MD3_XYZ_SCALE for c in xyz]
+            nvert.normal = int(normal)
+            verts.append(nvert)
+        return verts
+
+    def Save(self, file):
+        file.write(self.data.tostring())
+
 class md3TexCoord(object):
     u = 0.0
     v = 0.0
@@ -483,7 +537,13 @@ def print_md3(log,md3,dumpall):
         message(log,"  U: " + str(uv.u))
         message(log,"  V: " + str(uv.v))
       message(log," Verts:")
-      for vert in s.verts:
+      verts = []
+      for v in s.verts:
+        if isinstance(v, md3VertBlock):
+          verts.extend(v.ToVerts())
+        else:
+          verts.append(v)
+      for vert in verts:
         message(log,"  XYZ: " + str(vert.xyz[0]) + " " + str(vert.xyz[1]) + " " + str(vert.xyz[2]))
         message(log,"  Normal: " + str(vert.normal))
 
@@ -531,6 +591,9 @@ def save_md3(settings):
       nsurface.ident = MD3_IDENT
 
       vertlist = []
+      # (vert index, rounded uv) -> surface vertex index, or vert index alone when uvs are ignored
+      vertmap = {}
+      uvdata = obj.data.active_uv_texture.data
 
       for f,face in enumerate(obj.data.faces):
         ntri = md3Triangle()
@@ -539,22 +602,17 @@ def save_md3(settings):
           continue
 
         for v,vert_index in enumerate(face.verts):
-          uv_u = round(obj.data.active_uv_texture.data[f].uv[v][0],5)
-          uv_v = round(obj.data.active_uv_texture.data[f].uv[v][1],5)
-
-          match = 0
-          match_index = 0
-          for i,vi in enumerate(vertlist):
-            if vi == vert_index:
-              if settings.ignoreuvs:
-                match = 1#there is a uv match for all
-                match_index = i
-              else:
-                if nsurface.uv[i].u == uv_u and nsurface.uv[i].v == uv_v:
-                  match = 1
-                  match_index = i
-
-          if match == 0:
+          uv_u = round(uvdata[f].uv[v][0],5)
+          uv_v = round(uvdata[f].uv[v][1],5)
+
+          if settings.ignoreuvs:
+            key = vert_index
+          else:
+            key = (vert_index, uv_u, uv_v)
+          match_index = vertmap.get(key)
+
+          if match_index is None:
+            vertmap[key] = nsurface.numVerts
             vertlist.append(vert_index)
             ntri.indexes[v] = nsurface.numVerts
             ntex = md3TexCoord()
@@ -579,27 +637,48 @@ def save_md3(settings):
         nsurface.shaders.append(nshader)
         nsurface.numShaders += 1
 
+      offset = (settings.offsetx, settings.offsety, settings.offsetz)
       for frame in xrange(bpy.context.scene.frame_start,bpy.context.scene.frame_end + 1):
         bpy.context.scene.set_frame(frame)
         fobj = obj.create_mesh(bpy.context.scene,True,'PREVIEW')
         fobj.calc_normals()
         nframe = md3Frame()
         nframe.name = str(frame)
-        for vi in vertlist:
-            vert = fobj.verts[vi]
-            nvert = md3Vert()
-            nvert.xyz = vert.co * obj.matrix_world
-            nvert.xyz[0] = (round(nvert.xyz[0] + obj.matrix_world[3][0],5) * settings.scale) + settings.offsetx
-            nvert.xyz[1] = (round(nvert.xyz[1] + obj.matrix_world[3][1],5) * settings.scale) + settings.offsety
-            nvert.xyz[2] = (round(nvert.xyz[2] + obj.matrix_world[3][2],5) * settings.scale) + settings.offsetz
-            nvert.normal = nvert.Encode(vert.normal)
-            for i in xrange(0,3):
-              nframe.mins[i] = min(nframe.mins[i],nvert.xyz[i])
-              nframe.maxs[i] = max(nframe.maxs[i],nvert.xyz[i])
-            minlength = math.sqrt(math.pow(nframe.mins[0],2) + math.pow(nframe.mins[1],2) + math.pow(nframe.mins[2],2))
-            maxlength = math.sqrt(math.pow(nframe.maxs[0],2) + math.pow(nframe.maxs[1],2) + math.pow(nframe.maxs[2],2))
-            nframe.radius = round(max(minlength,maxlength),5)
-            nsurface.verts.append(nvert)
+        # snapshot the frame's coordinates and normals once, then pick the exported verts from it
+        numverts = len(fobj.verts)
+        co = [0.0] * (numverts * 3)
+        no = [0.0] * (numverts * 3)
+        fobj.verts.foreach_get("co", co)
+        fobj.verts.foreach_get("normal", no)
+        mat = obj.matrix_world
+        if numpy:
+          # whole frame at once: transform, bounds, normal encoding and a single packed block
+          vindex = numpy.array(vertlist, dtype=numpy.int64)
+          nco = numpy.array(co).reshape(-1, 3)[vindex]
+          nno = numpy.array(no).reshape(-1, 3)[vindex]
+          nmat = numpy.array([[mat[r][c] for c in xrange(0,3)] for r in xrange(0,4)])
+          xyz = numpy.round(nco.dot(nmat[:3]) + nmat[3],5) * settings.scale + numpy.array(offset)
+          if len(xyz):
+            nframe.mins = list(numpy.minimum(xyz.min(axis=0), 0.0))
+            nframe.maxs = list(numpy.maximum(xyz.max(axis=0), 0.0))
+          nblock = md3VertBlock()
+          nblock.Set(xyz, nno)
+          nsurface.verts.append(nblock)
+        else:
+          for vi in vertlist:
+              x, y, z = co[vi * 3:vi * 3 + 3]
+              nvert = md3Vert()
+              nvert.xyz = [0.0, 0.0, 0.0]
+              for i in xrange(0,3):
+                # row vector * matrix, as vert.co * obj.matrix_world
+                nvert.xyz[i] = (round(x * mat[0][i] + y * mat[1][i] + z * mat[2][i] + mat[3][i],5) * settings.scale) + offset[i]
+                nframe.mins[i] = min(nframe.mins[i],nvert.xyz[i])
+                nframe.maxs[i] = max(nframe.maxs[i],nvert.xyz[i])
+              nvert.normal = nvert.Encode(no[vi * 3:vi * 3 + 3])
+              nsurface.verts.append(nvert)
+        minlength = math.sqrt(math.pow(nframe.mins[0],2) + math.pow(nframe.mins[1],2) + math.pow(nframe.mins[2],2))
+        maxlength = math.sqrt(math.pow(nframe.maxs[0],2) + math.pow(nframe.maxs[1],2) + math.pow(nframe.maxs[2],2))
+        nframe.radius = round(max(minlength,maxlength),5)
         md3.frames.append(nframe)
         nsurface.numFrames += 1
         bpy.data.meshes.remove(fobj)
@@ -61,7 +61,7 @@ import bgl
 import mathutils as M
 from re import compile as re_compile
 from itertools import chain
-from math import pi
+from math import pi, floor
 from itertools import izip
 from io import open
 
@@ -214,7 +214,10 @@ class Unfolder(object):
         # finalizing islands will scale everything so that the page height is 1
         # title height must be somewhat larger that text size, glyphs go below the baseline
         self.mesh.finalize_islands(title_height=text_height * 1.2)
-        self.mesh.fit_islands(cage_size=printable_size)
+        if properties.island_packing == 'MAXRECTS':
+            self.mesh.pack_islands(cage_size=printable_size, allow_rotation=properties.do_rotate_islands)
+        else:
+            self.mesh.fit_islands(cage_size=printable_size)
 
         if properties.output_type != 'NONE':
             # bake an image and save it as a PNG to disk or into memory
@@ -295,8 +298,10 @@ class Mesh(object):
                 if island_a is not island_b:
                     if len(island_b.faces) > len(island_a.faces):
                         island_a, island_b = island_b, island_a
-                    if island_a.join(island_b, edge, size_limit=page_size):
+                    if island_a.join(island_b, edge, size_limit=page_size, grid_size=average_length):
                         islands.remove(island_b)
+            for island in islands:
+                island.boundary_grid = None
 
         self.islands = sorted(islands, reverse=True, key=lambda island: len(island.faces))
 
@@ -520,6 +525,80 @@ class Mesh(object):
             remaining_islands = [island for island in remaining_islands if island not in page.islands]
             self.pages.append(page)
 
+    def pack_islands(self, cage_size, allow_rotation=False):
+        """Move islands so that they fit onto pages, packing their bounding boxes by MaxRects"""
+
+        def title_height(island):
+            """Get the space that finalize_islands left below the island"""
+            return min(point.y for point in chain((vertex.co for vertex in island.verts), island.fake_verts))
+
+        def score(rect, size):
+            """Best Short Side Fit: prefer the free rectangle that leaves the least space along some side"""
+            left_x, left_y = rect[2] - size.x, rect[3] - size.y
+            if left_x < 0 or left_y < 0:
+                return None
+            return (left_x, left_y) if left_x < left_y else (left_y, left_x)
+
+        def split(free_rects, x, y, size):
+            """Cut the given box out of all free rectangles, keep only maximal ones"""
+            result = list()
+            for rect in free_rects:
+                rx, ry, rw, rh = rect
+                if x >= rx + rw or x + size.x <= rx or y >= ry + rh or y + size.y <= ry:
+                    result.append(rect)
+                    continue
+                if x > rx:
+                    result.append((rx, ry, x - rx, rh))
+                if x + size.x < rx + rw:
+                    result.append((x + size.x, ry, rx + rw - x - size.x, rh))
+                if y > ry:
+                    result.append((rx, ry, rw, y - ry))
+                if y + size.y < ry + rh:
+                    result.append((rx, y + size.y, rw, ry + rh - y - size.y))
+            result.sort(reverse=True, key=lambda rect: rect[2] * rect[3])
+            maximal = list()
+            for rect in result:
+                rx, ry, rw, rh = rect
+                if not any(ox <= rx and oy <= ry and rx + rw <= ox + ow and ry + rh <= oy + oh
+                        for ox, oy, ow, oh in maximal):
+                    maximal.append(rect)
+            return maximal
+
+        options_by_island = dict()
+        for island in self.islands:
+            options = [(island.bounding_box.xy, None)]
+            if allow_rotation:
+                title = title_height(island)
+                options.append((M.Vector((island.bounding_box.y - title, island.bounding_box.x + title)), title))
+            options = [(size, title) for size, title in options if size.x <= cage_size.x and size.y <= cage_size.y]
+            if not options:
+                raise UnfoldError("An island is too big to fit onto page of the given size. "
+                    "Either downscale the model or find and split that island manually.\n"
+                    "Export failed, sorry.")
+            options_by_island[island] = options
+
+        # free rectangles of each page, in the order of self.pages
+        free_by_page = list()
+        for island in sorted(self.islands, reverse=True, key=lambda island: island.bounding_box.x * island.bounding_box.y):
+            for page_index, free_rects in enumerate(chain(free_by_page, [[(0, 0, cage_size.x, cage_size.y)]])):
+                best = None
+                for rect in free_rects:
+                    for size, title in options_by_island[island]:
+                        rank = score(rect, size)
+                        if rank is not None and (best is None or rank < best[0]):
+                            best = rank, rect, size, title
+                if best:
+                    break
+            rank, rect, size, title = best
+            if page_index == len(free_by_page):
+                free_by_page.append(free_rects)
+                self.pages.append(Page(page_index + 1))
+            if title is not None:
+                island.rotate_quarter(title)
+            island.pos.xy = rect[0], rect[1]
+            self.pages[page_index].islands.append(island)
+            free_rects[:] = split(free_rects, rect[0], rect[1], size)
+
     def save_uv(self, cage_size=M.Vector((1, 1)), separate_image=False, tex=None):
         # TODO: mode switching should be handled by higher-level code
         bpy.ops.object.mode_set()
@@ -766,7 +845,7 @@ class Face(object):
 
 class Island(object):
     """Part of the net to be exported"""
-    __slots__ = ('faces', 'edges', 'verts', 'fake_verts', 'uvverts_by_id', 'boundary', 'markers',
+    __slots__ = ('faces', 'edges', 'verts', 'fake_verts', 'uvverts_by_id', 'boundary', 'boundary_grid', 'markers',
         'pos', 'bounding_box',
         'image_path', 'embedded_image',
         'number', 'label', 'abbreviation', 'title',
@@ -799,11 +878,14 @@ class Island(object):
         self.uvverts_by_id = dict((uvvertex.vertex.index, [uvvertex]) for uvvertex in self.verts)
         # UVEdges on the boundary
         self.boundary = list(self.edges)
+        # speedup for Island.join: the same UVEdges, indexed by position
+        self.boundary_grid = None
 
-    def join(self, other, edge, size_limit=None, epsilon=1e-6):
+    def join(self, other, edge, size_limit=None, epsilon=1e-6, grid_size=None):
         """
         Try to join other island on given edge
         Returns False if they would overlap
+        grid_size: if given, keep a BoundaryGrid of this island so that only nearby segments are checked
         """
 
         class Intersection(Exception):
@@ -1003,9 +1085,20 @@ class Island(object):
             for uvedge in other.boundary if uvedge not in merged_uvedges]
         # TODO: if is_merged_mine, it might make sense to create a similar list from self.boundary as well
 
+        # own boundary was checked in previous joins, so only segments near the other island can collide
+        # (small islands are faster to check all at once)
+        if grid_size and self.boundary_grid is None and len(self.boundary) > BoundaryGrid.min_segments:
+            self.boundary_grid = BoundaryGrid(self.boundary, grid_size)
+        if self.boundary_grid is not None:
+            xs = [vertex.co.x for vertex in phantoms.values()]
+            ys = [vertex.co.y for vertex in phantoms.values()]
+            boundary_near = self.boundary_grid.near(min(xs), min(ys), max(xs), max(ys))
+        else:
+            boundary_near = self.boundary
+
         incidence = set(vertex.tup for vertex in phantoms.values()).intersection(vertex.tup for vertex in self.verts)
         incidence = dict((position, list()) for position in incidence)  # from now on, 'incidence' is a dict
-        for uvedge in chain(boundary_other, self.boundary):
+        for uvedge in chain(boundary_other, boundary_near):
             if uvedge.va.co == uvedge.vb.co:
                 continue
             for vertex in (uvedge.va, uvedge.vb):
@@ -1028,10 +1121,10 @@ class Island(object):
         try:
             try:
                 sweepline = QuickSweepline() if self.has_safe_geometry and other.has_safe_geometry else BruteSweepline()
-                sweep(sweepline, (uvedge for uvedge in chain(boundary_other, self.boundary)))
+                sweep(sweepline, (uvedge for uvedge in chain(boundary_other, boundary_near)))
                 self.has_safe_geometry &= other.has_safe_geometry
             except GeometryError:
-                sweep(BruteSweepline(), (uvedge for uvedge in chain(boundary_other, self.boundary)))
+                sweep(BruteSweepline(), (uvedge for uvedge in chain(boundary_other, boundary_near)))
                 self.has_safe_geometry = False
         except Intersection:
             return False
@@ -1084,6 +1177,9 @@ class Island(object):
 
         self.boundary = [uvedge for uvedge in
             chain(self.boundary, other.boundary) if uvedge not in merged_uvedges]
+        if self.boundary_grid is not None:
+            self.boundary_grid.remove(merged_uvedges)
+            self.boundary_grid.add(uvedge for uvedge in other.boundary if uvedge not in merged_uvedges)
 
         for uvedge, partner in merged_uvedge_pairs:
             # make sure that main faces are the ones actually merged (this changes nothing in most cases)
@@ -1096,6 +1192,19 @@ class Island(object):
         self.fake_verts.extend(marker.bounds)
         self.markers.append(marker)
 
+    def rotate_quarter(self, title_height=0):
+        """Turn the island by 90 degrees counterclockwise, keeping the space for title below it"""
+        points = list(vertex.co for vertex in self.verts) + self.fake_verts
+        rot = M.Matrix(((0, -1), (1, 0)))
+        for point in points:
+            point[:] = rot * point
+        for marker in self.markers:
+            marker.rot = rot * marker.rot
+        offset = M.Vector((self.bounding_box.y, title_height))
+        for point in points:
+            point += offset
+        self.bounding_box = M.Vector((self.bounding_box.y - title_height, self.bounding_box.x + title_height))
+
     def generate_label(self, label=None, abbreviation=None):
         """Assign a name to this island automatically"""
         abbr = abbreviation or self.abbreviation or str(self.number)
@@ -1201,6 +1310,63 @@ class PhantomUVEdge(object):
         return "[{0.va} - {0.vb}]".format(self)
 
 
+class BoundaryGrid(object):
+    """Uniform grid of 2D segments (UVEdges) for finding those close to a given rectangle"""
+    __slots__ = ('size', 'cells', 'segments', 'counter')
+    min_segments = 64
+
+    def __init__(self, segments, size):
+        self.size = size
+        self.cells = dict()  # (x, y) -> set of segments
+        self.segments = dict()  # segment -> (insertion order, list of its cells)
+        self.counter = 0
+        self.add(segments)
+
+    def cell_range(self, left, bottom, right, top):
+        size = self.size
+        return (xrange(int(floor(left / size)), int(floor(right / size)) + 1),
+            xrange(int(floor(bottom / size)), int(floor(top / size)) + 1))
+
+    def add(self, segments):
+        for segment in segments:
+            columns, rows = self.cell_range(segment.min.tup[0], segment.bottom, segment.max.tup[0], segment.top)
+            cells = [(x, y) for x in columns for y in rows]
+            for cell in cells:
+                bucket = self.cells.get(cell)
+                if bucket is None:
+                    self.cells[cell] = set((segment,))
+                else:
+                    bucket.add(segment)
+            self.segments[segment] = self.counter, cells
+            self.counter += 1
+
+    def remove(self, segments):
+        for segment in segments:
+            order, cells = self.segments.pop(segment, (None, ()))
+            for cell in cells:
+                bucket = self.cells[cell]
+                bucket.discard(segment)
+                if not bucket:
+                    del self.cells[cell]
+
+    def near(self, left, bottom, right, top):
+        """Get all segments whose bounding box touches the given rectangle, in the order they were added"""
+        columns, rows = self.cell_range(left, bottom, right, top)
+        if len(columns) * len(rows) > len(self.cells):
+            candidates = self.segments
+        else:
+            candidates = set()
+            for x in columns:
+                for y in rows:
+                    bucket = self.cells.get((x, y))
+                    if bucket:
+                        candidates.update(bucket)
+        result = [segment for segment in candidates if segment.min.tup[0] <= right and segment.max.tup[0] >= left
+            and segment.bottom <= top and segment.top >= bottom]
+        result.sort(key=lambda segment: self.segments[segment][0])
+        return result
+
+
 class UVFace(object):
     """Face in 2D"""
     __slots__ = ('verts', 'edges', 'face', 'island', 'flipped', 'uvvertex_by_id')
@@ -1800,6 +1966,15 @@ class ExportPaperModel(bpy.types.Operator):
     output_dpi = bpy.props.FloatProperty(name="Resolution (DPI)",
         description="Resolution of images in pixels per inch",
         default=90, min=1, soft_min=30, soft_max=600, subtype="UNSIGNED")
+    island_packing = bpy.props.EnumProperty(name="Island Packing Method",
+        description="Method of arranging the islands on pages",
+        default='MAXRECTS', items=[
+            ('MAXRECTS', "Free Space", "Put each island into the best fitting free space left on the pages (fast)"),
+            ('STOPS', "Corners", "Try the corners of already placed islands, one page at a time (slow for many islands)")
+        ])
+    do_rotate_islands = bpy.props.BoolProperty(name="Rotate Islands",
+        description="Allow turning islands by 90 degrees to fit them onto fewer pages",
+        default=True)
     image_packing = bpy.props.EnumProperty(name="Image Packing Method",
         description="Method of attaching baked image(s) to the SVG",
         default='ISLAND_EMBED', items=[
@@ -1899,6 +2074,10 @@ class ExportPaperModel(bpy.types.Operator):
             col.prop(self.properties, "output_size_x")
             col.prop(self.properties, "output_size_y")
             box.prop(self.properties, "output_margin")
+            box.prop(self.properties, "island_packing", text="Islands")
+            col = box.column()
+            col.active = self.island_packing == 'MAXRECTS'
+            col.prop(self.properties, "do_rotate_islands")
             col = box.column()
             col.prop(self.properties, "do_create_stickers")
             col.prop(self.properties, "do_create_numbers")
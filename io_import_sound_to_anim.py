@@ -21,7 +21,7 @@
 bl_info = {
     "name": "Import: Sound to Animation",
     "author": "Vlassius",
-    "version": (0, 70),
+    "version": (0, 71),
     "blender": (2, 64, 0),
     "location": "Select a object > Object tab > Import Movement From Wav File",
     "description": "Extract movement from sound file. "
@@ -38,10 +38,19 @@ bl_info = {
 - NOTES:
 - This script takes a wav file and get sound "movement" to help you in sync the movement to words in the wave file. <br>
 - Supported Audio: .wav (wave) 8 bits and 16 bits - mono and multichanel file<br>
+- With numpy: .wav 24 bits, 32 bits and float too<br>
 - At least Blender 2.64.9 is necessary to run this program.
 - Curitiba - Brasil
 
 
+-v 0.71Beta-
+    Included: Envelope engine with numpy - the whole wav is processed in one pass (no more timer loops)
+    Included: 24 bits, 32 bits and float .wav support (numpy)
+    Included: Peak or RMS envelope option
+    Included: Fast Import - Mesh, Camera and Empty keys written straight into the F-Curves, with optional decimation
+    Included: Frequency Band envelope (numpy FFT) - bass, mid, high... imported separately
+    Included: Frequency Bands cache on disk - process the same wav again for other objects/bands without the FFT
+
 -v 0.70Beta-
     Included: SmartRender - Render just the frames that has changes
     Included: Options to check SmartRender for Blender Internal Render Engine:LocRotScale, Material, Transp, Mirror
@@ -148,6 +157,15 @@ import bpy
 from bpy.props import *
 #from io_utils import ImportHelper
 import wave
+import struct
+import os
+import hashlib
+import tempfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 #para deixar global
 def _Interna_Globals(BytesDadosTotProcess, context):
@@ -158,6 +176,195 @@ def _Interna_Globals(BytesDadosTotProcess, context):
     arrayAutoSense= bytearray((BytesDadosTotProcess)*2)  # cria array para AutoAudioSense
     context.scene.imp_sound_to_anim.bArrayCriado=True
 
+
+#
+#==================================================================================================
+# Envelope engine (numpy) - le o arquivo wav todo de uma vez
+#==================================================================================================
+#
+# formato: 1= PCM, 3= IEEE float, 0xFFFE= extensible (formato real no inicio do SubFormat)
+def WavInfo(File):
+    with open(File, 'rb') as f:
+        riff, size, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise IOError("Not a RIFF/WAVE file")
+        Fmt=None
+        while True:
+            head= f.read(8)
+            if len(head) < 8:
+                raise IOError("No data chunk found")
+            ChunkId, ChunkSize = struct.unpack('<4sI', head)
+            if ChunkId == b'fmt ':
+                body= f.read(ChunkSize + ChunkSize % 2)
+                Format, NumCh, FrameR, ByteR, BlockAlign, Bits = struct.unpack('<HHIIHH', body[:16])
+                if Format == 0xFFFE and ChunkSize >= 26:
+                    Format= struct.unpack('<H', body[24:26])[0]
+                Fmt= (Format, NumCh, (Bits+7)//8, FrameR)
+            elif ChunkId == b'data':
+                if Fmt == None:
+                    raise IOError("data chunk before fmt chunk")
+                Format, NumCh, SampW, FrameR = Fmt
+                if SampW*NumCh == 0 or FrameR == 0:
+                    raise IOError("Invalid fmt chunk")
+                # wav gravado em stream ou truncado: o tamanho do chunk pode passar do fim do arquivo
+                Offset= f.tell()
+                NumFr= min(ChunkSize, os.path.getsize(File) - Offset) // (SampW*NumCh)
+                return Format, NumCh, SampW, FrameR, NumFr, Offset
+            else:
+                f.seek(ChunkSize + ChunkSize % 2, 1)
+
+
+# valores de um canal, mesma escala do SoundConv: 8 bits sem sinal e o resto como 16 bits
+# Step= pega 1 audio frame a cada Step, Total= numero de audio frames lidos
+def WavLevels(File, Info, AudioChannel, Sensibil, bAutoSense, Step, Total):
+    Format, NumCh, SampW, FrameR, NumFr, Offset = Info
+
+    # canal x sample
+    if Format == 3:
+        Raw= numpy.memmap(File, '<f%d' % SampW, 'r', Offset, (NumFr, NumCh))
+        Samples= Raw.T[AudioChannel, :Total:Step]
+        S16= numpy.clip(Samples * 32768, -32768, 32767).astype(numpy.int32)
+    elif SampW == 1:
+        Raw= numpy.memmap(File, numpy.uint8, 'r', Offset, (NumFr, NumCh))
+        Samples= Raw.T[AudioChannel, :Total:Step].astype(numpy.int32)
+        if bAutoSense==0:
+            Samples= (Samples << (0, 2, 3, 4, 5, 6)[Sensibil]) & 255
+        return Samples
+    elif SampW == 3:
+        # 16 bits mais altos do sample de 24 bits
+        Raw= numpy.memmap(File, numpy.uint8, 'r', Offset, (NumFr, NumCh, 3))
+        Samples= Raw.transpose(1, 0, 2)[AudioChannel, :Total:Step]
+        S16= (Samples[:, 2].astype(numpy.int8).astype(numpy.int32) << 8) | Samples[:, 1]
+    else:
+        Raw= numpy.memmap(File, '<i%d' % SampW, 'r', Offset, (NumFr, NumCh))
+        S16= Raw.T[AudioChannel, :Total:Step].astype(numpy.int32) >> (SampW*8 - 16)
+
+    # como no SoundConv, so valores positivos com byte alto < 127
+    Valid= (S16 >= 0) & (S16 < 127 << 8)
+    if bAutoSense==0:
+        S16= (S16 >> (8, 6, 5, 4, 2, 0)[Sensibil]) & 255
+    return numpy.where(Valid, S16, 0)
+
+
+# samples de um canal em float -1..1, para Count janelas de Window audio frames
+def WavSamples(Raw, Format, SampW, Start, Stop):
+    Samples= Raw[Start:Stop]
+    if Format == 3:
+        return Samples.astype(numpy.float32)
+    if SampW == 1:
+        return (Samples.astype(numpy.float32) - 128) / 128
+    if SampW == 3:
+        S32= (Samples[:, 2].astype(numpy.int8).astype(numpy.int32) << 16) | \
+                                (Samples[:, 1].astype(numpy.int32) << 8) | Samples[:, 0]
+        return S32.astype(numpy.float32) / (1 << 23)
+    return Samples.astype(numpy.float32) / (1 << (SampW*8 - 1))
+
+
+# Bands x Count: magnitude de cada banda de frequencia em cada janela de Window audio frames
+# bandas em escala logaritmica de 20Hz ate Nyquist. O arquivo e lido em blocos de Block janelas
+def WavBands(File, Info, AudioChannel, Window, Count, Bands, Block=256):
+    Format, NumCh, SampW, FrameR, NumFr, Offset = Info
+
+    if Format == 3:
+        Raw= numpy.memmap(File, '<f%d' % SampW, 'r', Offset, (NumFr, NumCh))[:, AudioChannel]
+    elif SampW == 1:
+        Raw= numpy.memmap(File, numpy.uint8, 'r', Offset, (NumFr, NumCh))[:, AudioChannel]
+    elif SampW == 3:
+        Raw= numpy.memmap(File, numpy.uint8, 'r', Offset, (NumFr, NumCh, 3))[:, AudioChannel]
+    else:
+        Raw= numpy.memmap(File, '<i%d' % SampW, 'r', Offset, (NumFr, NumCh))[:, AudioChannel]
+
+    # limites das bandas em bins da FFT, pelo menos 1 bin por banda
+    Edges= numpy.geomspace(20, FrameR/2, Bands+1) * Window / FrameR
+    Edges= Edges.astype(numpy.int64)
+    Edges[0]= max(Edges[0], 1)
+    for i in xrange(1, Bands+1):
+        Edges[i]= max(Edges[i], Edges[i-1]+1)
+    Edges= numpy.minimum(Edges, Window//2 + 1)
+
+    Hann= numpy.hanning(Window).astype(numpy.float32)
+    Result= numpy.zeros((Bands, Count), numpy.float32)
+    for First in xrange(0, Count, Block):
+        Last= min(First+Block, Count)
+        Samples= WavSamples(Raw, Format, SampW, First*Window, Last*Window).reshape(Last-First, Window)
+        Power= numpy.abs(numpy.fft.rfft(Samples * Hann, axis=1))**2
+        # energia da banda= soma dos bins; a ultima coluna so serve de limite para reduceat
+        Power= numpy.concatenate((Power, numpy.zeros((Last-First, 1), Power.dtype)), axis=1)
+        Sums= numpy.add.reduceat(Power, Edges[:-1], axis=1)
+        Result[:, First:Last]= numpy.sqrt(Sums).T
+    return Result
+
+
+# cache das bandas em disco: hash do conteudo do wav + parametros da analise
+# os arquivos menos usados saem quando o cache passa de BandsCacheMaxSize bytes
+BandsCacheMaxSize= 512 << 20
+
+def BandsCacheFile(File, Key):
+    Hash= hashlib.sha1()
+    with open(File, 'rb') as f:
+        for Chunk in iter(lambda: f.read(1 << 20), b''):
+            Hash.update(Chunk)
+    Hash.update(Key.encode('ascii'))
+    Dir= os.path.join(tempfile.gettempdir(), "sound_to_anim_cache")
+    return os.path.join(Dir, Hash.hexdigest() + ".npy")
+
+
+# apaga os arquivos usados ha mais tempo ate o cache caber em MaxSize
+def BandsCacheEvict(Dir, MaxSize=BandsCacheMaxSize):
+    Entries= []
+    Total= 0
+    for Name in os.listdir(Dir):
+        if not Name.endswith(".npy"):
+            continue
+        CacheFile= os.path.join(Dir, Name)
+        try:
+            Stat= os.stat(CacheFile)
+        except OSError:
+            continue
+        Entries.append((Stat.st_mtime, Stat.st_size, CacheFile))
+        Total+= Stat.st_size
+
+    Entries.sort()
+    for MTime, Size, CacheFile in Entries:
+        if Total <= MaxSize:
+            break
+        try:
+            os.remove(CacheFile)
+        except OSError:
+            continue
+        Total-= Size
+
+
+def WavBandsCached(File, Info, AudioChannel, Window, Count, Bands, bCache):
+    if not bCache:
+        return WavBands(File, Info, AudioChannel, Window, Count, Bands)
+
+    CacheFile= BandsCacheFile(File, "bands1-%d-%d-%d-%d" % (AudioChannel, Window, Count, Bands))
+    try:
+        # o diretorio e compartilhado: nunca deserializar objetos de um arquivo de la
+        # (numpy sem allow_pickle da TypeError, e fica sem cache)
+        Result= numpy.load(CacheFile, allow_pickle=False)
+        if Result.shape == (Bands, Count):
+            print 'Frequency Bands from cache: \t', CacheFile
+            # marca como usado recentemente
+            try:
+                os.utime(CacheFile, None)
+            except OSError:
+                pass
+            return Result
+    except (IOError, OSError, ValueError, TypeError):
+        pass
+
+    Result= WavBands(File, Info, AudioChannel, Window, Count, Bands)
+    try:
+        if not os.path.isdir(os.path.dirname(CacheFile)):
+            os.makedirs(os.path.dirname(CacheFile))
+        numpy.save(CacheFile, Result)
+        BandsCacheEvict(os.path.dirname(CacheFile))
+    except (IOError, OSError), e:
+        print "Frequency Bands cache not saved: ", e
+    return Result
+
 #
 #==================================================================================================
 # BLENDER UI Panel
@@ -304,6 +511,11 @@ class VIEW3D_PT_CustomMenuPanel(bpy.types.Panel):
                 row=col.row()
                 row.prop(context.scene.imp_sound_to_anim,"action_max_value")
 
+                row=layout.row()
+                row.prop(context.scene.imp_sound_to_anim,"bulk_import")
+                if context.scene.imp_sound_to_anim.bulk_import:
+                    row.prop(context.scene.imp_sound_to_anim,"keyframe_tolerance")
+
                 row=layout.row()
 
                 row.prop(context.scene.imp_sound_to_anim,"action_offset_x")
@@ -314,6 +526,15 @@ class VIEW3D_PT_CustomMenuPanel(bpy.types.Panel):
                 row.prop(context.scene.imp_sound_to_anim,"audio_channel_select")
                 row.prop(context.scene.imp_sound_to_anim,"action_valor_igual")
 
+                if numpy:
+                    row=layout.row()
+                    row.prop(context.scene.imp_sound_to_anim,"envelope_mode")
+                    if context.scene.imp_sound_to_anim.envelope_mode == 'BANDS':
+                        row=layout.row()
+                        row.prop(context.scene.imp_sound_to_anim,"spectrum_bands")
+                        row.prop(context.scene.imp_sound_to_anim,"spectrum_band")
+                        row.prop(context.scene.imp_sound_to_anim,"spectrum_cache")
+
                 #operator button
                 #OBJECT_OT_Botao_Go => Botao_GO
                 row=layout.row()
@@ -462,6 +683,42 @@ class ImpSoundtoAnim(bpy.types.PropertyGroup):
             step=1,
             default= 1)
 
+        bulk_import = BoolProperty(name="Fast Import",
+            description="Mesh, Camera and Empty: write all the key frames at once into the F-Curves",
+            default=1)
+
+        keyframe_tolerance = FloatProperty(name="Decimate",
+            description="Fast Import: drop key frames within this distance of the line between their neighbours (0= keep all)",
+            min=0,
+            max=255,
+            step=1,
+            default= 0)
+
+        envelope_mode = EnumProperty(name="Envelope",
+            description="How the audio frames of each action are reduced to one value (Peak, RMS or one Frequency Band)",
+            items=(('PEAK', "Peak", "Highest value"),
+                   ('RMS', "RMS", "Root mean square, smoother"),
+                   ('BANDS', "Frequency Band", "Level of one frequency band (FFT). Audio Sensitivity is not used")),
+            default='PEAK')
+
+        spectrum_bands = IntProperty(name="Bands",
+            description="Number of frequency bands, from 20Hz to the highest frequency in the file",
+            min=2,
+            max=16,
+            step=1,
+            default= 3)
+
+        spectrum_band = IntProperty(name="Band",
+            description="Band to use: 1= bass ... Bands= high",
+            min=1,
+            max=16,
+            step=1,
+            default= 1)
+
+        spectrum_cache = BoolProperty(name="Cache",
+            description="Keep the frequency bands of the file on disk, to process it again without the FFT",
+            default=1)
+
         action_offset_x = FloatProperty(name="XOffset",
             description="Offset X Values",
             min=-999999,
@@ -845,6 +1102,42 @@ class OBJECT_OT_Botao_Import(bpy.types.Operator):
             print "================================================================"
             print ''
 
+        # Fast Import: as propriedades sao aplicadas direto no objeto, entao todas as keys
+        # podem ir de uma vez para as F-Curves, sem passar pelo timer
+        if obi.RunFrom==0 and context.scene.imp_sound_to_anim.bulk_import and \
+                context.scene.imp_sound_to_anim.bArrayCriado and \
+                bpy.context.active_object.type in ('MESH', 'CAMERA', 'EMPTY'):
+            ob= bpy.context.active_object
+            Frames, Values= obi.BulkValues(context, iDivScala, bNaoValorIgual, iDestructiveOptimizer, \
+                                                                        bLimitValue, iMinValue, iMaxValue)
+            Keep= obi.DecimateKeys(Frames, Values, context.scene.imp_sound_to_anim.keyframe_tolerance)
+            if len(Keep) < len(Frames):
+                print "Decimate: " + str(len(Frames)-len(Keep)) + " Key Frames removed"
+                Frames= [Frames[k] for k in Keep]
+                Values= [Values[k] for k in Keep]
+
+            if bEixo:
+                obi.WriteFCurves(ob, "location", Frames, [
+                    [v*iEixoXneg+iMinBaseX for v in Values] if bEixoX else [ob.location.x]*len(Values),
+                    [v*iEixoYneg+iMinBaseY for v in Values] if bEixoY else [ob.location.y]*len(Values),
+                    [v*iEixoZneg+iMinBaseZ for v in Values] if bEixoZ else [ob.location.z]*len(Values)])
+
+            if bEscala:
+                obi.WriteFCurves(ob, "scale", Frames, [
+                    [v*iEscalaXneg+iMinScaleBaseX for v in Values] if bEscalaX else [ob.scale.x]*len(Values),
+                    [v*iEscalaYneg+iMinScaleBaseY for v in Values] if bEscalaY else [ob.scale.y]*len(Values),
+                    [v*iEscalaZneg+iMinScaleBaseZ for v in Values] if bEscalaZ else [ob.scale.z]*len(Values)])
+
+            if bRotacao:
+                obi.WriteFCurves(ob, "rotation_euler", Frames, [
+                    [((v*iRotationNeg)+iRotationAxisBaseX)*bRotationX for v in Values],
+                    [((v*iRotationNeg)+iRotationAxisBaseY)*bRotationY for v in Values],
+                    [((v*iRotationNeg)+iRotationAxisBaseZ)*bRotationZ for v in Values]])
+
+            obi.iSumImportFrames= len(Frames)
+            obi.RunFrom= len(array)-1
+            loop= 0
+
         ilocationXAnt=0
         ilocationYAnt=0
         ilocationZAnt=0
@@ -1040,6 +1333,95 @@ class OBJECT_OT_Botao_Import(bpy.types.Operator):
                 return obi.RunFrom
 
 
+    # valores de wavimport (mesmas regras do otimizador), para todos os frames de uma vez
+    # retorna os frames com key e os valores (ival) de cada um
+    def BulkValues(context, iDivScala, bNaoValorIgual, iDestructiveOptimizer, bLimitValue, iMinValue, iMaxValue):
+        obi=OBJECT_OT_Botao_Import
+        iStartFrame= int(context.scene.imp_sound_to_anim.frames_initial)
+        Frames=[]
+        Values=[]
+        for i in xrange(len(array)-1):
+            #valor pequeno demais, vai dar zero na hora de aplicar
+            if array[i]/iDivScala < 0.001:
+                array[i]=0
+
+            arrayI= array[i]
+            arrayIP1= array[i+1]
+            arrayIL1= array[i-1]
+
+            # opcao de NAO colocar valores iguais sequenciais
+            if i>0 and bNaoValorIgual and arrayIL1== arrayI:
+                obi.iSumOptimizerP3+=1
+
+            # valor atual == anterior e posterior -> pula
+            elif i>0 and abs(arrayI - arrayIL1)<=iDestructiveOptimizer and abs(arrayI - arrayIP1)<=iDestructiveOptimizer:
+                if iDestructiveOptimizer>0 and arrayI != arrayIL1 or arrayI != arrayIP1:
+                    obi.iSumOptimizerP1+=1
+                else: obi.iSumOptimizerP2+=1
+
+            else:
+                if bLimitValue:
+                    if arrayI > iMaxValue: array[i]=iMaxValue
+                    if arrayI < iMinValue: array[i]=iMinValue
+
+                ival=array[i]/iDivScala
+                #passa para float com somente 3 digitos caso seja float
+                m_ival=ival*1000
+                if int(m_ival) != m_ival:
+                    ival= int(m_ival)
+                    ival = ival /1000
+
+                Frames.append(i+iStartFrame)
+                Values.append(ival)
+        return Frames, Values
+
+    # decimacao: indices das keys a manter. Uma key sai quando todas as keys entre a ultima
+    # mantida e a proxima ficam a menos de Tolerance da reta entre elas
+    # Uma passada so: guarda a faixa de inclinacoes a partir da ultima key mantida que passa
+    # a menos de Tolerance de todas as keys puladas, e testa a inclinacao ate cada key nova
+    def DecimateKeys(Frames, Values, Tolerance):
+        if Tolerance <= 0 or len(Frames) < 3:
+            return list(xrange(len(Frames)))
+
+        Keep=[0]
+        Baixo, Alto = float("-inf"), float("inf")
+        for k in xrange(2, len(Frames)):
+            First= Keep[-1]
+            Dt= Frames[k-1] - Frames[First]
+            Baixo= max(Baixo, (Values[k-1] - Tolerance - Values[First]) / Dt)
+            Alto= min(Alto, (Values[k-1] + Tolerance - Values[First]) / Dt)
+            Inclina= (Values[k] - Values[First]) / (Frames[k] - Frames[First])
+            if not Baixo <= Inclina <= Alto:
+                Keep.append(k-1)
+                Baixo, Alto = float("-inf"), float("inf")
+        Keep.append(len(Frames)-1)
+        return Keep
+
+    # cria (ou completa) as F-Curves de DataPath com todas as keys de uma vez
+    # Channels= uma lista de valores por eixo. Keys ja existentes em outros frames sao mantidas
+    def WriteFCurves(ob, DataPath, Frames, Channels):
+        if ob.animation_data == None:
+            ob.animation_data_create()
+        if ob.animation_data.action == None:
+            ob.animation_data.action= bpy.data.actions.new(ob.name + "Action")
+        action= ob.animation_data.action
+
+        for index, Channel in enumerate(Channels):
+            Keys= dict(zip(Frames, Channel))
+            for fc in list(action.fcurves):
+                if fc.data_path == DataPath and fc.array_index == index:
+                    Old= [0.0] * (2*len(fc.keyframe_points))
+                    fc.keyframe_points.foreach_get('co', Old)
+                    for frame, value in zip(Old[0::2], Old[1::2]):
+                        Keys.setdefault(frame, value)
+                    action.fcurves.remove(fc)
+
+            fc= action.fcurves.new(DataPath, index, "Object Transforms")
+            fc.keyframe_points.add(len(Keys))
+            fc.keyframe_points.foreach_set('co', [c for frame in sorted(Keys) for c in (frame, Keys[frame])])
+            fc.update()
+
+
     def execute(self, context):
         #wavimport(context)
         #return{'FINISHED'}
@@ -1382,6 +1764,133 @@ class OBJECT_OT_Botao_Go(bpy.types.Operator):
 
 
 
+    # mesmo resultado do SoundConv, mas le o arquivo todo de uma vez e calcula o envelope
+    # de todos os frames com numpy. Aceita tambem 24, 32 bits e float. Retorna 0 (terminou) ou False
+    def SoundEnvelope(File, DivSens, Sensibil, Resol, context, bAutoSense, bRemoveBeat, bUseBeat, bMoreSensible, \
+                                                                bLessSensible, AudioChannel, EnvelopeMode, \
+                                                                Bands=3, Band=1, bCache=True):
+        try:
+            Info= WavInfo(File)
+        except (IOError, struct.error), e:
+            print "File Open Error: ", e
+            context.scene.imp_sound_to_anim.Info_Import= "File Open Error"
+            return False
+
+        Format, NumCh, SampW, FrameR, NumFr, Offset = Info
+
+        if Format not in (1, 3) or (Format == 3 and SampW not in (4, 8)) or SampW > 4:
+            print 'Sorry, this Format is NOT Supported ', Format, SampW*8
+            context.scene.imp_sound_to_anim.Info_Import= "Sorry, this Format is NOT Supported "
+            return False
+
+        context.scene.imp_sound_to_anim.Info_Import=""
+
+        # controla numero do canal
+        if AudioChannel > NumCh:
+            print "Channel number " + str(AudioChannel) + " is selected but this audio file has just " + \
+                                                        str(NumCh) + " channels, so selecting channel " \
+                                                                                        + str(NumCh) + "!"
+            AudioChannel = NumCh
+
+        # numero de audio frames para cada video frame
+        BytesResol= int(FrameR/Resol)
+        BytesDadosTotProcess= NumFr // BytesResol
+        looptot= int(BytesDadosTotProcess // DivSens)
+
+        _Interna_Globals(BytesDadosTotProcess, context)
+        print ''
+        print "================================================================"
+        from time import strftime
+        print strftime("Go!  %H:%M:%S")
+        print "================================================================"
+        print ''
+        print 'Total Audio Time: \t ' + str(NumFr//FrameR) + 's (' + str(NumFr//FrameR//60) + 'min)'
+        print 'Total # Interactions: \t', BytesDadosTotProcess
+        print 'Total Audio Frames: \t', NumFr
+        print 'Frames/s: \t\t ' + str(FrameR)
+        print '# Chanels in File: \t', NumCh
+        print 'Channel to use:\t\t', AudioChannel
+        print 'Bit/Sample/Chanel: \t ' + str(SampW*8) + (' float' if Format == 3 else '')
+        print '# Frames/Act: \t\t', DivSens
+        print 'Envelope: \t\t', EnvelopeMode
+
+        try:
+            if EnvelopeMode == 'BANDS':
+                # todas as bandas, cada acao e uma janela com todos os seus BytesResol*DivSens audio frames
+                Band= min(Band, Bands)
+                print 'Frequency Band: \t ' + str(Band) + ' of ' + str(Bands)
+                Spectrum= WavBandsCached(File, Info, AudioChannel-1, BytesResol*DivSens, looptot, Bands, bCache)
+                # 0 a 255 pela banda mais forte, para manter a relacao entre as bandas
+                Top= Spectrum.max() if looptot else 0
+                if Top:
+                    Envelope= numpy.round(Spectrum[Band-1] * (255/Top)).astype(numpy.int32)
+                else:
+                    Envelope= numpy.zeros(looptot, numpy.int32)
+            else:
+                # como no SoundConv: cada acao le BytesResol vezes DivSens audio frames
+                # e usa o primeiro de cada DivSens
+                Levels= WavLevels(File, Info, AudioChannel-1, Sensibil, bAutoSense, DivSens, looptot*BytesResol*DivSens)
+                Levels= Levels.reshape(looptot, BytesResol)
+                if EnvelopeMode == 'RMS':
+                    Envelope= numpy.round(numpy.sqrt((Levels.astype(numpy.float64)**2).mean(axis=1))).astype(numpy.int32)
+                else:
+                    Envelope= Levels.max(axis=1)
+        except (EnvironmentError, ValueError), e:
+            # arquivo mudou ou nao pode ser mapeado
+            print "File Read Error: ", e
+            context.scene.imp_sound_to_anim.Info_Import= "File Read Error"
+            context.scene.imp_sound_to_anim.bArrayCriado=False
+            return False
+
+        if bAutoSense==1 and looptot:
+            MaxAudio= Envelope.max()
+            print 'Using Auto Audio Sentivity.'
+            # caso usar batida, procurar por valores proximos do maximo e zerar restante.
+            # caso retirar batida, zerar valores proximos do maximo
+            if bUseBeat==1:
+                print "Trying to use just the beat."
+                UseMinim= MaxAudio*0.8
+                if bMoreSensible:
+                    UseMinim= MaxAudio*0.7
+                elif bLessSensible:
+                    UseMinim= MaxAudio*0.9
+                Envelope= numpy.where(Envelope < UseMinim, 0, Envelope)
+
+            elif bRemoveBeat==1:
+                print "Trying to exclude the beat."
+                UseMax= MaxAudio*0.7
+                if bMoreSensible:
+                    UseMax= MaxAudio*0.8
+                Envelope= numpy.where(Envelope > UseMax, 0, Envelope)
+
+            if MaxAudio:
+                Envelope= numpy.round(Envelope * (255/MaxAudio)).astype(numpy.int32) & 255
+        else:
+            print 'Audio Sensitivity: \t', Sensibil+1
+
+        # repito o valor de frames por actions
+        Values= numpy.repeat(Envelope, DivSens).astype(numpy.uint8)
+        array[:len(Values)]= bytearray(Values.tobytes())
+
+        print ''
+        print "Sample->[value]\tAudio Frame #    \t\t[Graph Value]"
+        for i, ValorPico in enumerate(Envelope.tolist()):
+            igraph= ValorPico//10
+            print "Sample-> " + str(ValorPico) + "\tAudio Frame #  " + str(i) + " of " + str(looptot-1) + \
+                                                        "\t[" + "+"*igraph + " "*(26-igraph) + "]"
+
+        #limpa array tmp
+        del arrayAutoSense[:]
+
+        # mensagens finais
+        context.scene.imp_sound_to_anim.Info_Import= "Click \"Import Key frames\" to begin import" #this set the initial text
+
+        print "================================================================"
+        print strftime("End Process:  %H:%M:%S")
+        print "================================================================"
+        return 0
+
+
     def ProcessaSom(context, loop):
         obg= OBJECT_OT_Botao_Go
         # para de entrar o timer
@@ -1432,6 +1941,16 @@ class OBJECT_OT_Botao_Go(bpy.types.Operator):
         bMoreSensible=  context.scene.imp_sound_to_anim.beat_more_sensible
         AudioChannel=   context.scene.imp_sound_to_anim.audio_channel_select
 
+        # com numpy o arquivo todo e processado de uma vez
+        if numpy:
+            return OBJECT_OT_Botao_Go.SoundEnvelope(f, int(iDivMovPorSeg), iAudioSensib, iFramesPorSeg, context, \
+                                    context.scene.imp_sound_to_anim.action_auto_audio_sense, bRemoveBeat, \
+                                    bUseBeat, bMoreSensible, bLessSensible, AudioChannel, \
+                                    context.scene.imp_sound_to_anim.envelope_mode, \
+                                    context.scene.imp_sound_to_anim.spectrum_bands, \
+                                    context.scene.imp_sound_to_anim.spectrum_band, \
+                                    context.scene.imp_sound_to_anim.spectrum_cache)
+
         # chama funcao de converter som, retorna preenchendo _Interna_Globals.array
         index= OBJECT_OT_Botao_Go.SoundConv(f, int(iDivMovPorSeg), iAudioSensib, iFramesPorSeg, context, \
                                     context.scene.imp_sound_to_anim.action_auto_audio_sense, bRemoveBeat, \
@@ -62,13 +62,58 @@ class ImportPCD(bpy.types.Operator, ImportHelper):
 
     directory = StringProperty(subtype='DIR_PATH')
 
+    use_streaming = BoolProperty(name="Streaming",
+                          description="Read the file in chunks to keep "
+                                      "memory bounded on huge clouds "
+                                      "(needs NumPy)",
+                          default=False)
+
+    chunk_size = IntProperty(name="Chunk Size",
+                          description="Number of points read per chunk",
+                          default=1000000, min=1000)
+
+    split_objects = BoolProperty(name="Split Objects",
+                          description="Create one object per chunk "
+                                      "instead of a single mesh",
+                          default=False)
+
+    use_lod = BoolProperty(name="Level of Detail",
+                          description="Create voxel grid decimated level "
+                                      "of detail meshes (needs NumPy)",
+                          default=False)
+
+    voxel_size = FloatProperty(name="Voxel Size",
+                          description="Voxel size of the finest decimated "
+                                      "level",
+                          default=0.05, min=0.0001, subtype='DISTANCE')
+
+    lod_levels = IntProperty(name="Levels",
+                          description="Number of decimated levels",
+                          default=2, min=1, max=8)
+
+    lod_factor = FloatProperty(name="Level Factor",
+                          description="Voxel size ratio between two "
+                                      "successive levels",
+                          default=4.0, min=1.0)
+
+    keep_full = BoolProperty(name="Keep Full Resolution",
+                          description="Also create the undecimated mesh",
+                          default=True)
+
     def execute(self, context):
         paths = [os.path.join(self.directory, name.name) for name in self.files]
         if not paths:
             paths.append(self.filepath)
 
+        chunk_size = self.chunk_size if self.use_streaming else 0
+        voxel_size = self.voxel_size if self.use_lod else 0.0
         for path in paths:
-            pcd_utils.import_pcd(path)
+            pcd_utils.import_pcd(path, chunk_size=chunk_size,
+                                 split=self.split_objects,
+                                 voxel_size=voxel_size,
+                                 lod_levels=self.lod_levels,
+                                 lod_factor=self.lod_factor,
+                                 keep_full=self.keep_full)
 
         return set(['FINISHED'])
 
@@ -84,9 +129,14 @@ class ExportPCD(bpy.types.Operator, ExportHelper):
 
     filter_glob = StringProperty(default="*.pcd", options=set(['HIDDEN']))
 
+    use_compression = BoolProperty(name="Compress",
+                          description="Write LZF compressed binary data "
+                                      "instead of ASCII",
+                          default=False)
+
 
     def execute(self, context):
-        pcd_utils.export_pcd(self.filepath)
+        pcd_utils.export_pcd(self.filepath, self.use_compression)
 
         return set(['FINISHED'])
 
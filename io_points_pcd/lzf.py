@@ -0,0 +1,136 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+LZF compression as used by the binary_compressed PCD data format
+(compatible with liblzf's lzf_compress/lzf_decompress).
+"""
+
+from __future__ import absolute_import
+
+
+MAX_LIT = 1 << 5
+MAX_OFF = 1 << 13
+MAX_REF = (1 << 8) + (1 << 3)
+
+
+class LZFError(Exception):
+    pass
+
+
+def decompress(data, length):
+    """
+    Decompress the LZF stream *data* into a bytearray of *length*
+    bytes.
+    """
+    data = bytearray(data)
+    out = bytearray(length)
+    ip = 0
+    op = 0
+    end = len(data)
+
+    while ip < end:
+        ctrl = data[ip]
+        ip += 1
+
+        if ctrl < MAX_LIT:
+            # literal run
+            ctrl += 1
+            if op + ctrl > length or ip + ctrl > end:
+                raise LZFError("literal run out of bounds")
+            out[op:op + ctrl] = data[ip:ip + ctrl]
+            ip += ctrl
+            op += ctrl
+            continue
+
+        # back reference
+        count = ctrl >> 5
+        if count == 7:
+            count += data[ip]
+            ip += 1
+        ref = op - ((ctrl & 0x1f) << 8) - 1 - data[ip]
+        ip += 1
+        count += 2
+
+        if ref < 0 or op + count > length:
+            raise LZFError("back reference out of bounds")
+
+        if op - ref >= count:
+            out[op:op + count] = out[ref:ref + count]
+        else:
+            # overlapping reference repeats the last op - ref bytes
+            for i in range(count):
+                out[op + i] = out[ref + i]
+        op += count
+
+    if op != length:
+        raise LZFError("decompressed %d bytes, expected %d" % (op, length))
+
+    return out
+
+
+def _flushLiterals(out, data, start, end):
+    while start < end:
+        run = min(MAX_LIT, end - start)
+        out.append(run - 1)
+        out += data[start:start + run]
+        start += run
+
+
+def compress(data):
+    """
+    Compress *data* into an LZF stream, returned as a bytearray.
+    """
+    data = bytearray(data)
+    end = len(data)
+    out = bytearray()
+    table = {}
+    literal = 0
+    ip = 0
+
+    while ip < end - 2:
+        key = (data[ip] << 16) | (data[ip + 1] << 8) | data[ip + 2]
+        ref = table.get(key)
+        table[key] = ip
+
+        if ref is None or ip - ref > MAX_OFF:
+            ip += 1
+            continue
+
+        maxlen = min(MAX_REF, end - ip)
+        count = 3
+        while count < maxlen and data[ref + count] == data[ip + count]:
+            count += 1
+
+        _flushLiterals(out, data, literal, ip)
+
+        off = ip - ref - 1
+        count -= 2
+        if count < 7:
+            out.append((count << 5) | (off >> 8))
+        else:
+            out.append((7 << 5) | (off >> 8))
+            out.append(count - 7)
+        out.append(off & 0xff)
+
+        ip += count + 2
+        literal = ip
+
+    _flushLiterals(out, data, literal, end)
+
+    return out
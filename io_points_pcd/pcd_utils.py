@@ -20,16 +20,22 @@ from __future__ import absolute_import
 import bpy
 
 from . import pcdparser
+from . import voxelgrid
 
 
 def create_and_link_mesh(name, points):
     """
     Create a blender mesh and object called name from a list of
-    *points* and link it in the current scene.
+    *points* and link it in the current scene. *points* may also be
+    a (n, 3) NumPy array, which is copied into the mesh in bulk.
     """
 
     mesh = bpy.data.meshes.new(name)
-    mesh.from_pydata(points, [], [])
+    if pcdparser.numpy is not None and isinstance(points, pcdparser.numpy.ndarray):
+        mesh.vertices.add(len(points))
+        mesh.vertices.foreach_set("co", points.ravel())
+    else:
+        mesh.from_pydata(points, [], [])
 
     # update mesh to allow proper display
     mesh.validate()
@@ -42,8 +48,84 @@ def create_and_link_mesh(name, points):
     obj.select = True
 
 
-def import_pcd(filepath, name="new_pointcloud"):
+def import_pcd_streaming(parser, name, chunk_size, split):
+    """
+    Import the points of *parser* *chunk_size* points at a time. With
+    *split* every chunk becomes an object of its own, otherwise the
+    chunks are copied into one pre-sized coordinate buffer, so peak
+    memory is bounded by the output and not by the parsed file.
+    """
+    if split:
+        for i, chunk in enumerate(parser.iterPointArrays(chunk_size)):
+            create_and_link_mesh("%s.%03d" % (name, i),
+                                 pcdparser.xyzArray(chunk))
+        return
+
+    points = None
+    count = 0
+    for chunk in parser.iterPointArrays(chunk_size):
+        if points is None:
+            points = pcdparser.numpy.empty((parser.numPoints, 3),
+                                           dtype=pcdparser.numpy.float32)
+        pcdparser.xyzArray(chunk, points[count:count + len(chunk)])
+        count += len(chunk)
+
+    if points is not None:
+        create_and_link_mesh(name, points[:count])
+
+
+def import_pcd_lod(parser, name, chunk_size, voxel_size, levels, factor,
+                   keep_full):
+    """
+    Import the points of *parser* as level of detail meshes built in a
+    single pass over the file. Level i > 0 is voxel grid filtered with a
+    leaf size of *voxel_size* * *factor* ** (i - 1), level 0 is the
+    full cloud and only created with *keep_full*.
+    """
+    numpy = pcdparser.numpy
+    grids = [voxelgrid.VoxelGrid(voxel_size * factor ** i)
+             for i in range(levels)]
+
+    points = None
+    count = 0
+    for chunk in parser.iterPointArrays(chunk_size):
+        xyz = pcdparser.xyzArray(chunk)
+        for grid in grids:
+            grid.add(xyz)
+
+        if keep_full:
+            if points is None:
+                points = numpy.empty((parser.numPoints, 3),
+                                     dtype=numpy.float32)
+            points[count:count + len(xyz)] = xyz
+            count += len(xyz)
+
+    if points is not None:
+        create_and_link_mesh(name + ".lod0", points[:count])
+
+    for i, grid in enumerate(grids):
+        create_and_link_mesh("%s.lod%d" % (name, i + 1), grid.points())
+
+
+def import_pcd(filepath, name="new_pointcloud", chunk_size=0, split=False,
+               voxel_size=0.0, lod_levels=1, lod_factor=4.0, keep_full=True):
     parser = pcdparser.PCDParser.factory(filepath, pcdparser.PointXYZ)
+
+    if pcdparser.numpy is not None and voxel_size > 0.0:
+        import_pcd_lod(parser, name, chunk_size or 1000000, voxel_size,
+                       lod_levels, lod_factor, keep_full)
+        return
+
+    if pcdparser.numpy is not None and chunk_size > 0:
+        import_pcd_streaming(parser, name, chunk_size, split)
+        return
+
+    if pcdparser.numpy is not None:
+        parser.parseFileArray()
+        points = pcdparser.xyzArray(parser.getPointArray())
+        create_and_link_mesh(name, points)
+        return
+
     parser.parseFile()
     points = parser.getPoints()
 
@@ -54,7 +136,7 @@ def import_pcd(filepath, name="new_pointcloud"):
     create_and_link_mesh(name, blender_points)
   
 
-def export_pcd(filepath):
+def export_pcd(filepath, compressed=False):
     obj = bpy.context.active_object
 
     # apply object transformation and modifiers
@@ -71,6 +153,6 @@ def export_pcd(filepath):
         points.append(point)
 
     writer = pcdparser.PCDWriter(points)
-    writer.write(filepath)
+    writer.write(filepath, compressed)
 
 
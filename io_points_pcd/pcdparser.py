@@ -19,9 +19,18 @@
 
 from __future__ import with_statement
 from __future__ import absolute_import
+import itertools
+import os
 import struct
 from io import open
 
+from . import lzf
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def encodeASCIILine(line):
     return line.decode(encoding='ASCII')
@@ -67,6 +76,7 @@ class PCDParser(object):
     file = None
 
     points = []
+    pointArray = None
     PointClass = None
 
     headerEnd = False
@@ -96,6 +106,7 @@ class PCDParser(object):
         self.file = None
         self.headerEnd = False
         self.points = []
+        self.pointArray = None
 
 
     def parserWarning(self, msg):
@@ -112,6 +123,16 @@ class PCDParser(object):
             self.parsePoints()
 
 
+    def parseFileArray(self):
+        """
+        Parse the file into a NumPy structured array with one column
+        per header field, instead of building a point object per point.
+        """
+        with open(self.filepath, 'rb') as self.file:
+            self.parseHeader()
+            self.pointArray = self.parsePointArray()
+
+
     def parseHeader(self):
         for b in self.file:
             line = encodeASCIILine(b)
@@ -139,10 +160,27 @@ class PCDParser(object):
         pass
 
 
+    def parsePointArray(self):
+        return None
+
+
+    def iterPointArrays(self, chunkSize):
+        """
+        Yield the points as structured arrays of at most *chunkSize*
+        points each.
+        """
+        self.parseFileArray()
+        yield self.pointArray
+
+
     def getPoints(self):
         return self.points
 
 
+    def getPointArray(self):
+        return self.pointArray
+
+
     def version(self):
         return 'NO_VERSION_NUMBER'
 
@@ -229,6 +267,8 @@ class PCDParser_v0_7(PCDParser):
             self.datatype = 'ASCII'
         elif split[0] == "binary":
             self.datatype = 'BINARY'
+        elif split[0] == "binary_compressed":
+            self.datatype = 'BINARY_COMPRESSED'
         self.headerEnd = True
 
 
@@ -242,6 +282,8 @@ class PCDParser_v0_7(PCDParser):
             self.parseASCII()
         elif self.datatype == 'BINARY':
             self.parseBINARY()
+        elif self.datatype == 'BINARY_COMPRESSED':
+            self.parseBINARY_COMPRESSED()
 
 
     def parseASCII(self):
@@ -282,6 +324,137 @@ class PCDParser_v0_7(PCDParser):
             self.points.append(point)
 
 
+    def dtype(self):
+        """
+        Map the FIELDS/SIZE/TYPE/COUNT header onto a little endian
+        NumPy structured dtype, one (sub)column per field.
+        """
+        kinds = {'F': 'f', 'U': 'u', 'I': 'i'}
+        descr = []
+        names = set()
+        for i, field in enumerate(self.fields):
+            fieldname, fieldsize, fieldtype, fieldcount = field
+            fieldname = str(fieldname)
+            # pcl pads with fields called '_', names must be unique
+            if fieldname == '_' or fieldname in names:
+                fieldname = '_pad' + str(i)
+            names.add(fieldname)
+
+            fmt = '<' + kinds[fieldtype] + str(fieldsize)
+            if fieldcount is not None and fieldcount > 1:
+                descr.append((fieldname, fmt, (fieldcount,)))
+            else:
+                descr.append((fieldname, fmt))
+
+        return numpy.dtype(descr)
+
+
+    def parsePointArray(self):
+        if self.datatype == 'ASCII':
+            return self.parseArrayASCII()
+        elif self.datatype == 'BINARY':
+            return self.parseArrayBINARY()
+        elif self.datatype == 'BINARY_COMPRESSED':
+            return self.parseArrayBINARY_COMPRESSED()
+
+
+    def parseArrayASCII(self):
+        table = numpy.loadtxt(self.file, dtype=numpy.float64,
+                              comments='#', ndmin=2)
+        table = table[:self.numPoints]
+        if len(table) < self.numPoints:
+            self.parserWarning("Unexpected end of data")
+
+        return self.tableToArray(table)
+
+
+    def tableToArray(self, table):
+        """
+        Distribute the columns of a 2D table of ASCII values over the
+        fields of the structured dtype.
+        """
+        dtype = self.dtype()
+        points = numpy.zeros(len(table), dtype=dtype)
+        column = 0
+        for fieldname in dtype.names:
+            shape = dtype.fields[fieldname][0].shape
+            fieldcount = shape[0] if shape else 1
+            values = table[:, column:column + fieldcount]
+            points[fieldname] = values.reshape((len(table),) + shape)
+            column += fieldcount
+
+        return points
+
+
+    def parseArrayBINARY(self):
+        dtype = self.dtype()
+        data = self.file.read(dtype.itemsize * self.numPoints)
+        numPoints = len(data) // dtype.itemsize
+        if numPoints < self.numPoints:
+            self.parserWarning("Unexpected end of data")
+
+        return numpy.frombuffer(data, dtype=dtype, count=numPoints)
+
+
+    def iterPointArrays(self, chunkSize):
+        """
+        Yield the points as structured arrays of at most *chunkSize*
+        points each. Binary data is memory-mapped and ASCII data is read
+        *chunkSize* lines at a time, so only the current chunk has to be
+        resident regardless of the size of the file.
+        """
+        with open(self.filepath, 'rb') as self.file:
+            self.parseHeader()
+            if self.datatype == 'ASCII':
+                for chunk in self.iterArraysASCII(chunkSize):
+                    yield chunk
+            elif self.datatype == 'BINARY':
+                for chunk in self.iterArraysBINARY(chunkSize):
+                    yield chunk
+            elif self.datatype == 'BINARY_COMPRESSED':
+                # LZF blocks can't be decoded piecewise, hand out
+                # views of the decompressed array instead
+                points = self.parseArrayBINARY_COMPRESSED()
+                for start in xrange(0, len(points), chunkSize):
+                    yield points[start:start + chunkSize]
+
+
+    def iterArraysASCII(self, chunkSize):
+        parsedPoints = 0
+        while parsedPoints < self.numPoints:
+            lines = list(itertools.islice(self.file, chunkSize))
+            if not lines:
+                self.parserWarning("Unexpected end of data")
+                return
+
+            lines = [encodeASCIILine(b) for b in lines]
+            lines = [line for line in lines if line.split('#')[0].strip()]
+            if not lines:
+                continue
+
+            table = numpy.loadtxt(lines, dtype=numpy.float64,
+                                  comments='#', ndmin=2)
+            table = table[:self.numPoints - parsedPoints]
+            parsedPoints += len(table)
+            yield self.tableToArray(table)
+
+
+    def iterArraysBINARY(self, chunkSize):
+        dtype = self.dtype()
+        offset = self.file.tell()
+        numPoints = (os.path.getsize(self.filepath) - offset) // dtype.itemsize
+        if numPoints < self.numPoints:
+            self.parserWarning("Unexpected end of data")
+        numPoints = min(numPoints, self.numPoints)
+        if numPoints == 0:
+            return
+
+        data = numpy.memmap(self.filepath, dtype=dtype, mode='r',
+                            offset=offset, shape=(numPoints,))
+        for start in xrange(0, numPoints, chunkSize):
+            yield data[start:start + chunkSize]
+
+
     def parseBINARY(self):
         for pointi in xrange(self.numPoints):
             point = self.PointClass()
@@ -295,30 +468,11 @@ class PCDParser_v0_7(PCDParser):
                 values = []
                 for i in xrange(fieldcount):
 
-                    fs = None
-                    if fieldtype == 'F':
-                        if fieldsize == 4: #float
-                            fs = '<f'
-                        elif fieldsize == 8: #double
-                            fs = '<d'
-                    elif fieldtype == 'U':
-                        if fieldsize == 1: #unsinged char
-                            fs = '<B'
-                        elif fieldsize == 2: #unsinged short
-                            fs = '<H'
-                        elif fieldsize == 4: #unsinged int
-                            fs =  '<I'
-                    elif fieldtype == 'I':
-                        if fieldsize == 1: #char
-                            fs = '<c'
-                        elif fieldsize == 2: #short
-                            fs = '<h'
-                        elif fieldsize == 4: #signed int
-                            fs =  '<i'
+                    fs = structFormat(fieldtype, fieldsize)
 
                     raw = self.file.read(fieldsize)
                     if (fs):
-                        data = struct.unpack(fs, raw)
+                        data = struct.unpack('<' + fs, raw)
                         values.append(data[0])
 
                 point.setField(fieldname, values)
@@ -326,6 +480,108 @@ class PCDParser_v0_7(PCDParser):
             self.points.append(point)
 
 
+    def readCompressed(self):
+        """
+        Read the LZF block of binary_compressed data and return the
+        decompressed, column-major (one field after the other) bytes.
+        """
+        compressedSize, size = struct.unpack('<II', self.file.read(8))
+        return lzf.decompress(self.file.read(compressedSize), size)
+
+
+    def parseBINARY_COMPRESSED(self):
+        data = self.readCompressed()
+
+        columns = []
+        offset = 0
+        for field in self.fields:
+            fieldsize = field[1]
+            fieldtype = field[2]
+            fieldcount = field[3]
+
+            fs = structFormat(fieldtype, fieldsize)
+            numValues = self.numPoints * fieldcount
+            if fs:
+                values = struct.unpack_from('<' + str(numValues) + fs,
+                                            data, offset)
+            else:
+                values = [None] * numValues
+            columns.append(values)
+            offset += numValues * fieldsize
+
+        for pointi in xrange(self.numPoints):
+            point = self.PointClass()
+
+            for field, values in zip(self.fields, columns):
+                fieldname = field[0]
+                fieldcount = field[3]
+                start = pointi * fieldcount
+                point.setField(fieldname, values[start:start + fieldcount])
+
+            self.points.append(point)
+
+
+    def parseArrayBINARY_COMPRESSED(self):
+        dtype = self.dtype()
+        data = self.readCompressed()
+
+        points = numpy.zeros(self.numPoints, dtype=dtype)
+        offset = 0
+        for fieldname in dtype.names:
+            fielddtype = dtype.fields[fieldname][0]
+            fieldcount = fielddtype.itemsize // fielddtype.base.itemsize
+            column = numpy.frombuffer(data, dtype=fielddtype.base,
+                                      count=self.numPoints * fieldcount,
+                                      offset=offset)
+            points[fieldname] = column.reshape((self.numPoints,) + fielddtype.shape)
+            offset += fielddtype.itemsize * self.numPoints
+
+        return points
+
+
+
+
+def structFormat(fieldtype, fieldsize):
+    """
+    Return the struct format character of a PCD field type and size,
+    None if there is none.
+    """
+    if fieldtype == 'F':
+        if fieldsize == 4: #float
+            return 'f'
+        elif fieldsize == 8: #double
+            return 'd'
+    elif fieldtype == 'U':
+        if fieldsize == 1: #unsinged char
+            return 'B'
+        elif fieldsize == 2: #unsinged short
+            return 'H'
+        elif fieldsize == 4: #unsinged int
+            return 'I'
+    elif fieldtype == 'I':
+        if fieldsize == 1: #char
+            return 'c'
+        elif fieldsize == 2: #short
+            return 'h'
+        elif fieldsize == 4: #signed int
+            return 'i'
+    return None
+
+
+def xyzArray(pointArray, out=None):
+    """
+    Return the x, y and z columns of a structured point array as
+    one contiguous (n, 3) float32 array, stored in *out* if given.
+    """
+    if out is None:
+        out = numpy.empty((len(pointArray), 3), dtype=numpy.float32)
+    xyz = out
+    xyz[:, 0] = pointArray['x']
+    xyz[:, 1] = pointArray['y']
+    xyz[:, 2] = pointArray['z']
+    return xyz
+
+
 
 
 class PCDWriter(object):
@@ -334,7 +590,7 @@ class PCDWriter(object):
         self.points = points
 
 
-    def _header(self):
+    def _header(self, data='ascii'):
         header =  "# .PCD v0.7 - Point Cloud Data file format\n"
         header += "VERSION 0.7\n"
         header += "FIELDS x y z\n"
@@ -345,12 +601,15 @@ class PCDWriter(object):
         header += "HEIGHT 1\n"
         header += "VIEWPOINT 0 0 0 1 0 0 0\n"
         header += "POINTS " + str(len(self.points)) + "\n"
-        header += "DATA ascii\n"
+        header += "DATA " + data + "\n"
 
         return header
 
 
-    def write(self, filepath):
+    def write(self, filepath, compressed=False):
+        if compressed:
+            self.writeCompressed(filepath)
+            return
 
         with open(filepath, "w") as f:
             f.write(self._header())
@@ -363,6 +622,23 @@ class PCDWriter(object):
                 f.write("\n")
 
 
+    def writeCompressed(self, filepath):
+        """
+        Write the points as LZF compressed, column-major
+        binary_compressed data.
+        """
+        fs = '<' + str(len(self.points)) + 'f'
+        raw = struct.pack(fs, *[point.x for point in self.points])
+        raw += struct.pack(fs, *[point.y for point in self.points])
+        raw += struct.pack(fs, *[point.z for point in self.points])
+        data = lzf.compress(raw)
+
+        with open(filepath, "wb") as f:
+            f.write(self._header('binary_compressed').encode('ascii'))
+            f.write(struct.pack('<II', len(data), len(raw)))
+            f.write(data)
+
+
 
 
 
@@ -0,0 +1,101 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+from __future__ import absolute_import
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# voxel coordinates are packed into one 64 bit key, 21 bits per axis
+KEY_BITS = 21
+KEY_OFFSET = 1 << (KEY_BITS - 1)
+KEY_MASK = (1 << KEY_BITS) - 1
+
+
+class VoxelGrid(object):
+    """
+    Voxel grid filter, replaces all points falling into the same cube of
+    *leafSize* by their centroid. Points are added chunk by chunk and
+    voxels are looked up in a hash of their packed integer coordinates,
+    so the cost is linear in the number of points.
+    """
+
+    def __init__(self, leafSize):
+        self.leafSize = float(leafSize)
+        self.voxels = {}
+        self.sums = numpy.zeros((1024, 3), dtype=numpy.float64)
+        self.counts = numpy.zeros(1024, dtype=numpy.int64)
+
+
+    def __len__(self):
+        return len(self.voxels)
+
+
+    def keys(self, xyz):
+        cells = numpy.floor(xyz / self.leafSize).astype(numpy.int64)
+        # clouds spanning more than 2**21 voxels wrap around
+        cells = (cells + KEY_OFFSET) & KEY_MASK
+        return ((cells[:, 0] << (2 * KEY_BITS)) |
+                (cells[:, 1] << KEY_BITS) |
+                cells[:, 2])
+
+
+    def grow(self, size):
+        if size <= len(self.counts):
+            return
+        size = max(size, 2 * len(self.counts))
+        sums = numpy.zeros((size, 3), dtype=numpy.float64)
+        sums[:len(self.sums)] = self.sums
+        counts = numpy.zeros(size, dtype=numpy.int64)
+        counts[:len(self.counts)] = self.counts
+        self.sums = sums
+        self.counts = counts
+
+
+    def add(self, xyz):
+        """
+        Add a (n, 3) array of points to the grid, points with NaN or
+        infinite coordinates are skipped.
+        """
+        xyz = xyz[numpy.isfinite(xyz).all(axis=1)]
+        if len(xyz) == 0:
+            return
+
+        keys, inverse = numpy.unique(self.keys(xyz), return_inverse=True)
+        voxels = self.voxels
+        ids = numpy.array([voxels.setdefault(key, len(voxels))
+                           for key in keys.tolist()], dtype=numpy.int64)
+        self.grow(len(voxels))
+
+        self.counts[ids] += numpy.bincount(inverse, minlength=len(keys))
+        for axis in xrange(3):
+            self.sums[ids, axis] += numpy.bincount(inverse,
+                                                   weights=xyz[:, axis],
+                                                   minlength=len(keys))
+
+
+    def points(self):
+        """
+        Return the voxel centroids as a (n, 3) float32 array.
+        """
+        n = len(self.voxels)
+        centroids = self.sums[:n] / self.counts[:n, numpy.newaxis]
+        return centroids.astype(numpy.float32)
@@ -51,6 +51,13 @@ from time import (
 from operator import (
         attrgetter,
         )
+from bisect import (
+        bisect_right,
+        )
+from mmap import (
+        mmap,
+        ACCESS_READ,
+        )
 
 
 class DEBUG_CFB_SPEC(object):
@@ -85,13 +92,38 @@ class Cfb_RawIO_Reader(object):
 
     __slots__ = (
             '__raw_io',
+            '__mapped_io',
             '__compound_file_header'
             )
 
     def __init__(self, raw_io):
         self.__raw_io = raw_io
-        self.__compound_file_header = Cfb_File_Header(self)
-        self.__compound_file_header.read()
+        self.__mapped_io = None
+        try:
+            self.__mapped_io = mmap(raw_io.fileno(), 0, access=ACCESS_READ)
+        except (AttributeError, ValueError, EnvironmentError):
+            ## no real file or an empty one, fall back to seek and read
+            pass
+        try:
+            self.__compound_file_header = Cfb_File_Header(self)
+            self.__compound_file_header.read()
+        except:
+            self.close()
+            raise
+
+    def close(self):
+        """
+        release the memory mapping of the file,
+        views from view_at are no longer valid afterwards
+        """
+        if self.__mapped_io is not None:
+            try:
+                self.__mapped_io.close()
+            except BufferError:
+                ## python 3 keeps the mapping open while views are still referenced,
+                ## it is released together with the last one
+                pass
+            self.__mapped_io = None
 
     def tell(self):
         self.__raw_io.tell()
@@ -103,6 +135,22 @@ class Cfb_RawIO_Reader(object):
         """ read raw byte(s) buffer """
         return self.__raw_io.read(n)
 
+    def read_at(self, offset, n):
+        """ read raw byte(s) buffer at an absolute file offset """
+        if self.__mapped_io is not None:
+            return self.__mapped_io[offset:offset + n]
+        self.__raw_io.seek(offset)
+        return self.__raw_io.read(n)
+
+    def view_at(self, offset, n):
+        """
+        get a zero-copy view of raw byte(s) at an absolute file offset,
+        if the file is memory-mapped, else a copy as read_at
+        """
+        if self.__mapped_io is None:
+            return self.read_at(offset, n)
+        return Cfb_Extras.view(self.__mapped_io, offset, n)
+
     def get_stream_directory_names(self):
         return self.__compound_file_header.get_stream_directory_names()
 
@@ -113,6 +161,7 @@ class Cfb_RawIO_Reader(object):
         directory_entry = self.__compound_file_header.get_stream_directory_entry(path_name)
         if directory_entry and not directory_entry.is_directory():
             stream_sector_list = self.__compound_file_header.get_stream_sector_list(directory_entry)
+            stream_sector_runs = self.__compound_file_header.get_stream_sector_runs(directory_entry)
             if self.__compound_file_header.is_large_stream(directory_entry.Stream_Size):
                 sector_shift = self.__compound_file_header.Sector_Shift
             else:
@@ -122,10 +171,21 @@ class Cfb_RawIO_Reader(object):
                     stream_sector_list,
                     sector_shift,
                     path_name,
-                    directory_entry
+                    directory_entry,
+                    stream_sector_runs
                     )
         return None
 
+    def get_stream_view(self, path_name):
+        """
+        get the whole content of a stream,
+        without copying if it is stored in one contiguous run
+        """
+        stream = self.get_stream(path_name)
+        if stream is None:
+            return None
+        return stream.read_view()
+
     def read_byte(self):
         """ read a single byte value """
         return unpack('<B', self.__raw_io.read(Cfb_Size_Type.BYTE))[0]
@@ -167,6 +227,8 @@ class Cfb_Stream_Reader(object):
         '__directory_entry',
         '__path_name',
         '__stream_sector_list',
+        '__stream_sector_runs',
+        '__stream_sector_run_offsets',
         '__stream_sector_shift',
         '__stream_sector_size',
         '__stream_sector_mask',
@@ -175,7 +237,7 @@ class Cfb_Stream_Reader(object):
         '__stream_position',
         )
 
-    def __init__(self, compound_raw_io, sector_list, sector_shift, path_name, directory_entry):
+    def __init__(self, compound_raw_io, sector_list, sector_shift, path_name, directory_entry, sector_runs=None):
         if not isinstance(compound_raw_io, Cfb_RawIO_Reader):
             raise TypeError("Cfb_Stream_Reader(compound_raw_io)")
         if not isinstance(directory_entry, Cfb_File_Directory_Entry):
@@ -193,6 +255,11 @@ class Cfb_Stream_Reader(object):
         self.__stream_sector_size = 1 << self.__stream_sector_shift
         self.__stream_sector_mask = self.__stream_sector_size - 1
 
+        if sector_runs is None:
+            sector_runs = Cfb_Extras.sector_runs(sector_list, self.__stream_sector_size, directory_entry.Stream_Size)
+        self.__stream_sector_runs = sector_runs
+        self.__stream_sector_run_offsets = [run[0] for run in sector_runs]
+
     def size(self):
         return self.__directory_entry.Stream_Size
 
@@ -243,28 +310,47 @@ class Cfb_Stream_Reader(object):
         if max_stream_position > self.__directory_entry.Stream_Size:
             max_stream_position = self.__directory_entry.Stream_Size
 
+        ## read whole runs of contiguous sectors at once
+        run_index = bisect_right(self.__stream_sector_run_offsets, self.__stream_position) - 1
         while self.__stream_position < max_stream_position:
-            self.seek(self.__stream_position)
-            max_remaining_size = max_stream_position - self.__stream_position
-            size = self.__stream_sector_size - self.__stream_sector_position
-            if size > max_remaining_size:
-                size = max_remaining_size
-            if n >= 0 and size > n:
-                size = n
-            buffer = self.__compound_raw_io.read(size)
+            run_offset, file_offset, run_size = self.__stream_sector_runs[run_index]
+            run_position = self.__stream_position - run_offset
+            size = min(run_size - run_position, max_stream_position - self.__stream_position)
+            buffer = self.__compound_raw_io.read_at(file_offset + run_position, size)
             blocks.append(buffer)
             if size > len(buffer):
                 break
                 raise IndexError("Cfb_Stream_Reader.read(n)")
             self.__stream_position += size
+            run_index += 1
 
-        ## mit -1
-##        self.seek(self.__stream_position - 1)
+        return ''.join(blocks)
 
-        ## set __stream_position without -1
-##        self.seek(self.__stream_position)
+    def read_view(self, n=-1):
+        """
+        same as read, but returns a zero-copy view
+        if the requested bytes are stored in one contiguous run
+        """
+        if n >= 0:
+            max_stream_position = self.__stream_position + n
+        else:
+            max_stream_position = self.__directory_entry.Stream_Size
 
-        return ''.join(blocks)
+        if max_stream_position > self.__directory_entry.Stream_Size:
+            max_stream_position = self.__directory_entry.Stream_Size
+
+        if self.__stream_position >= max_stream_position:
+            return ''
+
+        run_index = bisect_right(self.__stream_sector_run_offsets, self.__stream_position) - 1
+        run_offset, file_offset, run_size = self.__stream_sector_runs[run_index]
+        if max_stream_position > run_offset + run_size:
+            return self.read(n)
+
+        size = max_stream_position - self.__stream_position
+        buffer = self.__compound_raw_io.view_at(file_offset + self.__stream_position - run_offset, size)
+        self.__stream_position += size
+        return buffer
 
     def read_byte(self):
         """ read a single byte value """
@@ -294,6 +380,9 @@ class Cfb_Stream_Reader(object):
     def sector_size(self):
         return self.__stream_sector_size
 
+    def sector_runs(self):
+        return self.__stream_sector_runs
+
 
 ###############################################################################
 #234567890123456789012345678901234567890123456789012345678901234567890123456789
@@ -378,6 +467,8 @@ class Cfb_File_Header(object):
             '__number_sectors_in_mini_stream',
             '__total_number_of_mini_sectors',
             '__directory_entry_dictionary',
+            '__stream_sector_list_cache',
+            '__stream_sector_runs_cache',
             'debug_counter',
             )
 
@@ -391,6 +482,8 @@ class Cfb_File_Header(object):
         self.__mini_file_allocation_table = []
         self.__mini_stream_sector_location_list = []
         self.__directory_entry_dictionary = {}
+        self.__stream_sector_list_cache = {}
+        self.__stream_sector_runs_cache = {}
 
     def __repr__(self):
         return "<Cfb_File_Header\n" \
@@ -528,6 +621,32 @@ class Cfb_File_Header(object):
         return self.__compound_raw_io.read(sector_size)
 
     def get_stream_sector_list(self, directory_entry):
+        stream_sector_list = self.__stream_sector_list_cache.get(directory_entry._Stream_ID)
+        if stream_sector_list is None:
+            stream_sector_list = self.build_stream_sector_list(directory_entry)
+            self.__stream_sector_list_cache[directory_entry._Stream_ID] = stream_sector_list
+        return stream_sector_list
+
+    def get_stream_sector_runs(self, directory_entry):
+        """
+        returns the sector list of a stream coalesced to
+        (stream_offset, file_offset, size) runs of contiguous sectors
+        """
+        stream_sector_runs = self.__stream_sector_runs_cache.get(directory_entry._Stream_ID)
+        if stream_sector_runs is None:
+            if self.is_large_stream(directory_entry.Stream_Size):
+                sector_size = self.__sector_size
+            else:
+                sector_size = self.__mini_sector_size
+            stream_sector_runs = Cfb_Extras.sector_runs(
+                    self.get_stream_sector_list(directory_entry),
+                    sector_size,
+                    directory_entry.Stream_Size
+                    )
+            self.__stream_sector_runs_cache[directory_entry._Stream_ID] = stream_sector_runs
+        return stream_sector_runs
+
+    def build_stream_sector_list(self, directory_entry):
         stream_sector_list = []
         is_large_stream = self.is_large_stream(directory_entry.Stream_Size)
         if is_large_stream:
@@ -701,6 +820,33 @@ class Cfb_File_Directory_Entry(object):
 class Cfb_Extras(object):
     """ for internal use only """
 
+    @staticmethod
+    def sector_runs(sector_list, sector_size, stream_size):
+        """
+        coalesce a list of sector file offsets to
+        (stream_offset, file_offset, size) runs of contiguous sectors
+        """
+        runs = []
+        stream_offset = 0
+        for file_offset in sector_list:
+            size = min(sector_size, stream_size - stream_offset)
+            if runs and runs[-1][1] + runs[-1][2] == file_offset:
+                run_offset, run_file_offset, run_size = runs[-1]
+                runs[-1] = (run_offset, run_file_offset, run_size + size)
+            else:
+                runs.append((stream_offset, file_offset, size))
+            stream_offset += size
+        return runs
+
+    @staticmethod
+    def view(data, offset, size):
+        """ zero-copy view of size bytes of data starting at offset """
+        try:
+            return memoryview(data)[offset:offset + size]
+        except TypeError:
+            ## python 2 mmap only supports the old buffer protocol
+            return buffer(data, offset, size)
+
     @staticmethod
     def to_time(value):
         if value == 0:
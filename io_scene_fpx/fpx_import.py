@@ -67,6 +67,7 @@ if repr(globals()).find("bpy") != -1:
             fpx_str,
             )
     from io_scene_fpx.fpx_spec import (
+            Fpx_Decode_Cache,
             Fpm_File_Reader,
             Fpl_File_Reader,
             Fpt_File_Reader,
@@ -74,6 +75,7 @@ if repr(globals()).find("bpy") != -1:
             Fpl_Library_Type,
             FptElementType,
             Fpt_PackedLibrary_Type,
+            grab_tasks_to_file,
             )
     from io_scene_fpx.fpx_ui import (
             FpxUI,
@@ -86,6 +88,7 @@ else:
             fpx_str,
             )
     from fpx_spec import (
+            Fpx_Decode_Cache,
             Fpm_File_Reader,
             Fpl_File_Reader,
             Fpt_File_Reader,
@@ -93,6 +96,7 @@ else:
             Fpl_Library_Type,
             FptElementType,
             Fpt_PackedLibrary_Type,
+            grab_tasks_to_file,
             )
     from fpx_ui import (
             FpxUI,
@@ -197,6 +201,8 @@ class FpmImporter(object):
             use_model_filter=FpxUI.PROP_DEFAULT_USE_MODEL_FILTER,
             use_model_adjustment=FpxUI.PROP_DEFAULT_MODEL_ADJUST_FPM,
             keep_name=False,
+            use_cache=FpxUI.PROP_DEFAULT_USE_CACHE,
+            cache_key=None,
             ):
         self.report = report
         self.verbose = verbose
@@ -207,6 +213,10 @@ class FpmImporter(object):
         self.use_model_filter = use_model_filter
         self.use_model_adjustment = use_model_adjustment
         self.keep_name = keep_name
+        self.use_cache = use_cache
+        ## key of the library item the fpm file got grabbed from,
+        ## the fpm file itself is only a temporary one then
+        self.cache_key = cache_key
 
     def read(self, blender_context, filepath):
         """ read fpm file and convert fpm content to bender content """
@@ -224,6 +234,8 @@ class FpmImporter(object):
         self.__translite_width = 0.0
         self.__translite_length = 0.0
 
+        cache = get_decode_cache() if self.use_cache else None
+
         try:
             self.folder_name, file_name = path.split(filepath)
 
@@ -253,7 +265,13 @@ class FpmImporter(object):
 
                 if fpx_reader:
                     temp_name = path.join(app.tempdir, "__grab__fpm__")
-                    dst_path, dst_sub_path_names = fpx_reader.grab_content(temp_name)
+                    cache_key = self.cache_key
+                    if cache is not None and cache_key is None:
+                        cache_key = Fpx_Decode_Cache.source_key(file)
+                    try:
+                        dst_path, dst_sub_path_names = fpx_reader.grab_content(temp_name, cache=cache, cache_key=cache_key)
+                    finally:
+                        fpx_reader.close()
 
                     model_name = fpx_reader.PinModel.get_value("name")
                     model_name = FpxUtilities.toGoodName(model_name) ####
@@ -286,6 +304,10 @@ class FpmImporter(object):
                     print "#DEBUG", item
                 print "##########################################################"
 
+            ## a library importer evicts once for all its models
+            if cache is not None and self.cache_key is None:
+                cache.evict()
+
         except Exception, ex:
             type, value, traceback = exc_info()
             if self.verbose in FpxUI.VERBOSE_NORMAL:
@@ -413,6 +435,7 @@ class FplImporter(object):
             use_model_filter=FpxUI.PROP_DEFAULT_USE_MODEL_FILTER,
             use_model_adjustment=FpxUI.PROP_DEFAULT_MODEL_ADJUST_FPL,
             keep_name=False,
+            use_cache=FpxUI.PROP_DEFAULT_USE_CACHE,
             ):
         self.report = report
         self.verbose = verbose
@@ -422,6 +445,7 @@ class FplImporter(object):
         self.use_model_filter = use_model_filter
         self.use_model_adjustment = use_model_adjustment
         self.keep_name = keep_name
+        self.use_cache = use_cache
 
     def read(self, blender_context, filepath):
         """ read fpl file and convert fpm content to bender content """
@@ -436,6 +460,8 @@ class FplImporter(object):
 
         active_scene = self.__context.screen.scene
 
+        cache = get_decode_cache() if self.use_cache else None
+
         try:
             self.folder_name, file_name = path.split(filepath)
 
@@ -464,7 +490,14 @@ class FplImporter(object):
 
                 if fpx_reader:
                     temp_name = path.join(app.tempdir, "__grab__fpl__")
-                    dst_path, dst_sub_path_names = fpx_reader.grab_content(temp_name)
+                    if cache is not None:
+                        cache_key = Fpx_Decode_Cache.source_key(file)
+                    else:
+                        cache_key = None
+                    try:
+                        dst_path, dst_sub_path_names = fpx_reader.grab_content(temp_name, cache=cache, cache_key=cache_key)
+                    finally:
+                        fpx_reader.close()
 
                     for key, item in dst_sub_path_names.items():
                         if key is not None and key.startswith('type_'):
@@ -487,6 +520,8 @@ class FplImporter(object):
                                         name_extra=file_name,
                                         use_model_filter=self.use_model_filter,
                                         use_model_adjustment=self.use_model_adjustment,
+                                        use_cache=self.use_cache,
+                                        cache_key=Fpx_Decode_Cache.sub_key(cache_key, key_name),
                                     ).read(
                                             blender_context=self.__context,
                                             filepath=item_path,
@@ -556,6 +591,9 @@ class FplImporter(object):
                     print "#DEBUG", item
                 print "##########################################################"
 
+            if cache is not None:
+                cache.evict()
+
         except Exception, ex:
             type, value, traceback = exc_info()
             if self.verbose in FpxUI.VERBOSE_NORMAL:
@@ -625,6 +663,8 @@ class FptImporter(object):
             use_model_filter=FpxUI.PROP_DEFAULT_USE_MODEL_FILTER,
             use_model_adjustment=FpxUI.PROP_DEFAULT_MODEL_ADJUST_FPT,
             keep_name=False,
+            use_parallel_decode=FpxUI.PROP_DEFAULT_USE_PARALLEL_DECODE,
+            use_cache=FpxUI.PROP_DEFAULT_USE_CACHE,
             ):
         self.report = report
         self.verbose = verbose
@@ -641,6 +681,8 @@ class FptImporter(object):
         self.use_model_filter = use_model_filter
         self.use_model_adjustment = use_model_adjustment
         self.keep_name = keep_name
+        self.use_parallel_decode = use_parallel_decode
+        self.use_cache = use_cache
 
         self.blend_resource_file = get_blend_resource_file_name()
 
@@ -682,7 +724,26 @@ class FptImporter(object):
             t2 = time()
             if fpx_reader:
                 temp_name = path.join(app.tempdir, "__grab__fpt__")
-                dst_path, dst_sub_path_names = fpx_reader.grab_content(temp_name)
+                if self.use_cache:
+                    cache = get_decode_cache()
+                    cache_key = Fpx_Decode_Cache.source_key(filepath)
+                else:
+                    cache = cache_key = None
+                try:
+                    if self.use_parallel_decode:
+                        # collect all embedded resources first,
+                        # then decompress them in a pool of processes
+                        grab_jobs = []
+                        dst_path, dst_sub_path_names = fpx_reader.grab_content(temp_name, jobs=grab_jobs, cache=cache, cache_key=cache_key)
+                        grab_tasks_to_file(grab_jobs, executable=app.binary_path_python)
+                    else:
+                        dst_path, dst_sub_path_names = fpx_reader.grab_content(temp_name, cache=cache, cache_key=cache_key)
+                finally:
+                    # the embedded data are views on the memory-mapped file
+                    grab_jobs = None
+                    fpx_reader.close()
+                if cache is not None:
+                    cache.evict()
 
                 # setup current Scene to default units
                 ##FpxUtilities.set_scene_to_default(self.__scene)
@@ -2866,6 +2927,7 @@ class FptImporter(object):
                     use_model_filter=self.use_model_filter,
                     use_model_adjustment=self.use_model_adjustment,
                     keep_name=False,
+                    use_cache=self.use_cache,
                     ).read(
                             self.__context,
                             filepath,
@@ -3287,6 +3349,14 @@ def rename_active_fpm(blender_context, dst_name):
         fpm_ext_ex = "{}{}".format(src_name, object_type)
         rename_active_ms3d(blender_context, fpm_ext_ex, dst_name, object_type);
 
+def get_decode_cache():
+    """ the decode cache lives in the user data folder, to survive sessions """
+    from bpy.utils import ( user_resource, )
+
+    cache_dir = user_resource('DATAFILES', path=FpxUI.CACHE_FOLDER_NAME, create=True)
+    return Fpx_Decode_Cache(cache_dir, FpxUI.PROP_DEFAULT_CACHE_SIZE << 20)
+
+
 def get_blend_resource_file_name():
     from importlib import ( find_loader, )
     from os import ( path, )
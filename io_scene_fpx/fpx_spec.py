@@ -81,6 +81,17 @@ from os import (
         fstat,
         path,
         makedirs,
+        listdir,
+        remove,
+        rename,
+        stat,
+        utime,
+        )
+from hashlib import (
+        sha1,
+        )
+from shutil import (
+        copyfile,
         )
 from collections import (
         OrderedDict,
@@ -92,6 +103,16 @@ from io import (
 from codecs import (
         register_error,
         )
+from multiprocessing import (
+        Pool,
+        )
+try:
+    from multiprocessing import (
+            set_executable,
+            )
+except ImportError:
+    ## python 2 has it on windows only, where it is needed
+    set_executable = None
 
 
 class FpxSpec(object):
@@ -620,20 +641,177 @@ class Fpx_zLZO_RawData_Stream(object):
         else:
             self.signature = None
             stream.seek(-4, SEEK_CUR)
-        self.src_buffer = stream.read(n)
+        self.src_buffer = stream.read_view(n)
+
+    def grab_to_file(self, filename, jobs=None, cache=None, cache_key=None):
+        """
+        decompress and write the data to filename,
+        or only add that as a job to the jobs list if given
+
+        cache: Fpx_Decode_Cache to restore the decompressed data from
+        or to store it to, under cache_key
+        """
+        if self.signature:
+            cache_filename = None
+            if cache is not None and cache_key is not None:
+                if cache.restore(cache_key, filename):
+                    return
+                cache_filename = cache.get_file_name(cache_key)
+            task = (filename, self.src_buffer, self.uncompressed_size, cache_filename)
+        else:
+            task = (filename, self.src_buffer, None, None)
 
-    def grab_to_file(self, filename):
-        with FileIO(filename, "wb") as raw_io:
-            if not self.signature:
-                raw_io.write(self.src_buffer)
-            else:
-                dst_buffer = bytearray(self.uncompressed_size)
-                src_size = len(self.src_buffer)
-                Lzo_Codec.Lzo1x_Decompress(self.src_buffer, 0, src_size, dst_buffer, 0)
-                raw_io.write(dst_buffer)
+        if jobs is not None:
+            jobs.append(task)
+        else:
+            grab_task_to_file(task)
+
+
+def grab_task_to_file(task):
+    """
+    task: (filename, src_buffer, uncompressed_size or None,
+    cache_filename or None)
+    """
+    filename, src_buffer, uncompressed_size, cache_filename = task
+    with FileIO(filename, "wb") as raw_io:
+        if uncompressed_size is None:
+            raw_io.write(src_buffer)
+        else:
+            dst_buffer = bytearray(uncompressed_size)
+            src_size = len(src_buffer)
+            Lzo_Codec.Lzo1x_Decompress_Fast(src_buffer, 0, src_size, dst_buffer, 0)
+            raw_io.write(dst_buffer)
+            if cache_filename:
+                Fpx_Decode_Cache.store(cache_filename, dst_buffer)
+
+        raw_io.flush()
+        raw_io.close()
+
+
+def grab_tasks_to_file(tasks, processes=None, executable=None):
+    """
+    run grab_task_to_file for all tasks,
+    spread over a pool of worker processes if there is more than one
+
+    executable: python interpreter to spawn the workers with,
+    where processes can not be forked (windows)
+    """
+    if len(tasks) > 1 and processes != 1:
+        if executable and set_executable:
+            set_executable(executable)
+        try:
+            pool = Pool(processes)
+        except (OSError, ImportError, NotImplementedError):
+            pool = None
+
+        if pool is not None:
+            ## (zero-copy) views can not be pickled
+            tasks = [(filename, bytes(bytearray(src_buffer)), uncompressed_size, cache_filename)
+                    for filename, src_buffer, uncompressed_size, cache_filename in tasks]
+            try:
+                pool.map(grab_task_to_file, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+            return
+
+    for task in tasks:
+        grab_task_to_file(task)
+
+
+###############################################################################
+class Fpx_Decode_Cache(object):
+    """
+    persistent on-disk cache of decompressed zLZO data,
+    so library models only get decompressed the first time they are used.
+
+    entries are files named by the sha1 of their key,
+    a key is a tuple starting with the source_key() of the library file
+    followed by the names of the stream within.
+    the least recently used entries get evicted above max_size bytes.
+    """
+    FILE_EXT = ".bin"
+
+    __slots__ = (
+            '__cache_dir',
+            '__max_size',
+            )
 
-            raw_io.flush()
-            raw_io.close()
+    def __init__(self, cache_dir, max_size=(512 << 20)):
+        self.__cache_dir = cache_dir
+        self.__max_size = max_size
+        makedirs(cache_dir, mode=0777, exist_ok=True)
+
+    @staticmethod
+    def source_key(filepath):
+        """ identifies the version of a file by its path and time stamp """
+        file_stat = stat(filepath)
+        return (path.normcase(path.abspath(filepath)), file_stat.st_mtime, file_stat.st_size, )
+
+    @staticmethod
+    def sub_key(cache_key, *names):
+        if cache_key is None:
+            return None
+        return cache_key + names
+
+    def get_file_name(self, cache_key):
+        digest = sha1(repr(cache_key).encode('utf-8')).hexdigest()
+        return path.join(self.__cache_dir, digest + Fpx_Decode_Cache.FILE_EXT)
+
+    def restore(self, cache_key, filename):
+        """ copy a cached entry to filename, returns False on a miss """
+        cache_filename = self.get_file_name(cache_key)
+        if not path.isfile(cache_filename):
+            return False
+        try:
+            copyfile(cache_filename, filename)
+            ## mark as recently used
+            utime(cache_filename, None)
+        except (IOError, OSError):
+            return False
+        return True
+
+    @staticmethod
+    def store(cache_filename, data):
+        """ write an entry, via a temporary file so readers never see a partial one """
+        temp_filename = "{}.{}.tmp".format(cache_filename, id(data))
+        try:
+            with FileIO(temp_filename, "wb") as raw_io:
+                raw_io.write(data)
+            if path.exists(cache_filename):
+                remove(cache_filename)
+            rename(temp_filename, cache_filename)
+        except (IOError, OSError):
+            if path.exists(temp_filename):
+                remove(temp_filename)
+
+    def evict(self):
+        """ remove the least recently used entries until the cache fits max_size """
+        entries = []
+        total_size = 0
+        for name in listdir(self.__cache_dir):
+            if not name.endswith(Fpx_Decode_Cache.FILE_EXT):
+                continue
+            cache_filename = path.join(self.__cache_dir, name)
+            try:
+                file_stat = stat(cache_filename)
+            except OSError:
+                continue
+            entries.append((file_stat.st_mtime, file_stat.st_size, cache_filename, ))
+            total_size += file_stat.st_size
+
+        if total_size <= self.__max_size:
+            return
+
+        entries.sort()
+        for mtime, size, cache_filename in entries:
+            try:
+                remove(cache_filename)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.__max_size:
+                break
 
 
 ###############################################################################
@@ -2793,7 +2971,7 @@ class Fpm_File_Reader(Cfb_RawIO_Reader):
 
         #print("#DEBUG", reader)
 
-    def grab_content(self, dst_path=None):
+    def grab_content(self, dst_path=None, cache=None, cache_key=None):
         dst_sub_path_names = {}
 
         if not dst_path:
@@ -2809,10 +2987,10 @@ class Fpm_File_Reader(Cfb_RawIO_Reader):
         makedirs(dst_path, mode=0777, exist_ok=True)
         self.__dst_path = dst_path
 
-        return Fpm_File_Reader.grab_content_ex(dst_path, { "modeldata": self.PinModel, }, dst_sub_path_names)
+        return Fpm_File_Reader.grab_content_ex(dst_path, { "modeldata": self.PinModel, }, dst_sub_path_names, cache=cache, cache_key=cache_key)
 
     @staticmethod
-    def grab_content_ex(dst_path, pinmodel_dict, dst_sub_path_names):
+    def grab_content_ex(dst_path, pinmodel_dict, dst_sub_path_names, jobs=None, cache=None, cache_key=None):
         for key, reader in pinmodel_dict.items():
             item_name = reader.get_value("name")
             item_name = FpxUtilities.toGoodName(item_name) ###
@@ -2836,7 +3014,7 @@ class Fpm_File_Reader(Cfb_RawIO_Reader):
             item_data = reader.get_value("preview_data")
             if item_path and item_data:
                 full_path = path.normpath(path.join(dst_sub_path, item_path))
-                item_data.grab_to_file(full_path)
+                item_data.grab_to_file(full_path, jobs, cache, Fpx_Decode_Cache.sub_key(cache_key, key, "preview_data"))
                 dst_sub_path_names["preview_data"] = full_path
 
             # grab primary_model
@@ -2846,7 +3024,7 @@ class Fpm_File_Reader(Cfb_RawIO_Reader):
             item_data = reader.get_value("primary_model_data")
             if item_path and item_data:
                 full_path = path.normpath(path.join(dst_sub_path, item_path))
-                item_data.grab_to_file(full_path)
+                item_data.grab_to_file(full_path, jobs, cache, Fpx_Decode_Cache.sub_key(cache_key, key, "primary_model_data"))
                 dst_sub_path_names["primary_model_data"] = full_path
 
             # grab secondary_model
@@ -2856,7 +3034,7 @@ class Fpm_File_Reader(Cfb_RawIO_Reader):
             item_data = reader.get_value("secondary_model_data")
             if item_path and item_data:
                 full_path = path.normpath(path.join(dst_sub_path, item_path))
-                item_data.grab_to_file(full_path)
+                item_data.grab_to_file(full_path, jobs, cache, Fpx_Decode_Cache.sub_key(cache_key, key, "secondary_model_data"))
                 dst_sub_path_names["secondary_model_data"] = full_path
 
             # grab mask_model
@@ -2866,7 +3044,7 @@ class Fpm_File_Reader(Cfb_RawIO_Reader):
             item_data = reader.get_value("mask_model_data")
             if item_path and item_data:
                 full_path = path.normpath(path.join(dst_sub_path, item_path))
-                item_data.grab_to_file(full_path)
+                item_data.grab_to_file(full_path, jobs, cache, Fpx_Decode_Cache.sub_key(cache_key, key, "mask_model_data"))
                 dst_sub_path_names["mask_model_data"] = full_path
 
             # grab reflection_model
@@ -2876,7 +3054,7 @@ class Fpm_File_Reader(Cfb_RawIO_Reader):
             item_data = reader.get_value("reflection_model_data")
             if item_path and item_data:
                 full_path = path.normpath(path.join(dst_sub_path, item_path))
-                item_data.grab_to_file(full_path)
+                item_data.grab_to_file(full_path, jobs, cache, Fpx_Decode_Cache.sub_key(cache_key, key, "reflection_model_data"))
                 dst_sub_path_names["reflection_model_data"] = full_path
 
         return dst_path, dst_sub_path_names
@@ -2939,7 +3117,7 @@ class Fpl_File_Reader(Cfb_RawIO_Reader):
             data.FDAT = Fpx_zLZO_RawData_Stream(stream)
         pass
 
-    def grab_content(self, dst_path=None, filter={}, name=None):
+    def grab_content(self, dst_path=None, filter={}, name=None, cache=None, cache_key=None):
         if not dst_path:
             dst_path = "fpl_grab"
             dst_path = path.normpath(dst_path)
@@ -2982,7 +3160,7 @@ class Fpl_File_Reader(Cfb_RawIO_Reader):
             item_data=value.FDAT
             if item_path and item_data:
                 full_path = path.normpath(path.join(dst_sub_path, item_path))
-                item_data.grab_to_file(full_path)
+                item_data.grab_to_file(full_path, cache=cache, cache_key=Fpx_Decode_Cache.sub_key(cache_key, item_name, "FDAT"))
                 dst_sub_path_names[item_name] = full_path
 
         return dst_path, dst_sub_path_names
@@ -3089,7 +3267,7 @@ class Fpt_File_Reader(Cfb_RawIO_Reader):
         makedirs(dst_path, mode=0777, exist_ok=False)
         self.__dst_path = dst_path
 
-    def grab_content(self, dst_path=None, name=None, filter=None):
+    def grab_content(self, dst_path=None, name=None, filter=None, jobs=None, cache=None, cache_key=None):
         if not dst_path:
             dst_path = "fpt_grab"
             dst_path = path.normpath(dst_path)
@@ -3152,7 +3330,7 @@ class Fpt_File_Reader(Cfb_RawIO_Reader):
                 type = Fpt_PackedLibrary_Type.TYPE_MODEL
 
                 fpm_sub_path_names = {}
-                dst_sub_path_names["data_{}".format(item_name)] = Fpm_File_Reader.grab_content_ex(dst_path, { item_name: reader, }, fpm_sub_path_names)
+                dst_sub_path_names["data_{}".format(item_name)] = Fpm_File_Reader.grab_content_ex(dst_path, { item_name: reader, }, fpm_sub_path_names, jobs, cache, cache_key)
                 dst_sub_path_names["type_{}".format(item_name)] = type
 
             elif isinstance(reader, Fpt_ImageList_Reader):
@@ -3178,7 +3356,7 @@ class Fpt_File_Reader(Cfb_RawIO_Reader):
                 if not sub_item_data:
                     continue
                 full_path = path.normpath(path.join(dst_sub_path, "{}.{}".format(sub_item_name, item_ext))).lower()
-                sub_item_data.grab_to_file(full_path)
+                sub_item_data.grab_to_file(full_path, jobs, cache, Fpx_Decode_Cache.sub_key(cache_key, sub_item_name))
                 dst_sub_path_names[sub_item_name] = full_path
                 dst_sub_path_names["type_{}".format(sub_item_name)] = type
 
@@ -161,6 +161,14 @@ fpx_str = {
         'PROP_NAME_KEEP_TEMP': "Keep Temp Files",
         'PROP_DESC_KEEP_TEMP': "Do not delete temporary files",
 
+        'PROP_NAME_USE_PARALLEL_DECODE': "Parallel Decode",
+        'PROP_DESC_USE_PARALLEL_DECODE': "Decompress embedded resources"\
+                " in multiple processes",
+
+        'PROP_NAME_USE_CACHE': "Use Decode Cache",
+        'PROP_DESC_USE_CACHE': "Keep decompressed library models on disk"\
+                " and reuse them while the library file is unchanged",
+
         'LABEL_NAME_NOT_IMPLEMENTED': "Not Implemented Yet!",
         'LABEL_NAME_NOT_IMPLEMENTED_1': "You have chosen an option,",
         'LABEL_NAME_NOT_IMPLEMENTED_2': "that is not implemented yet.",
@@ -141,6 +141,12 @@ class FpxUI(object):
 
     PROP_DEFAULT_KEEP_TEMP = False
 
+    PROP_DEFAULT_USE_PARALLEL_DECODE = True
+
+    PROP_DEFAULT_USE_CACHE = True
+    PROP_DEFAULT_CACHE_SIZE = 512 # MiB
+    CACHE_FOLDER_NAME = "io_scene_fpx_cache"
+
 def NotImplemented(layout):
     box = layout.box()
     box.label(fpx_str['LABEL_NAME_NOT_IMPLEMENTED'], icon='ERROR')
@@ -280,6 +286,12 @@ class FpmImportOperator(Operator, ImportHelper):
             default=FpxUI.PROP_DEFAULT_KEEP_TEMP,
             )
 
+    use_cache = BoolProperty(
+            name=fpx_str['PROP_NAME_USE_CACHE'],
+            description=fpx_str['PROP_DESC_USE_CACHE'],
+            default=FpxUI.PROP_DEFAULT_USE_CACHE,
+            )
+
 
     use_all_models_of_folder = BoolProperty(
             name=fpx_str['PROP_NAME_ALL_MODELS'],
@@ -361,6 +373,7 @@ class FpmImportOperator(Operator, ImportHelper):
         flow.prop(self, 'verbose', icon='SPEAKER')
         flow = box.column_flow()
         flow.prop(self, 'keep_temp', icon='GHOST')
+        flow.prop(self, 'use_cache', icon='DISK_DRIVE')
         flow.prop(self, 'use_all_models_of_folder', icon='FILE_FOLDER')
         flow.prop(self, 'use_scene_per_model', icon='SCENE_DATA')
         flow.prop(self, 'name_extra', icon='TEXT', text="")
@@ -383,6 +396,7 @@ class FpmImportOperator(Operator, ImportHelper):
                 name_extra=self.name_extra,
                 use_model_filter=self.use_model_filter,
                 use_model_adjustment=self.use_model_adjustment,
+                use_cache=self.use_cache,
                 ).read(
                         blender_context,
                         self.filepath,
@@ -459,6 +473,12 @@ class FplImportOperator(Operator, ImportHelper):
             default=FpxUI.PROP_DEFAULT_KEEP_TEMP,
             )
 
+    use_cache = BoolProperty(
+            name=fpx_str['PROP_NAME_USE_CACHE'],
+            description=fpx_str['PROP_DESC_USE_CACHE'],
+            default=FpxUI.PROP_DEFAULT_USE_CACHE,
+            )
+
 
     use_all_libraries_of_folder = BoolProperty(
             name=fpx_str['PROP_NAME_ALL_LIBRARIES'],
@@ -574,6 +594,7 @@ class FplImportOperator(Operator, ImportHelper):
         flow.prop(self, 'verbose', icon='SPEAKER')
         flow = box.column_flow()
         flow.prop(self, 'keep_temp', icon='GHOST')
+        flow.prop(self, 'use_cache', icon='DISK_DRIVE')
         flow.prop(self, 'use_all_libraries_of_folder', icon='FILE_FOLDER')
 
         FplImportOperator.draw_library_options(self, layout)
@@ -594,6 +615,7 @@ class FplImportOperator(Operator, ImportHelper):
                 use_library_filter=self.use_library_filter,
                 use_model_filter=self.use_model_filter,
                 use_model_adjustment=self.use_model_adjustment,
+                use_cache=self.use_cache,
                 ).read(
                         blender_context,
                         self.filepath,
@@ -672,6 +694,12 @@ class FptImportOperator(Operator, ImportHelper):
             default=FpxUI.PROP_DEFAULT_KEEP_TEMP,
             )
 
+    use_cache = BoolProperty(
+            name=fpx_str['PROP_NAME_USE_CACHE'],
+            description=fpx_str['PROP_DESC_USE_CACHE'],
+            default=FpxUI.PROP_DEFAULT_USE_CACHE,
+            )
+
 
     path_libraries = StringProperty(
             name=fpx_str['PROP_NAME_LIBRARIES_PATH'],
@@ -835,6 +863,12 @@ class FptImportOperator(Operator, ImportHelper):
             default=FpxUI.PROP_DEFAULT_MODEL_ADJUST_FPT,
             )
 
+    use_parallel_decode = BoolProperty(
+            name=fpx_str['PROP_NAME_USE_PARALLEL_DECODE'],
+            description=fpx_str['PROP_DESC_USE_PARALLEL_DECODE'],
+            default=FpxUI.PROP_DEFAULT_USE_PARALLEL_DECODE,
+            )
+
 
     filename_ext = fpx_str['FILE_EXT_FPT']
 
@@ -859,6 +893,7 @@ class FptImportOperator(Operator, ImportHelper):
         flow.prop(self, 'verbose', icon='SPEAKER')
         flow = box.column_flow()
         flow.prop(self, 'keep_temp', icon='GHOST')
+        flow.prop(self, 'use_cache', icon='DISK_DRIVE')
 
         box.label(fpx_str['LABEL_NAME_EXTERNAL_DATA'], icon=FpxUI.ICON_EXTERNAL_DATA)
         flow = box.column_flow()
@@ -880,6 +915,8 @@ class FptImportOperator(Operator, ImportHelper):
         flow.prop(self, 'resolution_shape', icon='MOD_REMESH')
         flow = box.column_flow()
         flow.prop(self, 'use_hermite_handle', icon='CURVE_BEZCURVE')
+        flow = box.column_flow()
+        flow.prop(self, 'use_parallel_decode', icon='SORTTIME')
 
         FplImportOperator.draw_library_options(self, layout)
         FpmImportOperator.draw_model_options(self, layout)
@@ -906,6 +943,8 @@ class FptImportOperator(Operator, ImportHelper):
                 use_library_filter = self.use_library_filter,
                 use_model_filter = self.use_model_filter,
                 use_model_adjustment = self.use_model_adjustment,
+                use_parallel_decode = self.use_parallel_decode,
+                use_cache = self.use_cache,
                 ).read(
                         blender_context,
                         self.filepath,
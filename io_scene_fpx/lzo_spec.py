@@ -36,14 +36,52 @@
 ## http://www.oberhumer.com/opensource/lzo/download/LZO-v1/java-lzo-1.00.tar.gz
 
 
+from __future__ import absolute_import
+from ctypes import (
+        CDLL,
+        byref,
+        c_char,
+        c_size_t,
+        )
+from ctypes.util import (
+        find_library,
+        )
+from random import (
+        Random,
+        )
+from time import (
+        time,
+        )
+
+
+def load_native_lzo():
+    """ returns the system liblzo2 if it could be found, else None """
+    try:
+        name = find_library('lzo2')
+        if not name:
+            return None
+        lib = CDLL(name)
+        lib.lzo1x_decompress_safe
+    except (OSError, AttributeError):
+        return None
+    return lib
+
+
 class Lzo_Codec(object):
 
     LZO_E_OK                  =  0
     LZO_E_ERROR               = -1
     LZO_E_INPUT_OVERRUN       = -4
+    LZO_E_OUTPUT_OVERRUN      = -5
     LZO_E_LOOKBEHIND_OVERRUN  = -6
     LZO_E_INPUT_NOT_CONSUMED  = -8
 
+    M2_MAX_OFFSET = 0x0800
+    M3_MAX_OFFSET = 0x4000
+    M4_MAX_OFFSET = 0xBFFF
+
+    native_lib = load_native_lzo()
+
     @staticmethod
     def Lzo1x_Decompress(src, src_offset, src_length, dst, dst_offset):
         """
@@ -207,9 +245,333 @@ class Lzo_Codec(object):
             return error, result_index
         return error, result_index
 
+    @staticmethod
+    def Lzo1x_Decompress_Fast(src, src_offset, src_length, dst, dst_offset):
+        """
+        src = bytes
+        dst = bytearray
+
+        returns: error, result_index
+
+        uses the system liblzo2 if available,
+        the bulk copying python decoder otherwise.
+        """
+        if Lzo_Codec.native_lib is not None:
+            return Lzo_Codec.Lzo1x_Decompress_Native(src, src_offset, src_length, dst, dst_offset)
+        return Lzo_Codec.Lzo1x_Decompress_Python(src, src_offset, src_length, dst, dst_offset)
+
+    @staticmethod
+    def Lzo1x_Decompress_Native(src, src_offset, src_length, dst, dst_offset):
+        """
+        src = bytes
+        dst = bytearray
+
+        returns: error, result_index
+        """
+        src_buffer = (c_char * src_length).from_buffer_copy(src[src_offset:src_offset + src_length])
+        dst_buffer = (c_char * len(dst)).from_buffer(dst)
+        dst_length = c_size_t(len(dst) - dst_offset)
+        ## decompression needs no work memory and no lzo_init()
+        error = Lzo_Codec.native_lib.lzo1x_decompress_safe(
+                src_buffer,
+                c_size_t(src_length),
+                byref(dst_buffer, dst_offset),
+                byref(dst_length),
+                None,
+                )
+        return error, dst_length.value
+
+    @staticmethod
+    def Lzo1x_Decompress_Python(src, src_offset, src_length, dst, dst_offset):
+        """
+        src = bytes
+        dst = bytearray
+
+        returns: error, result_index
+
+        same as Lzo1x_Decompress, but literal runs and matches
+        are copied as slices instead of byte by byte.
+        """
+        if not isinstance(src, bytearray):
+            src = bytearray(src)
+        src_view = memoryview(src)
+        src_end = src_offset + src_length
+        dst_end = len(dst)
+        src_index = src_offset
+        dst_index = dst_offset
+
+        OUTER, FIRST_LITERAL_RUN, MATCH, MATCH_DONE, MATCH_NEXT = xrange(5)
+        state = OUTER
+
+        try:
+            value = src[src_index]
+            if value > 17:
+                src_index += 1
+                value -= 17
+                if value < 4:
+                    state = MATCH_NEXT
+                else:
+                    if src_index + value > src_end:
+                        return Lzo_Codec.LZO_E_INPUT_OVERRUN, dst_index - dst_offset
+                    if dst_index + value > dst_end:
+                        return Lzo_Codec.LZO_E_OUTPUT_OVERRUN, dst_index - dst_offset
+                    dst[dst_index:dst_index + value] = src_view[src_index:src_index + value]
+                    dst_index += value
+                    src_index += value
+                    state = FIRST_LITERAL_RUN
+
+            while True:
+                if state == OUTER:
+                    value = src[src_index]
+                    src_index += 1
+                    if value >= 16:
+                        state = MATCH
+                        continue
+                    ## literal run
+                    if value == 0:
+                        while src[src_index] == 0:
+                            value += 255
+                            src_index += 1
+                        value += 15 + src[src_index]
+                        src_index += 1
+                    value += 3
+                    if src_index + value > src_end:
+                        return Lzo_Codec.LZO_E_INPUT_OVERRUN, dst_index - dst_offset
+                    if dst_index + value > dst_end:
+                        return Lzo_Codec.LZO_E_OUTPUT_OVERRUN, dst_index - dst_offset
+                    dst[dst_index:dst_index + value] = src_view[src_index:src_index + value]
+                    dst_index += value
+                    src_index += value
+                    state = FIRST_LITERAL_RUN
+
+                if state == FIRST_LITERAL_RUN:
+                    value = src[src_index]
+                    src_index += 1
+                    if value >= 16:
+                        state = MATCH
+                    else:
+                        pos = dst_index - (1 + Lzo_Codec.M2_MAX_OFFSET) - (value >> 2) - (src[src_index] << 2)
+                        src_index += 1
+                        length = 3
+                        state = MATCH_DONE
+
+                if state == MATCH:
+                    if value >= 64:
+                        pos = dst_index - 1 - ((value >> 2) & 7) - (src[src_index] << 3)
+                        src_index += 1
+                        length = (value >> 5) + 1
+                    elif value >= 32:
+                        value &= 31
+                        if value == 0:
+                            while src[src_index] == 0:
+                                value += 255
+                                src_index += 1
+                            value += 31 + src[src_index]
+                            src_index += 1
+                        pos = dst_index - 1 - (src[src_index] >> 2) - (src[src_index + 1] << 6)
+                        src_index += 2
+                        length = value + 2
+                    elif value >= 16:
+                        pos = dst_index - ((value & 8) << 11)
+                        value &= 7
+                        if value == 0:
+                            while src[src_index] == 0:
+                                value += 255
+                                src_index += 1
+                            value += 7 + src[src_index]
+                            src_index += 1
+                        pos -= (src[src_index] >> 2) + (src[src_index + 1] << 6)
+                        src_index += 2
+                        if pos == dst_index:
+                            break ## end of stream
+                        pos -= 0x4000
+                        length = value + 2
+                    else:
+                        pos = dst_index - 1 - (value >> 2) - (src[src_index] << 2)
+                        src_index += 1
+                        length = 2
+                    state = MATCH_DONE
+
+                if state == MATCH_DONE:
+                    if pos < dst_offset:
+                        return Lzo_Codec.LZO_E_LOOKBEHIND_OVERRUN, dst_index - dst_offset
+                    if dst_index + length > dst_end:
+                        return Lzo_Codec.LZO_E_OUTPUT_OVERRUN, dst_index - dst_offset
+                    distance = dst_index - pos
+                    if distance >= length:
+                        dst[dst_index:dst_index + length] = dst[pos:pos + length]
+                        dst_index += length
+                    else:
+                        ## overlapping match, repeat the pattern
+                        ## doubling the copied slice each time
+                        while length > 0:
+                            size = min(dst_index - pos, length)
+                            dst[dst_index:dst_index + size] = dst[pos:pos + size]
+                            dst_index += size
+                            length -= size
+                    value = src[src_index - 2] & 3
+                    if value == 0:
+                        state = OUTER
+                        continue
+                    state = MATCH_NEXT
+
+                if state == MATCH_NEXT:
+                    if src_index + value > src_end:
+                        return Lzo_Codec.LZO_E_INPUT_OVERRUN, dst_index - dst_offset
+                    if dst_index + value > dst_end:
+                        return Lzo_Codec.LZO_E_OUTPUT_OVERRUN, dst_index - dst_offset
+                    dst[dst_index:dst_index + value] = src_view[src_index:src_index + value]
+                    dst_index += value
+                    src_index += value
+                    value = src[src_index]
+                    src_index += 1
+                    state = MATCH
+
+        except IndexError:
+            return Lzo_Codec.LZO_E_INPUT_OVERRUN, dst_index - dst_offset
+
+        result_index = dst_index - dst_offset
+        if src_index < src_end:
+            return Lzo_Codec.LZO_E_INPUT_NOT_CONSUMED, result_index
+        if src_index > src_end:
+            return Lzo_Codec.LZO_E_INPUT_OVERRUN, result_index
+        return Lzo_Codec.LZO_E_OK, result_index
+
+    @staticmethod
+    def Lzo1x_Compress(src):
+        """
+        src = bytes
+
+        returns: bytearray
+
+        a simple greedy LZO1X compressor,
+        the output can be read by any of the decompressors.
+        """
+        src = bytearray(src)
+        src_length = len(src)
+        dst = bytearray()
+        last_positions = {}
+        literal_index = 0
+        src_index = 4 ## the first literal run needs at least 4 literals
+        trailing_index = -1 ## byte of the last match to put 1..3 literals in
+
+        def write_length(value):
+            ## length extension, a zero byte per 255 and a remainder > 0
+            zeros = (value - 1) // 255
+            dst.extend(bytearray(zeros))
+            dst.append(value - 255 * zeros)
+
+        def write_literals(end_index):
+            value = end_index - literal_index
+            if value == 0:
+                return
+            if value < 4:
+                if trailing_index < 0:
+                    dst.append(17 + value)
+                else:
+                    dst[trailing_index] |= value
+            elif value - 3 <= 15:
+                dst.append(value - 3)
+            else:
+                dst.append(0)
+                write_length(value - 3 - 15)
+            dst.extend(src[literal_index:end_index])
+
+        while src_index + 3 <= src_length:
+            key = bytes(src[src_index:src_index + 3])
+            pos = last_positions.get(key)
+            last_positions[key] = src_index
+            distance = src_index - pos if pos is not None else 0
+            if distance <= 0 or distance > Lzo_Codec.M4_MAX_OFFSET:
+                src_index += 1
+                continue
+
+            length = 3
+            while src_index + length < src_length and src[pos + length] == src[src_index + length]:
+                length += 1
+
+            write_literals(src_index)
+
+            if length <= 8 and distance <= Lzo_Codec.M2_MAX_OFFSET:
+                distance -= 1
+                dst.append(((length - 1) << 5) | ((distance & 7) << 2))
+                trailing_index = len(dst) - 1
+                dst.append(distance >> 3)
+            else:
+                if distance <= Lzo_Codec.M3_MAX_OFFSET:
+                    distance -= 1
+                    if length - 2 <= 31:
+                        dst.append(32 | (length - 2))
+                    else:
+                        dst.append(32)
+                        write_length(length - 2 - 31)
+                else:
+                    distance -= 0x4000
+                    marker = 16 | ((distance >> 11) & 8)
+                    distance &= 0x3FFF
+                    if length - 2 <= 7:
+                        dst.append(marker | (length - 2))
+                    else:
+                        dst.append(marker)
+                        write_length(length - 2 - 7)
+                dst.append((distance << 2) & 0xFF)
+                trailing_index = len(dst) - 1
+                dst.append(distance >> 6)
+
+            for index in xrange(src_index + 1, min(src_index + length, src_length - 2)):
+                last_positions[bytes(src[index:index + 3])] = index
+            src_index += length
+            literal_index = src_index
+
+        write_literals(src_length)
+
+        ## end of stream marker
+        dst.extend((17, 0, 0))
+        return dst
+
 ###############################################################################
 
 
+def benchmark(size=1 << 20, repeat=3):
+    """
+    round trip pseudo random, compressible data through
+    Lzo1x_Compress and compare the decompressors.
+    """
+    random = Random(0)
+    words = [bytearray(random.randint(0, 255) for i in xrange(random.randint(2, 12))) for j in xrange(256)]
+    src = bytearray()
+    while len(src) < size:
+        src.extend(random.choice(words))
+    src = bytes(src[:size])
+
+    compressed = bytes(Lzo_Codec.Lzo1x_Compress(src))
+    print("compressed {} to {} bytes".format(len(src), len(compressed)))
+
+    decompressors = [
+            ('Lzo1x_Decompress', Lzo_Codec.Lzo1x_Decompress),
+            ('Lzo1x_Decompress_Python', Lzo_Codec.Lzo1x_Decompress_Python),
+            ]
+    if Lzo_Codec.native_lib is not None:
+        decompressors.append(('Lzo1x_Decompress_Native', Lzo_Codec.Lzo1x_Decompress_Native))
+
+    for name, decompress in decompressors:
+        best = None
+        for i in xrange(repeat):
+            dst = bytearray(len(src))
+            t0 = time()
+            error, result_index = decompress(bytearray(compressed), 0, len(compressed), dst, 0)
+            t1 = time() - t0
+            if best is None or t1 < best:
+                best = t1
+        ok = error == Lzo_Codec.LZO_E_OK and result_index == len(src) and bytes(dst) == src
+        print("{:<24} {:8.3f}s {}".format(name, best, "ok" if ok else "FAILED ({})".format(error)))
+
+
+if __name__ == "__main__":
+    benchmark()
+
+
+
 ###############################################################################
 #234567890123456789012345678901234567890123456789012345678901234567890123456789
 #--------1---------2---------3---------4---------5---------6---------7---------
@@ -118,10 +118,18 @@ import random
 from math import sqrt
 from mathutils import Vector
 import struct
+import sys
 import bisect
+import hashlib
 import os.path
 from io import open
 from itertools import imap
+from timeit import default_timer
+from multiprocessing import Pool
+try:
+    import numpy
+except ImportError:
+    numpy = None
 notZero = 0.0000000001
 #scn = bpy.context.scene
 winmgr = bpy.context.window_manager
@@ -159,7 +167,7 @@ def getLowHigh(aList):
         if a > tHigh: tHigh = a
     return tLow, tHigh
 
-def weightedRandomChoice(aList):
+def weightedRandomChoice(aList, rng = random):
     tL = []
     tweight = 0
     for a in xrange(len(aList)):
@@ -167,7 +175,7 @@ def weightedRandomChoice(aList):
         if weight > 0.0:
             tweight += weight
             tL.append((tweight, idex))
-    i = bisect.bisect(tL, (random.uniform(0, tweight), None))    
+    i = bisect.bisect(tL, (rng.uniform(0, tweight), None))    
     r = tL[i][1]
     return r
 
@@ -505,20 +513,47 @@ def buildCPGraph(arr, sti = 2):
 ###---IN -XYZ ARRAY AS BUILT BY GENERATOR
 ###---OUT -[(CHILDindex, PARENTindex)]
 ###   sti - start index, 2 for Empty, len(me.vertices) for Mesh
+###   PARENT IS THE FIRST INDEX OF THE LAST 26-NEIGHBOUR (IN STENCIL
+###   ORDER) THAT WAS GROWN BEFORE THE CELL, LOOKED UP IN A DICT
     sgarr = []
     sgarr.append((1, 0)) #
+    cindex = {}
+    for ai in xrange(sti):
+        cindex.setdefault(arr[ai], ai)
+    cti = 0
     for ai in xrange(sti, len(arr)):
         cs = arr[ai]
-        cpts = arr[0:ai]
-        cslap = getStencil3D_26(cs[0], cs[1], cs[2])
-
-        for nc in cslap:
-            ct = cpts.count(nc)
-            if ct>0:
-                cti = cpts.index(nc)
+        for s in STENCIL_26:
+            nci = cindex.get((cs[0] + s[0], cs[1] + s[1], cs[2] + s[2]))
+            if nci is not None:
+                cti = nci
         sgarr.append((ai, cti))
+        cindex.setdefault(cs, ai)
     return sgarr
 
+class CPGraph(object):
+###---CHILD/PARENT GRAPH FROM buildCPGraph WITH EXPLICIT ADJACENCY
+###   parent -{CHILD: PARENT}, children -{PARENT: [CHILD]}
+###   order -{CHILD: POSITION OF ITS EDGE IN edges}
+    def __init__(self, edges):
+        self.edges = edges
+        self.parent = {}
+        self.children = {}
+        self.order = {}
+        for ei in xrange(len(edges)):
+            c, p = edges[ei]
+            if c not in self.parent:
+                self.parent[c] = p
+                self.order[c] = ei
+            self.children.setdefault(p, []).append(c)
+
+    def __len__(self):
+        return len(self.edges)
+
+def getCPGraph(ngraph):
+    if isinstance(ngraph, CPGraph): return ngraph
+    return CPGraph(ngraph)
+
 def buildCPGraph_WORKINPROGRESS(arr, sti = 2):
 ###---IN -XYZ ARRAY AS BUILT BY GENERATOR
 ###---OUT -[(CHILDindex, PARENTindex)]
@@ -545,19 +580,18 @@ def findChargePath(oc, fc, ngraph, restrict = [], partial = True):
     ###---oc -ORIGIN CHARGE INDEX, fc -FINAL CHARGE INDEX
     ###---ngraph -NODE GRAPH, restrict- INDEX OF SITES CANNOT TRAVERSE
     ###---partial -RETURN PARTIAL PATH IF RESTRICTION ENCOUNTERD
-    cList = splitList(ngraph, 0)
-    pList = splitList(ngraph, 1)
+    ngraph = getCPGraph(ngraph)
+    parent = ngraph.parent
     aRi = []
     cNODE = fc
     for x in xrange(len(ngraph)):
-        pNODE = pList[cList.index(cNODE)]
+        pNODE = parent[cNODE]
         aRi.append(cNODE)
         cNODE = pNODE
-        npNODECOUNT = cList.count(pNODE)
         if cNODE == oc:             ###   STOP IF ORIGIN FOUND
             aRi.append(cNODE)       ###   RETURN PATH
             return aRi
-        if npNODECOUNT == 0:        ###   STOP IF NO PARENTS
+        if pNODE not in parent:     ###   STOP IF NO PARENTS
             return []               ###   RETURN []
         if pNODE in restrict:       ###   STOP IF PARENT IS IN RESTRICTION
             if partial:             ###   RETURN PARTIAL OR []
@@ -566,50 +600,83 @@ def findChargePath(oc, fc, ngraph, restrict = [], partial = True):
             else: return []
 
 def findTips(arr):
-    lt = []
-    for ai in arr[0:len(arr)-1]:
-        a = ai[0]
-        cCOUNT = 0
-        for bi in arr:
-            b = bi[1]
-            if a == b:
-                cCOUNT += 1
-        if cCOUNT == 0:
-            lt.append(a)
-    return lt
+    ###---CHILDREN THAT ARE NEVER A PARENT (LAST CELL EXCLUDED)
+    edges = getCPGraph(arr).edges
+    parents = set(splitList(edges, 1))
+    return [ai[0] for ai in edges[0:len(edges)-1] if ai[0] not in parents]
 
 def findChannelRoots(path, ngraph, restrict = []):
-    roots = []
-    for ai in xrange(len(ngraph)):
-        chi = ngraph[ai][0]
-        par = ngraph[ai][1]
-        if par in path and not chi in path and \
-            not chi in restrict:        
-            roots.append(par)
-    droots = deDupe(roots)
-    return droots
+    ###---PARENTS ON path WITH A CHILD OFF path AND restrict,
+    ###   IN THE ORDER THEIR FIRST SUCH EDGE APPEARS IN ngraph
+    ngraph = getCPGraph(ngraph)
+    pset = set(path)
+    roots = {}
+    for par in pset:
+        for chi in ngraph.children.get(par, ()):
+            if chi in pset or chi in restrict: continue
+            ei = ngraph.order[chi]
+            if par not in roots or ei < roots[par]:
+                roots[par] = ei
+    return sorted(roots, key = roots.get)
 
 def findChannels(roots, tips, ngraph, restrict):
+    ###---FOR EACH ROOT THE LONGEST BRANCHING PATH TO A TIP, THE TIP
+    ###   IS THEN TAKEN (REMOVED FROM tips). SAME RESULT AS TRYING
+    ###   findChargePath(r, t, .., False) FOR EVERY ROOT/TIP PAIR, BUT
+    ###   EACH NODE IS WALKED UP ONCE:
+    ###   up[n] = (STOP, LENGTH, BRANCHED) -FIRST ANCESTOR OF n THAT IS A
+    ###   ROOT, RESTRICTED OR HAS NO PARENT, PATH LENGTH TO IT AND IF
+    ###   ANY NODE BEFORE IT HAS >1 CHILDREN (countChildrenOnPath)
+    ngraph = getCPGraph(ngraph)
+    parent = ngraph.parent; children = ngraph.children
+    rset = set(roots)
+    up = {}
+    def walkUp(n):
+        trail = []
+        while n not in up:
+            q = parent[n]
+            if q in rset or q in restrict or q not in parent:
+                up[n] = (q, 2, len(children.get(n, ())) > 1)
+                break
+            trail.append(n)
+            n = q
+        for c in reversed(trail):
+            st, l, br = up[parent[c]]
+            up[c] = (st, l + 1, br or len(children.get(c, ())) > 1)
+            n = c
+        return up[n]
+
+    reach = {}                  ###   ROOT -> [(LENGTH, TIPi, BRANCHED)]
+    for ti in xrange(len(tips)):
+        t = tips[ti]
+        st, l, br = walkUp(t)
+        while True:
+            if st in rset and t >= st:
+                reach.setdefault(st, []).append((l, ti, br))
+            if st in restrict or st not in parent: break
+            ###   UNRESTRICTED ROOT, KEEP GOING ABOVE IT
+            st, l2, br2 = walkUp(st)
+            l += l2 - 1; br = br or br2
+
     cPATHS = []
+    taken = set()
     for ri in xrange(len(roots)):
         r = roots[ri]
         sL = 1
-        sPATHi = []
-        for ti in xrange(len(tips)):
-            t = tips[ti]
-            if t < r: continue
-            tPATHi = findChargePath(r, t, ngraph, restrict, False)
-            tL = len(tPATHi)
-            if tL > sL:
-                if countChildrenOnPath(tPATHi, ngraph) > 1:
-                    sL = tL
-                    sPATHi = tPATHi
-                    tTEMP = t; tiTEMP = ti
-        if len(sPATHi) > 0:
-            print '   found path/idex from', ri, 'of', 
-                  len(roots), 'possible | tips:', tTEMP, tiTEMP
+        stiTEMP = None
+        for tL, ti, branched in reach.get(r, ()):
+            if ti in taken or not branched: continue
+            if tL > sL:             ###   reach IS IN tips ORDER, FIRST WINS TIES
+                sL = tL
+                stiTEMP = ti
+        if stiTEMP is not None:
+            print '   found path/idex from', ri, 'of', len(roots), 'possible | tips:', tips[stiTEMP], stiTEMP
+            sPATHi = [tips[stiTEMP]]
+            while len(sPATHi) < sL:
+                sPATHi.append(parent[sPATHi[-1]])
             cPATHS.append(sPATHi)
-            tips.remove(tTEMP)
+            taken.add(stiTEMP)
+    tips[:] = [tips[ti] for ti in xrange(len(tips)) if ti not in taken]
     return cPATHS
 
 def findChannels_WORKINPROGRESS(roots, ttips, ngraph, restrict):
@@ -635,8 +702,7 @@ def findChannels_WORKINPROGRESS(roots, ttips, ngraph, restrict):
             if tL > 0:
                 tipREMOVE.append(t)                    
         if len(sPATHi) > 0:
-            print '   found path from root idex', ri, 'of', 
-                   len(roots), 'possible roots | #oftips=', len(tips)
+            print '   found path from root idex', ri, 'of', len(roots), 'possible roots | #oftips=', len(tips)
             cPATHS.append(sPATHi)
         for q in tipREMOVE:  tips.remove(q)
 
@@ -647,10 +713,10 @@ def countChildrenOnPath(aPath, ngraph, quick = True):
     ###   COUNT WHEN NODE IS A PARENT >1 TIMES
     ###   quick -STOP AND RETURN AFTER FIRST
     cCOUNT = 0
-    pList = splitList(ngraph,1)
+    children = getCPGraph(ngraph).children
     for ai in xrange(len(aPath)-1):
         ap = aPath[ai]
-        pc = pList.count(ap)
+        pc = len(children.get(ap, ()))
         if quick and pc > 1: 
             return pc
     return cCOUNT
@@ -659,12 +725,12 @@ def countChildrenOnPath(aPath, ngraph, quick = True):
 def classifyStroke(sarr, mct, hORDER = 1):
     print ':::CLASSIFYING STROKE'
     ###---BUILD CHILD/PARENT GRAPH (INDEXES OF sarr)  
-    sgarr = buildCPGraph(sarr, mct)
+    sgarr = CPGraph(buildCPGraph(sarr, mct))
 
     ###---FIND MAIN CHANNEL 
     print '   finding MAIN'
-    oCharge = sgarr[0][1]
-    fCharge = sgarr[len(sgarr)-1][0]
+    oCharge = sgarr.edges[0][1]
+    fCharge = sgarr.edges[len(sgarr)-1][0]
     aMAINi = findChargePath(oCharge, fCharge, sgarr)
     
     ###---FIND TIPS
@@ -674,7 +740,7 @@ def classifyStroke(sarr, mct, hORDER = 1):
     ###---FIND hORDER CHANNEL ROOTS
     ###   hCOUNT = ORDERS BEWTEEN MAIN and SIDE/TIPS
     ###   !!!STILL BUGGY!!!
-    hRESTRICT = list(aMAINi)    ### ADD TO THIS AFTER EACH TIME
+    hRESTRICT = set(aMAINi)     ### ADD TO THIS AFTER EACH TIME
     allHPATHSi = []             ### ALL hO PATHS: [[h0], [h1]...]
     curPATHSi = [aMAINi]        ### LIST OF PATHS FIND ROOTS ON
     for h in xrange(hORDER):
@@ -695,22 +761,21 @@ def classifyStroke(sarr, mct, hORDER = 1):
                 allHPATHSi[h] += aHPATHSi
                 ###   SET THESE CHANNELS AS RESTRICTIONS FOR NEXT ITERATIONS
                 for hri in aHPATHSi:
-                    hRESTRICT += hri
+                    hRESTRICT.update(hri)
         curPATHSi = aHPATHSi
     
     ###---SIDE BRANCHES, FINAL ORDER OF HEIRARCHY
     ###   FROM TIPS THAT ARE NOT IN AN EXISTING PATH
     ###   BACK TO ANY OTHER POINT THAT IS ALREADY ON A PATH
-    aDRAWNi = []
-    aDRAWNi += aMAINi
+    aDRAWNi = set(aMAINi)
     for oH in allHPATHSi:
         for o in oH:
-            aDRAWNi += o
+            aDRAWNi.update(o)
     aTPATHSi = []
     for a in aTIPSi:
         if not a in aDRAWNi:
             aPATHi = findChargePath(oCharge, a, sgarr, aDRAWNi)
-            aDRAWNi += aPATHi
+            aDRAWNi.update(aPATHi)
             aTPATHSi.append(aPATHi)
             
     return aMAINi, allHPATHSi, aTPATHSi
@@ -897,7 +962,6 @@ def initialPointCharges(pList, cList, eList = []):
 def getCandidateSites(aList, iList = []):
     ###---IN: aList -(X,Y,Z) OF CHARGED CELL SITES, iList -insulator sites
     ###   OUT: CANDIDATE LIST OF GROWTH SITES [(X,Y,Z)]
-    tt1 = time.clock()    
     cList = []
     for c in aList:
         tempList = getStencil3D_26(c[0], c[1], c[2])
@@ -905,10 +969,151 @@ def getCandidateSites(aList, iList = []):
             if not t in aList and not t in iList:
                 cList.append(t)
     ncList = deDupe(cList)
-    tt2 = time.clock()	
-    #print('FXNTIMER:getCandidateSites:', tt2-tt1, 'check 26 against:', len(aList)+len(iList))    
     return ncList
 
+######################################################################
+######################### INCREMENTAL SOLVER #########################
+######################################################################
+STENCIL_26 = getStencil3D_26(0, 0, 0)
+
+class FSLGSolver(object):
+###---SAME GROWTH MODEL AS THE FSLG() LOOP, BUT CHARGES AND CANDIDATE
+###   SITES LIVE IN NUMPY ARRAYS AND CELL LOOKUPS ARE DONE IN SETS/DICTS
+###   -POTENTIALS ARE UPDATED FOR ALL CANDIDATES AT ONCE (Eqn. 11)
+###   -ONLY NEW CANDIDATES SUM OVER ALL CHARGES (Eqn. 10)
+###   -GROWTH SITE IS PICKED FROM THE CUMULATIVE SUM OF Eqn. 12
+    r1 = 1/2        ###===(FSLG - Eqn. 10)
+
+    def __init__(self, cgrid, eList = [], iList = [], uN = 6.3, rng = None):
+        ###---IN: cgrid -[(x,y,z)] INITIAL CHARGES, eList -[(x,y,z,w)] EXTRA CHARGES
+        ###       iList -[(x,y,z)] INSULATOR CELLS, uN -USER TERM (STRAIGHTNESS)
+        ###       rng -random.Random TO DRAW FROM (FOR SEEDED BOLTS)
+        self.uN = uN
+        self.rng = rng or random
+        self.cgrid = [(c[0], c[1], c[2]) for c in cgrid]
+        self.cset = set(self.cgrid)
+        self.iset = set((i[0], i[1], i[2]) for i in iList)
+
+        ###---ALL CHARGES: GROWN CELLS (w = 1.0) FOLLOWED BY eList
+        nq = len(self.cgrid) + len(eList)
+        self.qpos = numpy.zeros((max(nq, 64), 3))
+        self.qw = numpy.zeros(max(nq, 64))
+        self.qsq = numpy.zeros(max(nq, 64))
+        self.nq = 0
+        for c in self.cgrid: self.addCharge(c, 1.0)
+        for e in eList: self.addCharge(e, e[3])
+
+        ###---CANDIDATE SITES, SITE -> ROW IN cpos/cpot
+        self.cpos = numpy.zeros((64, 3))
+        self.cpot = numpy.zeros(64)
+        self.csites = []
+        self.cindex = {}
+        ncs = []
+        for c in self.cgrid:
+            for s in STENCIL_26:
+                ncs.append((c[0] + s[0], c[1] + s[1], c[2] + s[2]))
+        self.addCandidates(ncs)
+
+    def addCharge(self, p, w):
+        if self.nq == len(self.qw):
+            self.qpos = numpy.resize(self.qpos, (2 * self.nq, 3))
+            self.qw = numpy.resize(self.qw, 2 * self.nq)
+            self.qsq = numpy.resize(self.qsq, 2 * self.nq)
+        self.qpos[self.nq] = p[0], p[1], p[2]
+        self.qw[self.nq] = w
+        self.qsq[self.nq] = p[0] * p[0] + p[1] * p[1] + p[2] * p[2]
+        self.nq += 1
+
+    def potentials(self, sites):
+        ###---Eqn. 10 FOR NEW SITES, SUM OVER ALL CHARGES (SKIPS CHARGES ON THE SITE)
+        ###   |q-s|^2 = |q|^2 - 2q.s + |s|^2, EXACT FOR INTEGER CELLS
+        s = numpy.array(sites, dtype = float)
+        q = self.qpos[:self.nq]; w = self.qw[:self.nq]
+        r = numpy.dot(s, -2 * q.T)
+        r += self.qsq[:self.nq]
+        r += (s * s).sum(axis = 1)[:, numpy.newaxis]
+        numpy.sqrt(r, out = r)
+        on = r == 0
+        r[on] = numpy.inf
+        numpy.reciprocal(r, out = r)
+        return (w.sum() - numpy.dot(on, w)) - self.r1 * numpy.dot(r, w)
+
+    def addCandidates(self, sites):
+        nsites = []
+        for s in sites:
+            if s in self.cindex or s in self.cset or s in self.iset: continue
+            self.cindex[s] = -1
+            nsites.append(s)
+        if not nsites: return
+        n = len(self.csites)
+        if n + len(nsites) > len(self.cpot):
+            size = max(2 * len(self.cpot), n + len(nsites))
+            self.cpos = numpy.resize(self.cpos, (size, 3))
+            self.cpot = numpy.resize(self.cpot, size)
+        self.cpos[n:n + len(nsites)] = nsites
+        self.cpot[n:n + len(nsites)] = self.potentials(nsites)
+        for s in nsites:
+            self.cindex[s] = len(self.csites)
+            self.csites.append(s)
+
+    def removeCandidate(self, i):
+        ###---SWAP WITH LAST ROW, O(1)
+        last = len(self.csites) - 1
+        s = self.csites[i]
+        if i != last:
+            ls = self.csites[last]
+            self.csites[i] = ls
+            self.cindex[ls] = i
+            self.cpos[i] = self.cpos[last]
+            self.cpot[i] = self.cpot[last]
+        self.csites.pop()
+        del self.cindex[s]
+
+    def chooseGrowthSite(self):
+        ###---Eqn. 12/13, SAMPLED BY BISECTING THE CUMULATIVE SUM
+        o = self.cpot[:len(self.csites)]
+        Omin = o.min(); Omax = o.max()
+        if Omin == Omax: Omax += notZero; Omin -= notZero
+        cs = numpy.cumsum(((o - Omin) / (Omax - Omin)) ** self.uN)
+        i = int(numpy.searchsorted(cs, self.rng.random() * cs[-1], side = 'right'))
+        return min(i, len(cs) - 1)
+
+    def step(self):
+        ###---ONE GROWTH STEP, RETURNS THE NEW CELL (OR None IF STUCK)
+        if not self.csites: return None
+        gi = self.chooseGrowthSite()
+        gsite = self.csites[gi]
+        self.removeCandidate(gi)
+        self.cgrid.append(gsite)
+        self.cset.add(gsite)
+        self.addCharge(gsite, 1.0)
+
+        ###---Eqn. 11 FOR ALL OLD CANDIDATES AT ONCE
+        n = len(self.csites)
+        d = self.cpos[:n] - gsite
+        self.cpot[:n] += 1 - self.r1 / numpy.sqrt((d * d).sum(axis = 1))
+
+        self.addCandidates([(gsite[0] + s[0], gsite[1] + s[1], gsite[2] + s[2]) for s in STENCIL_26])
+        return gsite
+
+    def run(self, tsteps, groundZ = None, cloud = None, verbose = 0):
+        ###---GROW UP TO tsteps CELLS, STOP ON GROUND/CLOUD STRIKE
+        ###   cloud -SET OF (x,y,z) CELLS, verbose -PRINT EVERY n STEPS
+        for ts in xrange(1, tsteps + 1):
+            gsite = self.step()
+            if gsite is None:
+                print '<<<<<<------NO CANDIDATE SITES LEFT'
+                break
+            if verbose and ts % verbose == 0:
+                print ':::T-STEP: ' + str(ts) + '/' + str(tsteps) + ' | CANDS: ' + str(len(self.csites)) + ' | GSITE: ' + str(gsite)
+            if groundZ is not None and gsite[2] == groundZ:
+                print '<<<<<<------EARLY TERMINATION DUE TO GROUNDSTRIKE'
+                break
+            if cloud and gsite in cloud:
+                print '<<<<<<------EARLY TERMINATION DUE TO CLOUDSTRIKE'
+                break
+        return self.cgrid
+
 ######################################################################
 ############################# SETUP FXNS #############################
 ######################################################################
@@ -967,12 +1172,9 @@ def checkSettings():
 ######################################################################
 ############################### MAIN #################################
 ######################################################################
-def FSLG():
-###======FAST SIMULATION OF LAPLACIAN GROWTH======###
-    print '\n<<<<<<------GO GO GADGET: FAST SIMULATION OF LAPLACIAN GROWTH!'
-    tc1 = time.clock()
-    TSTEPS = winmgr.TSTEPS
-
+def setupFSLG():
+###---BLENDER SIDE OF THE SIMULATION: ORIGIN/GROUND/CLOUD/INSULATOR
+###   OBJECTS TO CELL LISTS, OUT: (obORIGIN, cgrid, eChargeList, icList)
     #obORIGIN = scn.objects[winmgr.OOB]    
     #obGROUND = scn.objects[winmgr.GOB]
     obORIGIN = bpy.context.scene.objects[winmgr.OOB]
@@ -1006,20 +1208,35 @@ def FSLG():
         print '<<<<<<------INSULATOR OBJECT CELL COUNT = ', len(icList)
         #writeArrayToCubes(icList, winmgr.GSCALE, winmgr.ORIGIN)
         #return 'THEEND'
-        
+    return obORIGIN, cgrid, eChargeList, icList
+
+def growFSLG(cgrid, eChargeList, icList, TSTEPS, uN, groundZ = None, cloud = None,
+             fast = True, seed = None, verbose = True):
+###---THE GROWTH LOOP, PURE PYTHON (NO bpy), SO IT CAN RUN IN A WORKER
+###   groundZ/cloud -EARLY TERMINATION, None TO IGNORE
+###   fast -USE FSLGSolver (NEEDS numpy), seed -SEED THE RANDOM CHOICES
+    ###---A LOCAL GENERATOR, THE GLOBAL ONE IS LEFT ALONE
+    rng = random
+    if seed is not None: rng = random.Random(seed)
+    if fast and numpy is not None:
+        ###====== INCREMENTAL SOLVER DOES ALL STEPS BELOW ON ARRAYS
+        solver = FSLGSolver(cgrid, eChargeList, icList, uN, rng)
+        return solver.run(TSTEPS, groundZ, cloud, verbose = 100 if verbose else 0)
+
+    cgrid = list(cgrid)
     ###====== 2) LOCATE CANDIDATE SITES AROUND CHARGE
     cSites = getCandidateSites(cgrid, icList)
-    
+
     ###====== 3) CALC POTENTIAL AT EACH SITE (Eqn. 10)
     cSites = initialPointCharges(cgrid, cSites, eChargeList)
-    
     ts = 1
+
     while ts <= TSTEPS:
         ###====== 1) SELECT NEW GROWTH SITE (Eqn. 12)
         ###===GET PROBABILITIES AT CANDIDATE SITES
-        gProbs = getGrowthProbability(winmgr.BIGVAR, cSites)
+        gProbs = getGrowthProbability(uN, cSites)
         ###===CHOOSE NEW GROWTH SITE BASED ON PROBABILITIES
-        gSitei = weightedRandomChoice(gProbs)
+        gSitei = weightedRandomChoice(gProbs, rng)
         gsite  = cSites[gSitei][0]
 
         ###====== 2) ADD NEW POINT CHARGE AT GROWTH SITE
@@ -1051,25 +1268,43 @@ def FSLG():
             cSites.append(ncs)
 
         ###===ITERATION COMPLETE
-        istr1 = ':::T-STEP: ' + str(ts) + '/' + str(TSTEPS) 
-        istr12 = ' | GROUNDZ: ' + str(winmgr.GROUNDZ) + ' | '
-        istr2 = 'CANDS: ' + str(len(cSites)) + ' | '
-        istr3 = 'GSITE: ' + str(gsite)
-        print istr1 + istr12 + istr2 + istr3        
+        if verbose:
+            istr1 = ':::T-STEP: ' + str(ts) + '/' + str(TSTEPS) 
+            istr12 = ' | GROUNDZ: ' + str(groundZ) + ' | '
+            istr2 = 'CANDS: ' + str(len(cSites)) + ' | '
+            istr3 = 'GSITE: ' + str(gsite)
+            print istr1 + istr12 + istr2 + istr3        
         ts += 1
         
         ###---EARLY TERMINATION FOR GROUND/CLOUD STRIKE
-        if winmgr.GROUNDBOOL:
-            if gsite[2] == winmgr.GROUNDZ:
+        if groundZ is not None:
+            if gsite[2] == groundZ:
                 ts = TSTEPS+1
                 print '<<<<<<------EARLY TERMINATION DUE TO GROUNDSTRIKE'
                 continue
-        if winmgr.CLOUDBOOL:
-            #if gsite in cloudList:
-            if gsite in splitListCo(eChargeList):
+        if cloud:
+            if gsite in cloud:
                 ts = TSTEPS+1
                 print '<<<<<<------EARLY TERMINATION DUE TO CLOUDSTRIKE'
                 continue            
+    return cgrid
+
+def getStrikeSettings(eChargeList):
+###---OUT: (groundZ, cloud) FOR growFSLG FROM THE UI SETTINGS
+    groundZ = None; cloud = None
+    if winmgr.GROUNDBOOL: groundZ = winmgr.GROUNDZ
+    if winmgr.CLOUDBOOL: cloud = set(splitListCo(eChargeList))
+    return groundZ, cloud
+
+def FSLG():
+###======FAST SIMULATION OF LAPLACIAN GROWTH======###
+    print '\n<<<<<<------GO GO GADGET: FAST SIMULATION OF LAPLACIAN GROWTH!'
+    tc1 = time.clock()
+    TSTEPS = winmgr.TSTEPS
+    obORIGIN, cgrid, eChargeList, icList = setupFSLG()
+    groundZ, cloud = getStrikeSettings(eChargeList)
+    cgrid = growFSLG(cgrid, eChargeList, icList, TSTEPS, winmgr.BIGVAR,
+                     groundZ, cloud, winmgr.FASTSOLVER)
 
     tc2 = time.clock()
     tcRUN = tc2 - tc1
@@ -1081,6 +1316,119 @@ def FSLG():
     visualizeArray(cgrid, obORIGIN, winmgr.GSCALE, winmgr.VMMESH, winmgr.VSMESH, winmgr.VCUBE, winmgr.VVOX, reportSTRING)
     print '<<<<<<------COMPLETE'
 
+######################################################################
+############################### BATCH ################################
+######################################################################
+BOLT_CACHE_DIR = 'laplace_lightning_cache'
+BOLT_CACHE_VERSION = 1
+BOLT_CACHE_MAX_SIZE = 64 << 20     ###---BYTES, LEAST RECENTLY USED GO FIRST
+
+def getBoltCacheFile(cacheDir, task):
+###---CACHE FILE FOR A growFSLG TASK, KEYED BY ALL INPUTS + SEED
+    key = list(task[:-1])
+    if key[6]: key[6] = sorted(key[6])     ###---cloud SET, FIXED ORDER
+    key = repr([BOLT_CACHE_VERSION] + key)
+    return os.path.join(cacheDir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.bolt')
+
+def writeBoltCache(arr, filename):
+###---CELLS AS LITTLE ENDIAN int32 x,y,z, WRITTEN TO A TEMP FILE FIRST
+    flat = []
+    for a in arr: flat += [a[0], a[1], a[2]]
+    tname = filename + '.' + str(os.getpid()) + '.tmp'
+    file = open(tname, 'wb')
+    file.write(struct.pack('<' + str(len(flat)) + 'i', *flat))
+    file.close()
+    os.rename(tname, filename)
+
+def evictBoltCache(cacheDir, maxSize = BOLT_CACHE_MAX_SIZE):
+###---REMOVE THE LEAST RECENTLY USED BOLTS UNTIL THE CACHE FITS maxSize
+    entries = []
+    totalSize = 0
+    for name in os.listdir(cacheDir):
+        if not name.endswith('.bolt'): continue
+        filename = os.path.join(cacheDir, name)
+        try: fileStat = os.stat(filename)
+        except OSError: continue
+        entries.append((fileStat.st_mtime, fileStat.st_size, filename))
+        totalSize += fileStat.st_size
+    entries.sort()
+    for mtime, size, filename in entries:
+        if totalSize <= maxSize: break
+        try: os.remove(filename)
+        except OSError: continue
+        totalSize -= size
+
+def readBoltCache(filename):
+    file = open(filename, 'rb')
+    data = file.read()
+    file.close()
+    flat = struct.unpack('<' + str(len(data) // 4) + 'i', data)
+    return [tuple(flat[i:i+3]) for i in xrange(0, len(flat), 3)]
+
+def runFSLGTask(task):
+###---WORKER: task = (cgrid, eChargeList, icList, TSTEPS, uN, groundZ,
+###   cloud, fast, seed, cacheFile), cacheFile None TO SKIP THE CACHE
+    cacheFile = task[-1]
+    if cacheFile and os.path.exists(cacheFile):
+        cgrid = None
+        try: cgrid = readBoltCache(cacheFile)
+        except (IOError, OSError, struct.error): pass
+        if cgrid is not None:
+            try: os.utime(cacheFile, None)     ###---MARK AS RECENTLY USED
+            except OSError: pass
+            return cgrid
+    cgrid = growFSLG(*task[:-1], verbose = False)
+    if cacheFile:
+        try: writeBoltCache(cgrid, cacheFile)
+        except (IOError, OSError): print '   COULD NOT WRITE BOLT CACHE', cacheFile
+    return cgrid
+
+def runFSLGTasks(tasks, processes = None):
+###---RUN runFSLGTask FOR ALL tasks, IN A PROCESS POOL WHERE THE
+###   PROCESS CAN BE FORKED (WORKERS COULD NOT IMPORT bpy OTHERWISE)
+    if len(tasks) > 1 and processes != 1 and os.name == 'posix':
+        try:
+            pool = Pool(processes)
+        except (OSError, ImportError, NotImplementedError):
+            pool = None
+        if pool is not None:
+            try:
+                return pool.map(runFSLGTask, tasks, chunksize = 1)
+            finally:
+                pool.close()
+                pool.join()
+    return [runFSLGTask(task) for task in tasks]
+
+def FSLGBatch():
+###======BATCH OF SEEDED BOLTS: GROWN IN WORKER PROCESSES,
+###      THEN ALL MESHES BUILT IN ONE PASS======###
+    print '\n<<<<<<------FSLG BATCH: ' + str(winmgr.BATCHN) + ' BOLTS FROM SEED ' + str(winmgr.BATCHSEED)
+    tc1 = time.time()
+    obORIGIN, cgrid, eChargeList, icList = setupFSLG()
+    groundZ, cloud = getStrikeSettings(eChargeList)
+    cacheDir = None
+    if winmgr.BATCHCACHE:
+        cacheDir = bpy.utils.user_resource('DATAFILES', path = BOLT_CACHE_DIR, create = True)
+
+    tasks = []
+    seeds = range(winmgr.BATCHSEED, winmgr.BATCHSEED + winmgr.BATCHN)
+    for seed in seeds:
+        task = [cgrid, eChargeList, icList, winmgr.TSTEPS, winmgr.BIGVAR,
+                groundZ, cloud, winmgr.FASTSOLVER, seed, None]
+        if cacheDir: task[-1] = getBoltCacheFile(cacheDir, task)
+        tasks.append(tuple(task))
+    bolts = runFSLGTasks(tasks)
+    if cacheDir: evictBoltCache(cacheDir)
+
+    tcRUN = time.time() - tc1
+    print '<<<<<<------BATCH GROWN: ' + str(len(bolts)) + ' BOLTS / ' + str(tcRUN)[0:5] + ' SECONDS'
+    print '<<<<<<------VISUALIZING DATA'
+    reportSTRING = getReportString(tcRUN)
+    for seed, bolt in zip(seeds, bolts):
+        print ':::SEED', seed, '-', len(bolt), 'CELLS'
+        visualizeArray(bolt, obORIGIN, winmgr.GSCALE, winmgr.VMMESH, winmgr.VSMESH, winmgr.VCUBE, winmgr.VVOX, reportSTRING + ',seed:' + str(seed))
+    print '<<<<<<------COMPLETE'
+
 ######################################################################
 ################################ GUI #################################
 ######################################################################
@@ -1114,6 +1462,14 @@ bpy.types.WindowManager.VVOX = bpy.props.BoolProperty(
     name = "voxel (experimental)", description = "output to a voxel file to bpy.data.filepath\FSLGvoxels.raw - doesn't work well right now")
 bpy.types.WindowManager.IBOOL = bpy.props.BoolProperty(
     name = "use insulator object", description = "use insulator mesh object to prevent growth of bolt in areas")
+bpy.types.WindowManager.FASTSOLVER = bpy.props.BoolProperty(
+    name = "fast solver", description = "grow the bolt with the incremental numpy solver, needed for bolts with thousands of iterations")
+bpy.types.WindowManager.BATCHN = bpy.props.IntProperty(
+    name = "bolts", description = "number of bolts to generate in a batch, one per seed", min = 1)
+bpy.types.WindowManager.BATCHSEED = bpy.props.IntProperty(
+    name = "first seed", description = "seed of the first bolt in a batch, the others use the following seeds")
+bpy.types.WindowManager.BATCHCACHE = bpy.props.BoolProperty(
+    name = "cache bolts", description = "keep batch bolts on disk, same settings and seed load the cells instead of growing them again, the least recently used are dropped above 64MB")
 bpy.types.WindowManager.OOB = bpy.props.StringProperty(description = "origin of bolt, can be an Empty, if obj is mesh will use all verts as charges")
 bpy.types.WindowManager.GOB = bpy.props.StringProperty(description = "object to use as ground plane, uses z coord only")
 bpy.types.WindowManager.COB = bpy.props.StringProperty(description = "object to use as cloud, best to use a cube")
@@ -1133,6 +1489,10 @@ winmgr.VSMESH = False
 winmgr.VCUBE = False
 winmgr.VVOX = False
 winmgr.IBOOL = False
+winmgr.FASTSOLVER = numpy is not None
+winmgr.BATCHN = 8
+winmgr.BATCHSEED = 0
+winmgr.BATCHCACHE = True
 try:
     winmgr.OOB = "ELorigin"
     winmgr.GOB = "ELground"
@@ -1168,6 +1528,17 @@ class runFSLGLoopOperator(bpy.types.Operator):
         else: pass
         return set(['FINISHED'])
     
+class runFSLGBatchOperator(bpy.types.Operator):
+    '''generate a batch of seeded bolts, grown in parallel'''
+    bl_idname = "object.runfslg_batch_operator"
+    bl_label = "run FSLG Batch Operator"
+
+    def execute(self, context):
+        if checkSettings():
+            FSLGBatch()
+        else: pass
+        return set(['FINISHED'])
+
 class setupObjectsOperator(bpy.types.Operator):
     '''create origin/ground/cloud/insulator objects'''
     bl_idname = "object.setup_objects_operator"
@@ -1197,6 +1568,7 @@ class OBJECT_PT_fslg(bpy.types.Panel):
         colR.prop(winmgr, 'TSTEPS')
         colR.prop(winmgr, 'GSCALE')        
         colR.prop(winmgr, 'BIGVAR')
+        if numpy is not None: colR.prop(winmgr, 'FASTSOLVER')
         colR.operator('object.setup_objects_operator', text = 'create setup objects')        
         colR.label('origin object')
         colR.prop_search(winmgr, "OOB",  context.scene, "objects")        
@@ -1209,6 +1581,10 @@ class OBJECT_PT_fslg(bpy.types.Panel):
         colR.prop(winmgr, 'IBOOL')
         colR.prop_search(winmgr, "IOB",  context.scene, "objects")
         colR.operator('object.runfslg_operator', text = 'generate lightning')
+        colR.prop(winmgr, 'BATCHN')
+        colR.prop(winmgr, 'BATCHSEED')
+        colR.prop(winmgr, 'BATCHCACHE')
+        colR.operator('object.runfslg_batch_operator', text = 'generate batch')
         #col.prop(winmgr, 'HORDER')
         colR.prop(winmgr, 'VMMESH')
         colR.prop(winmgr, 'VSMESH')        
@@ -1228,11 +1604,13 @@ def addReportProp(ob, str):
         
 def register():
     bpy.utils.register_class(runFSLGLoopOperator)    
+    bpy.utils.register_class(runFSLGBatchOperator)
     bpy.utils.register_class(setupObjectsOperator)
     bpy.utils.register_class(OBJECT_PT_fslg)
 
 def unregister():
     bpy.utils.unregister_class(runFSLGLoopOperator)    
+    bpy.utils.unregister_class(runFSLGBatchOperator)
     bpy.utils.unregister_class(setupObjectsOperator)    
     bpy.utils.unregister_class(OBJECT_PT_fslg)
 
@@ -1247,33 +1625,87 @@ if __name__ == "__main__":
 ###########################
 ##### FXN BENCHMARKS ######
 ###########################
-def BENCH():
+###---HEADLESS: blender -b -P object_laplace_lightning.py -- --bench [out.csv]
+###   INPUTS ARE BUILT FROM BENCH_SEED ONLY (NOT BY THE SOLVER UNDER TEST)
+###   SO TIMINGS STAY COMPARABLE WHILE THE SOLVER CHANGES
+BENCH_GRIDS = (10, 20, 30)      ###---CUBE SIDE FOR deDupe
+BENCH_STEPS = (100, 300, 1000)  ###---BOLT CELLS FOR THE OTHER FXNS
+BENCH_SEED = 0
+BENCH_REPEAT = 3
+
+def benchBolt(steps, seed = BENCH_SEED):
+###---FIXED BOLT-LIKE CELL LIST: SEEDED WALK DOWN THE GRID, EVERY CELL
+###   NEXT TO AN EARLIER ONE (LIKE THE GENERATOR OUTPUT)
+    rng = random.Random(seed)
+    cells = [(0, 0, 0)]
+    cset = set(cells)
+    while len(cells) <= steps:
+        c = cells[max(0, len(cells) - 1 - int(rng.expovariate(0.2)))]
+        s = STENCIL_26[rng.randrange(26)]
+        if s[2] > 0 and rng.random() < 0.8: s = (s[0], s[1], -s[2])
+        n = (c[0] + s[0], c[1] + s[1], c[2] + s[2])
+        if n in cset: continue
+        cells.append(n)
+        cset.add(n)
+    return cells
+
+def benchTime(fxn, *args):
+###---BEST OF BENCH_REPEAT RUNS, SECONDS
+    best = None
+    for r in xrange(BENCH_REPEAT):
+        bt1 = default_timer()
+        fxn(*args)
+        bt2 = default_timer() - bt1
+        if best is None or bt2 < best: best = bt2
+    return best
+
+def BENCH(grids = BENCH_GRIDS, steps = BENCH_STEPS, filename = None):
+###---TIME THE SIMULATION CORE FXNS, OUT: [(FXN, SIZE, SECONDS)]
+###   filename -ALSO WRITE THE TIMINGS THERE AS fxn,size,seconds LINES
     print '\n\n\n--->BEGIN BENCHMARK'
-    bt0 = time.clock()
-    ###---MAKE A BIG LIST
-    tsize = 25
-    tlist = []
-    for x in xrange(tsize):
-        for y in xrange(tsize):
-            for z in xrange(tsize):
-                tlist.append((x,y,z))
-                tlist.append((x,y,z))
-
-    ###---FUNCTION TO TEST
-    bt1 = time.clock()
-
-    #ll = deDupe(tlist)
-    #ll = f5(tlist)
-    print 'LENS - ', len(tlist), len(ll)
-
-    bt2 = time.clock()
-    btRUNb = bt2 - bt1
-    btRUNa = bt1 - bt0
-    print '--->SETUP TIME    : ', btRUNa
-    print '--->BENCHMARK TIME: ', btRUNb
-    print '--->GRIDSIZE: ', tsize, ' - ', tsize*tsize*tsize
-    
-#BENCH()
+    results = []
+    def report(fxn, size, t):
+        results.append((fxn, size, t))
+        print '--->' + fxn.ljust(22) + str(size).rjust(8) + '%12.6f' % t
+
+    for tsize in grids:
+        ###---MAKE A BIG LIST, EVERY CELL TWICE
+        tlist = []
+        for x in xrange(tsize):
+            for y in xrange(tsize):
+                for z in xrange(tsize):
+                    tlist.append((x,y,z))
+                    tlist.append((x,y,z))
+        report('deDupe', len(tlist), benchTime(deDupe, tlist))
+
+    for tsteps in steps:
+        cgrid = benchBolt(tsteps)
+        eChargeList = fakeGroundChargePlane(-tsteps, -250)
+        cSites = getCandidateSites(cgrid)
+        ###---SEEDED STAND-IN POTENTIALS, A FULL Eqn. 10 PASS IS TOO SLOW TO SET UP
+        rng = random.Random(BENCH_SEED)
+        cCharges = [(c, rng.uniform(-1, 1)) for c in cSites]
+        ###---GROWTH SITE IS TAKEN OUT OF THE CANDIDATES, AS IN FSLG()
+        gsite = cCharges.pop(len(cCharges) // 2)[0]
+        ###---Eqn. 10 IS TIMED FOR THE SITES AROUND ONE NEW CELL (PER STEP COST)
+        ncSites = getCandidateSites([gsite], cgrid)
+        report('getCandidateSites', tsteps, benchTime(getCandidateSites, cgrid))
+        report('initialPointCharges', tsteps, benchTime(initialPointCharges, cgrid, ncSites, eChargeList))
+        report('updatePointCharges', tsteps, benchTime(updatePointCharges, gsite, cCharges, eChargeList))
+        report('getGrowthProbability', tsteps, benchTime(getGrowthProbability, 6.3, cCharges))
+        report('buildCPGraph', tsteps, benchTime(buildCPGraph, cgrid))
+
+    if filename:
+        file = open(filename, 'w')
+        for fxn, size, t in results:
+            file.write(u'%s,%d,%.6f\n' % (fxn, size, t))
+        file.close()
+        print '--->TIMINGS WRITTEN TO', filename
+    return results
+
+if __name__ == "__main__" and '--bench' in sys.argv:
+    bargs = sys.argv[sys.argv.index('--bench') + 1:]
+    BENCH(filename = bargs[0] if bargs else None)
 
 ######################################################################
 ############################### THE END ##############################